@@ -0,0 +1,83 @@
+# Check with EXPLAIN that dashboard queries use table indexes (run after migrations)
+# python check_query_plans.py
+
+import sys
+import datetime as dt
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from libs.mysqldb import BaseTable, CarsTable, PriceHistoryTable, CarFeaturesTable
+from libs.help_functions import get_summary_stats_sql, get_latest_cars_sql, get_model_features
+
+def get_common_make_model() -> tuple:
+    df = BaseTable.get_data_from_query(
+        f"SELECT make, model FROM {CarsTable.TABLE_NAME} GROUP BY make, model ORDER BY COUNT(*) DESC LIMIT 1"
+    )
+
+    return df['make'][0], df['model'][0]
+
+def get_queries() -> dict:
+    """
+    Returns
+    -------
+    dict
+        name => (SQL, tables which can be fully scanned)
+    """
+    features = [feature_id for feature_id, _ in get_model_features(['All'])[:2]]
+    make, model = get_common_make_model()
+    filters = dict(
+        make_list = ['All'],
+        model_list = ['All'],
+        color_list = ['All'],
+        interior_color_list = ['All'],
+        power_list = ['All'],
+        drive_type_list = ['All'],
+        mileage_range = [0, 1000000],
+        price_range = [0, 1000000]
+    )
+    make_filters = dict(filters, make_list=[make])
+    make_model_filters = dict(filters, make_list=[make], model_list=[model])
+    model_filters = dict(filters, model_list=[model])
+    dates = dict(start_date=dt.date(2000, 1, 1), end_date=dt.date.today())
+
+    # without make and model filter all cars are read => only unfiltered queries can scan cars table
+    return {
+        'summary stats': (get_summary_stats_sql(**filters, features_list=[], **dates), ('ct',)),
+        'summary stats with features': (get_summary_stats_sql(**filters, features_list=features, **dates), ('ct',)),
+        'summary stats of make': (get_summary_stats_sql(**make_filters, features_list=[], **dates), ()),
+        'summary stats of make and model': (get_summary_stats_sql(**make_model_filters, features_list=[], **dates), ()),
+        'summary stats of model': (get_summary_stats_sql(**model_filters, features_list=[], **dates), ()),
+        'latest cars': (get_latest_cars_sql(**filters, features_list=[]), ('ct',)),
+        'latest cars with features': (get_latest_cars_sql(**filters, features_list=features), ('ct',)),
+        'latest cars of make and model': (get_latest_cars_sql(**make_model_filters, features_list=[]), ()),
+        'latest cars of model': (get_latest_cars_sql(**model_filters, features_list=[]), ()),
+        'car price history': (f"SELECT DATE(datetime) as date, AVG(price) as price FROM {PriceHistoryTable.TABLE_NAME} WHERE id = 'x' GROUP BY 1", ()),
+        'feature filter': (f"SELECT id FROM {CarFeaturesTable.TABLE_NAME} WHERE feature_id IN (1, 2) GROUP BY id", ()),
+    }
+
+def check_plan(name: str, SQL: str, allowed_full_scans: tuple) -> bool:
+    with BaseTable.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f'EXPLAIN {SQL}')
+            plan = cur.fetchall()
+
+    print(f'\n{name}')
+    passed = True
+    for row in plan:
+        # derived tables are results of subqueries
+        full_scan = row['type'] == 'ALL' and row['table'] not in allowed_full_scans and not row['table'].startswith('<')
+        passed &= not full_scan
+
+        print(f"  {'FULL SCAN' if full_scan else 'ok':<10} table={row['table']} type={row['type']} key={row['key']} rows={row['rows']}")
+
+    return passed
+
+if __name__ == "__main__":
+    results = [check_plan(name, SQL, allowed_full_scans) for name, (SQL, allowed_full_scans) in get_queries().items()]
+
+    if not all(results):
+        print('\nSome queries do not use indexes!')
+        sys.exit(1)
+
+    print('\nAll queries use indexes')
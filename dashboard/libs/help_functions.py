@@ -1,6 +1,6 @@
 import datetime as dt
 import pandas as pd
-from libs.mysqldb import BaseTable, CarsTable, PriceHistoryTable, FeaturesTable, PhotosTable
+from libs.mysqldb import BaseTable, CarsTable, PriceHistoryTable, FeatureDictionaryTable, CarFeaturesTable
 
 def get_available_makes() -> list[str]:
     SQL = f"SELECT DISTINCT make FROM {CarsTable.TABLE_NAME}"
@@ -62,22 +62,38 @@ def get_model_min_max_price(model_list: list[str]) -> tuple[int]:
     
     return int(df['min_price'].iloc[0]), int(df['max_price'].iloc[0])
 
-def get_model_features(model_list: list[str]) -> list[str]:
+def get_model_features(model_list: list[str]) -> list[tuple[int, str]]:
     SQL = (f"""
         SELECT
-            DISTINCT(ft.feature) as feature
+            DISTINCT fd.feature_id, fd.feature
         FROM {CarsTable.TABLE_NAME} AS ct
-        INNER JOIN {FeaturesTable.TABLE_NAME} AS ft
-        ON ct.id = ft.id
+        INNER JOIN {CarFeaturesTable.TABLE_NAME} AS cf
+        ON ct.id = cf.id
+        INNER JOIN {FeatureDictionaryTable.TABLE_NAME} AS fd
+        ON cf.feature_id = fd.feature_id
         WHERE 1 = 1
     """
     + (f""" AND ct.model IN ({', '.join(["'"+m+"'" for m in model_list])})""" if 'All' not in model_list else ''))
     
     df = BaseTable.get_data_from_query(SQL)
     
-    return df['feature'].sort_values().tolist()
+    return list(df.sort_values('feature')[['feature_id', 'feature']].itertuples(index=False, name=None))
 
-def get_summary_stats_data(
+def get_features_filter_sql(features_list: list[int]) -> str:
+    # features are filtered by integer ids from feature dictionary
+    return f"""
+    INNER JOIN (
+        SELECT 
+            id
+        FROM {CarFeaturesTable.TABLE_NAME}
+        WHERE feature_id IN ({', '.join([str(int(f)) for f in features_list])})
+        GROUP BY id
+        HAVING COUNT(*) = {len(features_list)}
+    ) as features
+    ON ct.id = features.id
+    """
+
+def get_summary_stats_sql(
         make_list: list, 
         model_list: list, 
         color_list: list,
@@ -101,17 +117,7 @@ def get_summary_stats_data(
     INNER JOIN {PriceHistoryTable.TABLE_NAME} AS ph
         ON ct.id = ph.id
     """
-    + (f"""
-    INNER JOIN (
-        SELECT 
-            id
-        FROM {FeaturesTable.TABLE_NAME}
-        WHERE feature IN ({', '.join(["'"+f+"'" for f in features_list])})
-        GROUP BY id
-        HAVING COUNT(feature) = {len(features_list)}
-    ) as features
-    ON ct.id = features.id
-    """ if features_list else '')
+    + (get_features_filter_sql(features_list) if features_list else '')
     + (f""" WHERE ct.registration BETWEEN '{start_date}' AND '{end_date}'""")
     + (f""" AND ct.mileage BETWEEN {mileage_range[0]} AND {mileage_range[1]}""")
     + (f""" AND ph.price BETWEEN {price_range[0]} AND {price_range[1]}""")
@@ -125,11 +131,16 @@ def get_summary_stats_data(
         ORDER BY 1 DESC""")   
     )
 
+    return SQL
+
+def get_summary_stats_data(*args, **kwargs) -> pd.DataFrame:
+    SQL = get_summary_stats_sql(*args, **kwargs)
+
     df = BaseTable.get_data_from_query(SQL)
 
     return df
 
-def get_latest_cars_data(
+def get_latest_cars_sql(
         make_list: list, 
         model_list: list, 
         color_list: list,
@@ -151,21 +162,12 @@ def get_latest_cars_data(
             id,
             price
         FROM {PriceHistoryTable.TABLE_NAME}
-        WHERE DATE(datetime) = (SELECT MAX(DATE(datetime)) FROM {PriceHistoryTable.TABLE_NAME})
+        -- range on datetime (instead of DATE(datetime) = ...) can use price_history_datetime index
+        WHERE datetime >= (SELECT DATE(MAX(datetime)) FROM {PriceHistoryTable.TABLE_NAME})
         ) as latest_records
     ON ct.id = latest_records.id
     """
-    + (f"""
-    INNER JOIN (
-        SELECT 
-            id
-        FROM {FeaturesTable.TABLE_NAME}
-        WHERE feature IN ({', '.join(["'"+f+"'" for f in features_list])})
-        GROUP BY id
-        HAVING COUNT(feature) = {len(features_list)}
-    ) as features
-    ON ct.id = features.id
-    """ if features_list else '')
+    + (get_features_filter_sql(features_list) if features_list else '')
     + (f""" WHERE ct.mileage BETWEEN {mileage_range[0]} AND {mileage_range[1]}""")
     + (f""" AND latest_records.price BETWEEN {price_range[0]} AND {price_range[1]}""")
     + (f""" AND ct.make IN ({', '.join(["'"+m+"'" for m in make_list])})""" if 'All' not in make_list else '')
@@ -176,6 +178,11 @@ def get_latest_cars_data(
     + (f""" AND ct.drive_type IN ({', '.join(["'"+m+"'" for m in drive_type_list])})""" if 'All' not in drive_type_list else '')
     )
 
+    return SQL
+
+def get_latest_cars_data(*args, **kwargs) -> pd.DataFrame:
+    SQL = get_latest_cars_sql(*args, **kwargs)
+
     df = BaseTable.get_data_from_query(SQL)
 
     return df
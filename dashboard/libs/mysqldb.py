@@ -2,6 +2,8 @@ import pandas as pd
 import pymysql
 import os
 import logging
+import threading
+from libs.connection_pool import ConnectionManager
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +15,14 @@ CONNECTION_STRING = {
     'cursorclass': pymysql.cursors.DictCursor
 }
 
+# bounded pool shared by all dashboard callbacks
+CONNECTIONS = ConnectionManager(CONNECTION_STRING, pool_size=int(os.getenv('MYSQL_POOL_SIZE', 5)))
+
+# table name => list of (column name, data type), loaded from information_schema once per process
+SCHEMA_CACHE = {}
+SCHEMA_LOCK = threading.Lock()
+
+
 class BaseTable:
     TABLE_NAME = 'test_table'
     CREATE_SQL = f'''CREATE TABLE IF NOT EXISTS {TABLE_NAME}(
@@ -22,23 +32,64 @@ class BaseTable:
                         int_col        INTEGER
                     )'''
     
+    @classmethod
+    def get_columns(cls):
+        """
+        Returns list of (column name, data type) in table order (cached for whole process)
+        """
+        with SCHEMA_LOCK:
+            if cls.TABLE_NAME not in SCHEMA_CACHE:
+                SQL = """SELECT COLUMN_NAME AS name, DATA_TYPE AS type 
+                         FROM information_schema.COLUMNS 
+                         WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s 
+                         ORDER BY ORDINAL_POSITION"""
+                
+                with cls.connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.execute(SQL, (cls.TABLE_NAME,))
+                        rows = cur.fetchall()
+                
+                if not rows:
+                    raise Exception(f'Table {cls.TABLE_NAME} does not exist!!!')
+                
+                SCHEMA_CACHE[cls.TABLE_NAME] = [(row['name'].lower(), row['type'].lower()) for row in rows]
+            
+            return SCHEMA_CACHE[cls.TABLE_NAME]
+    
+    @classmethod
+    def get_column_names(cls):
+        return [name for name, _ in cls.get_columns()]
+    
+    @classmethod
+    def clear_schema_cache(cls):
+        with SCHEMA_LOCK:
+            SCHEMA_CACHE.pop(cls.TABLE_NAME, None)
+    
     @classmethod
     def get_total_cols(cls):
-        return int(
-            len(
-                cls.CREATE_SQL[cls.CREATE_SQL.find('(') + 1: cls.CREATE_SQL.rfind(')')].split()
-            )
-            /2
-        )
+        return len(cls.get_columns())
+    
+    @classmethod
+    def get_insert_sql(cls):
+        cols = cls.get_column_names()
+        
+        return f"""INSERT INTO {cls.TABLE_NAME} ({','.join(f'`{col}`' for col in cols)}) VALUES ({','.join(['%s']*len(cols))})"""
            
     @classmethod
     def create_connection(cls):
         return pymysql.connect(**CONNECTION_STRING)
     
+    @classmethod
+    def connection(cls):
+        """
+        Borrow persistent connection from pool
+        """
+        return CONNECTIONS.connection()
+    
     @classmethod
     def prepare_data_to_insert(cls, df):
         # zoradi stplce podla db
-        cols = cls.get_data_from_query(f'SELECT * FROM {cls.TABLE_NAME} LIMIT 1').columns
+        cols = cls.get_column_names()
         df.columns = [col.lower() for col in df.columns]
         df_to_db = df[cols]
         
@@ -51,7 +102,7 @@ class BaseTable:
     @classmethod
     def execute_query(cls, SQL, message=None):
         try:
-            with cls.create_connection() as conn:
+            with cls.connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute(SQL)
                     conn.commit()
@@ -68,7 +119,7 @@ class BaseTable:
     @classmethod
     def get_data_from_query(cls, query):
         try:
-            with cls.create_connection() as con:
+            with cls.connection() as con:
                 return pd.read_sql(query, con)
         
         except Exception as e:
@@ -98,6 +149,7 @@ class BaseTable:
             message = f'{cls.TABLE_NAME} table created!!!'
 
         cls.execute_query(cls.CREATE_SQL, message)
+        cls.clear_schema_cache()
         
     @classmethod
     def drop(cls, message=None):
@@ -107,15 +159,17 @@ class BaseTable:
         SQL = f"DROP TABLE {cls.TABLE_NAME}"
 
         cls.execute_query(SQL, message)
+        cls.clear_schema_cache()
     
     @classmethod
     def insert_many(cls,df):            
-        SQL = f"""INSERT INTO {cls.TABLE_NAME} VALUES ({','.join(['%s']*cls.get_total_cols())})"""
-        
-        values = cls.prepare_data_to_insert(df)
+        SQL = f'INSERT INTO {cls.TABLE_NAME}'
             
         try:
-            with cls.create_connection() as conn:
+            SQL = cls.get_insert_sql()
+            values = cls.prepare_data_to_insert(df)
+            
+            with cls.connection() as conn:
                 with conn.cursor() as cur:
                     cur.executemany(SQL, values)
                     conn.commit()
@@ -140,7 +194,10 @@ class CarsTable(BaseTable):
                         drive_type      VARCHAR(32),
                         transmission    VARCHAR(32),
                         mileage         INTEGER,
-                        registration    TIMESTAMP
+                        registration    TIMESTAMP,
+                        PRIMARY KEY (id),
+                        INDEX cars_make_model (make, model),
+                        INDEX cars_model (model)
                     )'''
     
     @classmethod
@@ -154,7 +211,9 @@ class PriceHistoryTable(BaseTable):
     CREATE_SQL = f'''CREATE TABLE IF NOT EXISTS {TABLE_NAME}(
                         id          VARCHAR(48),
                         datetime    TIMESTAMP,
-                        price       DECIMAL(12,2)
+                        price       DECIMAL(12,2),
+                        PRIMARY KEY (id, datetime),
+                        INDEX price_history_datetime (datetime)
                     )'''
     
     @classmethod
@@ -167,7 +226,9 @@ class FeaturesTable(BaseTable):
     TABLE_NAME = 'features'
     CREATE_SQL = f'''CREATE TABLE IF NOT EXISTS {TABLE_NAME}(
                         id          VARCHAR(48),
-                        feature     TEXT
+                        feature     TEXT,
+                        INDEX features_id (id),
+                        INDEX features_feature_id (feature(191), id)
                     )'''
     
     @classmethod
@@ -180,10 +241,39 @@ class PhotosTable(BaseTable):
     TABLE_NAME = 'photos'
     CREATE_SQL = f'''CREATE TABLE IF NOT EXISTS {TABLE_NAME}(
                         id          VARCHAR(48),
-                        url         TEXT
+                        url         TEXT,
+                        INDEX photos_id (id)
                     )'''
     
     @classmethod
     def delete_by_id(cls, id_):
         SQL = f"DELETE FROM {cls.TABLE_NAME} WHERE id = '{id_}'"
-        cls.execute_query(SQL)
\ No newline at end of file
+        cls.execute_query(SQL)
+
+
+class FeatureDictionaryTable(BaseTable):
+    TABLE_NAME = 'feature_dictionary'
+    # features have no length limit => unique key is sha256 of feature (case sensitive)
+    CREATE_SQL = f'''CREATE TABLE IF NOT EXISTS {TABLE_NAME}(
+                        feature_id      INTEGER AUTO_INCREMENT,
+                        feature         TEXT CHARACTER SET utf8mb4 COLLATE utf8mb4_bin,
+                        feature_hash    BINARY(32) NOT NULL,
+                        PRIMARY KEY (feature_id),
+                        UNIQUE INDEX feature_dictionary_feature_hash (feature_hash)
+                    )'''
+
+
+
+class CarFeaturesTable(BaseTable):
+    TABLE_NAME = 'car_features'
+    CREATE_SQL = f'''CREATE TABLE IF NOT EXISTS {TABLE_NAME}(
+                        id          VARCHAR(48),
+                        feature_id  INTEGER,
+                        PRIMARY KEY (id, feature_id),
+                        INDEX car_features_feature_id (feature_id, id)
+                    )'''
+    
+    @classmethod
+    def delete_by_id(cls, id_):
+        SQL = f"DELETE FROM {cls.TABLE_NAME} WHERE id = '{id_}'"
+        cls.execute_query(SQL)
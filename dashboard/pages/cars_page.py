@@ -248,7 +248,7 @@ def car_update_drive_type_dropdown_options(models_list):
 )
 def car_update_feature_dropdown_options(models_list):
     dropdown_values = get_model_features(models_list)
-    options = [{'label': v, 'value': v} for v in dropdown_values]
+    options = [{'label': feature, 'value': feature_id} for feature_id, feature in dropdown_values]
 
     return [options]
 
@@ -0,0 +1,96 @@
+# Compare import time (lambda cold start) and per record latency of dataframe parsing, typed rows parsing and batch parsing
+# python benchmark_parser.py --records 2000 --imports 5
+
+import sys
+import time
+import argparse
+import subprocess
+import statistics
+
+sys.path.append('python')
+
+from custom_code.data_parsers import CarvagoDataParser, CarvagoBatchParser, CarDetails, Price, Feature, Photo
+from custom_code.mysql_db import BaseTable
+
+IMPORTS = {
+    'typed rows': 'import custom_code.data_parsers, custom_code.mysql_db',
+    'dataframes': 'import pandas, custom_code.data_parsers, custom_code.mysql_db',
+}
+
+def get_car_details(i):
+    return {
+        'id': f'car{i}',
+        'url': f'https://carvago.com/car/car{i}',
+        'make': 'Skoda',
+        'model': 'Octavia',
+        'body_color': 'Black',
+        'interior_colour': 'Grey',
+        'body': 'Combi',
+        'power': '110 kW',
+        'drive_type': 'Front',
+        'transmission': 'Manual',
+        'kms_driven': '123 456 km',
+        'first_registration': '05/2019',
+        'datetime': '20230101120000',
+        'price': 15990,
+        'features': [f'feature {j}' for j in range(30)],
+        'photos': [f'https://carvago.com/photos/car{i}/{j}.jpg' for j in range(15)],
+    }
+
+def parse_dataframes(car_details):
+    parser = CarvagoDataParser(car_details)
+    tables = [
+        (parser.get_details(), CarDetails._fields),
+        (parser.get_current_price(), Price._fields),
+        (parser.get_features(), Feature._fields),
+        (parser.get_photos(), Photo._fields),
+    ]
+
+    return [BaseTable.df2ListOfTuples(df[list(cols)]) for df, cols in tables]
+
+def parse_rows(car_details):
+    parser = CarvagoDataParser(car_details)
+    tables = [
+        ([parser.get_details(as_dataframe=False)], CarDetails._fields),
+        ([parser.get_current_price(as_dataframe=False)], Price._fields),
+        (parser.get_features(as_dataframe=False), Feature._fields),
+        (parser.get_photos(as_dataframe=False), Photo._fields),
+    ]
+
+    return [[BaseTable.row2tuple(row, cols) for row in rows] for rows, cols in tables]
+
+def measure_import(name, statement, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.monotonic()
+        subprocess.run([sys.executable, '-c', f"import sys; sys.path.append('python'); {statement}"], check=True)
+        times.append(time.monotonic() - start)
+
+    print(f'{name:<12} import {statistics.median(times) * 1000:8.1f} ms (median of {repeats})')
+
+def measure_parsing(name, records, parse_function):
+    start = time.monotonic()
+    for car_details in records:
+        parse_function(car_details)
+
+    elapsed = time.monotonic() - start
+    count = sum(len(batch) for batch in records) if isinstance(records[0], list) else len(records)
+    print(f'{name:<12} parse  {elapsed / count * 1e6:8.1f} us/record ({count / elapsed:.0f} records/s)')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--records', type=int, default=2000, help='number of parsed cars')
+    parser.add_argument('--imports', type=int, default=5, help='number of measured interpreter starts')
+    args = parser.parse_args()
+
+    for name, statement in IMPORTS.items():
+        measure_import(name, statement, args.imports)
+
+    records = [get_car_details(i) for i in range(args.records)]
+    # both paths have to produce the same rows
+    assert parse_dataframes(records[0]) == parse_rows(records[0])
+
+    measure_parsing('typed rows', records, parse_rows)
+    measure_parsing('dataframes', records, parse_dataframes)
+    # whole batch => one call
+    measure_parsing('batch', [records], lambda batch: CarvagoBatchParser(batch).get_tables())
@@ -2,53 +2,159 @@ import urllib
 import json
 import logging
 
+from collections import defaultdict
+
 from custom_code.s3 import S3
-from custom_code.data_parsers import CarvagoDataParser
-from custom_code.mysql_db import CarsTable, PriceHistoryTable, FeaturesTable, PhotosTable
+from custom_code.batches import is_batch_file, read_batch
+from custom_code.data_parsers import CarvagoDataParser, CarvagoPriceSweepParser
+from custom_code.mysql_db import CarsTable, PriceHistoryTable
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 client = S3.get_client()
 
+# number of parallel S3 downloads
+MAX_WORKERS = 16
+
+def get_event_items(event):
+    """
+    Get all S3 objects from S3 event or SQS event (with S3 notifications in message bodies)
+
+    Returns:
+        list of tuples (item identifier, bucket name, file name), item identifier is SQS message id (None for S3 event)
+    """
+    items = []
+    for record in event.get('Records', []):
+        if record.get('eventSource') == 'aws:sqs':
+            item_id = record['messageId']
+            s3_records = json.loads(record['body']).get('Records', [])
+        else:
+            item_id = None
+            s3_records = [record]
+
+        for s3_record in s3_records:
+            bucket_name = s3_record['s3']['bucket']['name']
+            file_name = urllib.parse.unquote_plus(s3_record['s3']['object']['key'], encoding='utf-8')
+            items.append((item_id, bucket_name, file_name))
+
+    return items
+
+def get_files(items):
+    """
+    Download all files of event concurrently
+
+    Returns:
+        dictionary (bucket name, file name) => list of records (exception if file could not be read)
+    """
+    files = {}
+    for bucket_name in set(bucket_name for _, bucket_name, _ in items):
+        file_names = set(file_name for _, bucket, file_name in items if bucket == bucket_name)
+
+        for file_name, body, error in S3.get_many(bucket_name, file_names, max_workers=MAX_WORKERS, client=client):
+            if error is None:
+                try:
+                    # old format => one car per JSON file, new format => compressed NDJSON batch of cars
+                    records = read_batch(body, file_name) if is_batch_file(file_name) else [json.loads(body)]
+                except Exception as e:
+                    error = e
+
+            if error is not None:
+                logger.error(f'{bucket_name}/{file_name} could not be read: {error}')
+                files[(bucket_name, file_name)] = error
+            else:
+                files[(bucket_name, file_name)] = records
+
+    return files
+
 def lambda_handler(event, context):
-    bucket_name = event['Records'][0]['s3']['bucket']['name']
-    file_name = urllib.parse.unquote_plus(event['Records'][0]['s3']['object']['key'], encoding='utf-8')
-    
-    try:
-        logger.info(f'Getting car data from {bucket_name}/{file_name}...')
-        car_data = S3.get_file_from_bucket(
-            bucket_name = bucket_name, 
-            file_name = file_name, 
-            as_json = True, 
-            client = client)
-        
-        car = CarvagoDataParser(car_data)
-        car_id = car.car_details['id']
-        logger.info(f'Parsing car ({car_id}) data...')
-        
-        df_car_details = car.get_details()
-        df_car_price = car.get_current_price()
-        df_car_features = car.get_features()
-        df_car_photos = car.get_photos()
-        
-        logger.info(f'Removing car ({car_id}) from database tables...')
-        CarsTable.delete_by_id(car_id)
-        FeaturesTable.delete_by_id(car_id)
-        PhotosTable.delete_by_id(car_id)
-        
-        logger.info(f'Inserting car ({car_id}) from database tables...')
-        CarsTable.insert_many(df_car_details)
-        PriceHistoryTable.insert_many(df_car_price)
-        FeaturesTable.insert_many(df_car_features)
-        PhotosTable.insert_many(df_car_photos)
-    
-    except Exception as e:
-        logger.info('Exception occured!!')
-    
-    logger.info(f'Car ({car_id}) processed succesfully!!')
-    
+    items = get_event_items(event)
+    logger.info(f'Processing {len(items)} files...')
+
+    files = get_files(items)
+    failed = set()
+
+    cars = {}
+    prices = []
+    # items which rows are written => they fail if their write fails
+    car_items, items_with_prices = defaultdict(set), set()
+
+    for item_id, bucket_name, file_name in items:
+        records = files[(bucket_name, file_name)]
+        if isinstance(records, Exception):
+            failed.add(item_id)
+            continue
+
+        base_name = file_name.split('/')[-1]
+        try:
+            # price sweep => prices of all cars from search cards stored in one file
+            if base_name.startswith('price_sweep_'):
+                item_prices = CarvagoPriceSweepParser(records[0]).get_prices(as_dataframe=False)
+                item_cars = []
+
+            # unchanged cars => scraper stored only prices from search cards
+            elif base_name.startswith('price_snapshot_'):
+                item_prices = CarvagoPriceSweepParser({'prices': records}).get_prices(as_dataframe=False)
+                item_cars = []
+
+            # parse everything before any row is written => broken file fails only its own item
+            else:
+                item_prices = []
+                item_cars = [CarvagoDataParser(car_data).get_car() for car_data in records]
+
+        except Exception as e:
+            logger.exception(f'{bucket_name}/{file_name} could not be parsed!!')
+            failed.add(item_id)
+            continue
+
+        # car in more files of one batch => the newest details are stored, older prices go to price history
+        for car in item_cars:
+            car_id = car['details'].id
+            if car_id in cars and cars[car_id]['price'].datetime > car['price'].datetime:
+                item_prices.append(car['price'])
+                continue
+
+            if car_id in cars:
+                prices.append(cars[car_id]['price'])
+                items_with_prices |= car_items[car_id]
+
+            cars[car_id] = car
+            car_items[car_id].add(item_id)
+
+        prices += item_prices
+        if item_prices:
+            items_with_prices.add(item_id)
+
+    logger.info(f'Writing {len(cars)} cars and {len(prices)} prices to database...')
+
+    # car, its price, features and photos are written in one transaction
+    if cars:
+        try:
+            CarsTable.upsert_many(list(cars.values()))
+        except Exception as e:
+            logger.exception('Writing of batch failed => cars are written one by one!!')
+
+            for car_id, car in cars.items():
+                try:
+                    CarsTable.upsert(car)
+                except Exception as e:
+                    logger.exception(f'Writing of car ({car_id}) failed!!')
+                    failed |= car_items[car_id]
+
+    if prices:
+        try:
+            PriceHistoryTable.replace_many(prices)
+        except Exception as e:
+            logger.exception(f'Writing to {PriceHistoryTable.TABLE_NAME} failed!!')
+            failed |= items_with_prices
+
+    logger.info(f'{len(items)} files processed, {len(failed)} items failed!!')
+
+    # S3 event has no item identifiers => whole event is retried
+    if None in failed:
+        raise Exception('Processing of S3 event failed!!')
+
+    # SQS event => only failed messages are retried (ReportBatchItemFailures has to be enabled)
     return {
-        'statusCode': 200,
-        'body': car_data
+        'batchItemFailures': [{'itemIdentifier': item_id} for item_id in sorted(failed)]
     }
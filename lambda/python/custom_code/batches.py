@@ -0,0 +1,46 @@
+import gzip
+import json
+
+BATCH_EXTENSIONS = ('.ndjson', '.ndjson.gz', '.ndjson.zst')
+
+def is_batch_file(file_name):
+    """
+    Returns True if file is NDJSON batch of records (otherwise it is single JSON record)
+    """
+    return file_name.endswith(BATCH_EXTENSIONS)
+
+def decompress(body, file_name):
+    """
+    Decompress batch body by its file extension
+
+    Params:
+        body (bytes): content of batch file
+        file_name (str): name of batch file
+
+    Returns:
+        bytes
+    """
+    if file_name.endswith('.gz'):
+        return gzip.decompress(body)
+
+    if file_name.endswith('.zst'):
+        # zstandard is needed only when scraper uploads zstd batches
+        import zstandard
+        return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+
+    return body
+
+def read_batch(body, file_name):
+    """
+    Read records from NDJSON batch
+
+    Params:
+        body (bytes): content of batch file
+        file_name (str): name of batch file
+
+    Returns:
+        list with records
+    """
+    lines = decompress(body, file_name).decode('utf-8').split('\n')
+
+    return [json.loads(line) for line in lines if line.strip()]
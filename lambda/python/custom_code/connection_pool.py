@@ -0,0 +1,105 @@
+import pymysql
+import time
+import queue
+import logging
+import threading
+import contextlib
+
+logger = logging.getLogger(__name__)
+
+class ConnectionManager:
+    def __init__(self, connection_string, pool_size=1, max_idle_seconds=30, timeout=None):
+        """
+        Bounded thread-safe pool of persistent connections
+        
+        Connections are kept open between queries (and between warm lambda invocations) and checked
+        with ping when they were idle for too long, stale connections are reconnected
+        
+        Params:
+            connection_string (dict): pymysql.connect arguments
+            pool_size (int): maximal number of open connections
+            max_idle_seconds (float): connection idle for longer time is pinged before use
+            timeout (float): maximal time to wait for free connection (None => wait forever)
+        """
+        self.CONNECTION_STRING = connection_string
+        self.POOL_SIZE = pool_size
+        self.MAX_IDLE_SECONDS = max_idle_seconds
+        self.TIMEOUT = timeout
+        
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._idle = queue.LifoQueue()
+    
+    def _get_healthy_connection(self):
+        try:
+            conn, last_used = self._idle.get_nowait()
+        except queue.Empty:
+            return pymysql.connect(**self.CONNECTION_STRING)
+        
+        if time.monotonic() - last_used > self.MAX_IDLE_SECONDS:
+            try:
+                # stale connection (e.g. closed by wait_timeout) => reconnect
+                conn.ping(reconnect=True)
+            except Exception as e:
+                logger.warning(f'Reconnecting stale connection: {e}')
+                ConnectionManager._close(conn)
+                return pymysql.connect(**self.CONNECTION_STRING)
+        
+        return conn
+    
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+    
+    @contextlib.contextmanager
+    def connection(self):
+        """
+        Borrow connection from pool (it is returned to pool after with block,
+        uncommitted changes are rolled back => commit writes inside with block)
+        """
+        if not self._slots.acquire(timeout=self.TIMEOUT):
+            raise TimeoutError('No free database connection!')
+        
+        conn = None
+        try:
+            conn = self._get_healthy_connection()
+            yield conn
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            # broken connection is not returned to pool
+            if conn is not None:
+                ConnectionManager._close(conn)
+                conn = None
+            raise
+        except Exception:
+            if conn is not None:
+                try:
+                    conn.rollback()
+                except Exception:
+                    ConnectionManager._close(conn)
+                    conn = None
+            raise
+        else:
+            # uncommitted transaction keeps REPEATABLE READ snapshot => next user of connection would read old data
+            try:
+                conn.rollback()
+            except Exception:
+                ConnectionManager._close(conn)
+                conn = None
+        finally:
+            if conn is not None:
+                self._idle.put((conn, time.monotonic()))
+            self._slots.release()
+    
+    def close_all(self):
+        """
+        Close all idle connections
+        """
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            ConnectionManager._close(conn)
+
@@ -1,65 +1,269 @@
 import datetime as dt
-import pandas as pd
+
+from typing import NamedTuple, Optional
+
+# rows have the same fields as database tables => they are inserted without pandas
+# (pandas is imported only when as_dataframe=True, it is not needed in lambda)
+
+class CarDetails(NamedTuple):
+    id: str
+    url: str
+    make: str
+    model: str
+    color: str
+    interior_colour: str
+    body: str
+    power: Optional[int]
+    drive_type: str
+    transmission: str
+    mileage: Optional[int]
+    registration: dt.datetime
+
+class Price(NamedTuple):
+    id: str
+    datetime: dt.datetime
+    price: float
+
+class Feature(NamedTuple):
+    id: str
+    feature: str
+
+class Photo(NamedTuple):
+    id: str
+    url: str
+
+def to_int(value):
+    value = value.strip()
+    
+    return int(value) if value.isdigit() else None
+
+def to_dataframe(rows, fields):
+    import pandas as pd
+    
+    return pd.DataFrame(rows, columns=list(fields))
+
 
 class CarvagoDataParser:
     def __init__(self, car_details):
         self.car_details = car_details
         
     def get_details(self, as_dataframe=True):
-        data = {
-            'id': self.car_details['id'],
-            'url': self.car_details['url'],
-            'make': self.car_details['make'],
-            'model': self.car_details['model'],
-            'color': self.car_details['body_color'],
-            'interior_colour': self.car_details['interior_colour'],
-            'body': self.car_details['body'],
-            'power': self.car_details['power'].replace('kW','').strip(),
-            'drive_type': self.car_details['drive_type'],
-            'transmission': self.car_details['transmission'],
-            'mileage': self.car_details['kms_driven'].replace('km', '').replace(' ', ''),
-            'registration': dt.datetime.strptime(self.car_details.get('first_registration','01/2017'), '%m/%Y')
-        }
+        data = CarDetails(
+            id=self.car_details['id'],
+            url=self.car_details['url'],
+            make=self.car_details['make'],
+            model=self.car_details['model'],
+            color=self.car_details['body_color'],
+            interior_colour=self.car_details['interior_colour'],
+            body=self.car_details['body'],
+            power=to_int(self.car_details['power'].replace('kW','')),
+            drive_type=self.car_details['drive_type'],
+            transmission=self.car_details['transmission'],
+            mileage=to_int(self.car_details['kms_driven'].replace('km', '').replace(' ', '')),
+            registration=dt.datetime.strptime(self.car_details.get('first_registration','01/2017'), '%m/%Y')
+        )
         
         if as_dataframe:
-            df = pd.DataFrame([data])
-            df['registration'] = pd.to_datetime(df['registration'])
-            return df
+            return to_dataframe([data], CarDetails._fields)
         
         return data
            
     def get_current_price(self, as_dataframe=True):
-        data = {
-            'id': self.car_details['id'],
-            'datetime': self.car_details['datetime'],
-            'price': self.car_details['price']
-        }
+        data = Price(
+            id=self.car_details['id'],
+            datetime=dt.datetime.strptime(self.car_details['datetime'], '%Y%m%d%H%M%S'),
+            price=self.car_details['price']
+        )
         
         if as_dataframe:
-            df = pd.DataFrame([data])
-            df['datetime'] = pd.to_datetime(df['datetime'])
-            return df
+            return to_dataframe([data], Price._fields)
         
         return data
     
     def get_features(self, as_dataframe=True):
-        features = self.car_details['features']
         id_ = self.car_details['id']
+        data = [Feature(id_, feature) for feature in self.car_details['features']]
         
         if as_dataframe:
-            df = pd.DataFrame(features, columns=['feature'])
-            df['id'] = id_
-            return df
+            return to_dataframe(data, Feature._fields)
         
-        return list(zip(features,[id_]*len(features)))
+        return data
     
     def get_photos(self, as_dataframe=True):
-        photos = self.car_details['photos']
         id_ = self.car_details['id']
+        data = [Photo(id_, url) for url in self.car_details['photos']]
+        
+        if as_dataframe:
+            return to_dataframe(data, Photo._fields)
+        
+        return data
+    
+    def get_car(self):
+        """
+        Returns car in format of CarsTable.upsert (CarDetails, Price, list of features and list of photos)
+        """
+        return {
+            'details': self.get_details(as_dataframe=False),
+            'price': self.get_current_price(as_dataframe=False),
+            'features': list(self.car_details['features']),
+            'photos': list(self.car_details['photos'])
+        }
+
+class CarvagoPriceSweepParser:
+    def __init__(self, price_sweep):
+        self.price_sweep = price_sweep
+        
+    def get_prices(self, as_dataframe=True):
+        # batch of price snapshots => every price has its own datetime
+        current_time = self.price_sweep.get('datetime')
+        data = [
+            Price(
+                id=car['id'],
+                datetime=dt.datetime.strptime(car.get('datetime', current_time), '%Y%m%d%H%M%S'),
+                price=car['price']
+            )
+            for car in self.price_sweep['prices']
+        ]
         
         if as_dataframe:
-            df = pd.DataFrame(photos, columns=['url'])
-            df['id'] = id_
-            return df
+            return to_dataframe(data, Price._fields)
+        
+        return data
+
+class CarvagoBatchParser:
+    # raw key => column of cars table
+    DETAILS_KEYS = {
+        'id': 'id',
+        'url': 'url',
+        'make': 'make',
+        'model': 'model',
+        'body_color': 'color',
+        'interior_colour': 'interior_colour',
+        'body': 'body',
+        'power': 'power',
+        'drive_type': 'drive_type',
+        'transmission': 'transmission',
+        'kms_driven': 'mileage',
+        'first_registration': 'registration',
+    }
+    REQUIRED_KEYS = [key for key in DETAILS_KEYS if key != 'first_registration'] + ['datetime', 'price', 'features', 'photos']
+    
+    def __init__(self, records):
+        """
+        Parse many raw car documents at once into columnar tables (cars, price_history, features, photos)
+        
+        Values are cleaned column by column with pandas, invalid records are rejected with reason 
+        instead of failing the whole batch. Car stored more times in batch => its newest version is kept
+        
+        Params:
+            records (list): raw car dictionaries stored by scraper
+        """
+        self.records = records
+        self.rejected = []
+        self._tables = None
+        
+    def _reject(self, positions, ids, reason):
+        self.rejected += [{'index': int(position), 'id': id_, 'reason': reason} for position, id_ in zip(positions, ids)]
+        
+    def _get_valid_records(self):
+        valid = []
+        for position, record in enumerate(self.records):
+            if not isinstance(record, dict):
+                self._reject([position], [None], 'record is not dictionary')
+                continue
+            
+            missing = [key for key in self.REQUIRED_KEYS if key not in record]
+            if missing:
+                self._reject([position], [record.get('id')], f"missing keys: {', '.join(missing)}")
+            elif not isinstance(record['features'], list) or not isinstance(record['photos'], list):
+                self._reject([position], [record['id']], 'features or photos are not list')
+            else:
+                valid.append(position)
+        
+        return valid
+    
+    def _parse(self):
+        import numpy as np
+        import pandas as pd
+        
+        positions = self._get_valid_records()
+        records = [self.records[position] for position in positions]
+        
+        df = pd.DataFrame({
+            column: [record.get(key) for record in records] for key, column in self.DETAILS_KEYS.items()
+        })
+        df['datetime'] = [record['datetime'] for record in records]
+        df['price'] = [record['price'] for record in records]
+        df['position'] = positions
+        
+        # values which are not whole non-negative numbers (e.g. '110.5 kW') => NULL (the same as to_int)
+        def to_int_column(values):
+            values = pd.to_numeric(values, errors='coerce')
+            
+            return values.where((values % 1 == 0) & (values >= 0)).astype('Int64')
+        
+        df['power'] = to_int_column(df['power'].astype(str).str.replace('kW', '', regex=False).str.strip())
+        df['mileage'] = to_int_column(df['mileage'].astype(str).str.replace(r'km|\s', '', regex=True))
+        df['registration'] = pd.to_datetime(df['registration'].fillna('01/2017').astype(str), format='%m/%Y', errors='coerce')
+        df['datetime'] = pd.to_datetime(df['datetime'].astype(str), format='%Y%m%d%H%M%S', errors='coerce')
+        # price_history.price is DECIMAL(12,2) => decimal prices are kept, only non-numeric are rejected
+        df['price'] = pd.to_numeric(df['price'], errors='coerce')
+        
+        for column, reason in [('id', 'missing id'), ('registration', 'invalid first_registration'), 
+                               ('datetime', 'invalid datetime'), ('price', 'invalid price')]:
+            invalid = df[column].isna()
+            self._reject(df.loc[invalid, 'position'], df.loc[invalid, 'id'], reason)
+            df = df[~invalid]
+        
+        prices = df[list(Price._fields)].drop_duplicates(['id', 'datetime'], keep='last')
+        
+        # newest version of every car => its details, features and photos
+        cars = df.sort_values('datetime', kind='stable').drop_duplicates('id', keep='last')
+        
+        def explode(key, column):
+            values = [self.records[position][key] for position in cars['position']]
+            lengths = np.fromiter((len(value) for value in values), dtype=np.int64, count=len(values))
+            
+            return pd.DataFrame({
+                'id': np.repeat(cars['id'].to_numpy(), lengths),
+                column: [item for value in values for item in value]
+            })
+        
+        self._tables = {
+            'cars': cars[list(CarDetails._fields)].reset_index(drop=True),
+            'price_history': prices.reset_index(drop=True),
+            'features': explode('features', 'feature'),
+            'photos': explode('photos', 'url'),
+        }
+        self.rejected.sort(key=lambda rejected: rejected['index'])
+    
+    def get_tables(self):
+        """
+        Returns:
+            dictionary table name => dataframe with table columns
+        """
+        if self._tables is None:
+            self._parse()
+        
+        return self._tables
+    
+    def get_cars(self):
+        return self.get_tables()['cars']
+    
+    def get_prices(self):
+        return self.get_tables()['price_history']
+    
+    def get_features(self):
+        return self.get_tables()['features']
+    
+    def get_photos(self):
+        return self.get_tables()['photos']
+    
+    def get_rejected(self):
+        """
+        Returns:
+            list of dictionaries with index of record, its id and reason of rejection
+        """
+        self.get_tables()
         
-        return list(zip(photos,[id_]*len(photos)))
\ No newline at end of file
+        return self.rejected
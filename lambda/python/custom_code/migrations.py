@@ -0,0 +1,275 @@
+import logging
+
+from custom_code.mysql_db import (BaseTable, CarsTable, PriceHistoryTable, FeaturesTable, PhotosTable, 
+                                  FeatureDictionaryTable, CarFeaturesTable)
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_TABLE_NAME = 'schema_migrations'
+CREATE_MIGRATIONS_SQL = f'''CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE_NAME}(
+                                version         INTEGER,
+                                description     VARCHAR(256),
+                                applied_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                                PRIMARY KEY (version)
+                            )'''
+
+
+class RequireNotNull:
+    def __init__(self, table_name, columns):
+        """
+        Delete rows with NULL in any of columns and declare columns NOT NULL (needed before primary key is added),
+        every column should be indexed => rows are found without full table scan
+
+        Params:
+            table_name (str): name of table
+            columns (list): columns of future primary key
+        """
+        self.table_name = table_name
+        self.columns = columns
+
+    def __str__(self):
+        return f"require not null {self.table_name} ({', '.join(self.columns)})"
+
+    def __call__(self, cur):
+        # row without key can not be updated or linked to car => it is removed
+        # one DELETE per column => every DELETE uses index of its column (OR condition would scan the table)
+        deleted = sum(cur.execute(f"DELETE FROM {self.table_name} WHERE `{col}` IS NULL") for col in self.columns)
+        logger.info(f'{self}: {deleted} rows with NULL key removed')
+
+        cur.execute(
+            f"""SELECT COLUMN_NAME AS name, COLUMN_TYPE AS type, DATA_TYPE AS data_type
+                FROM information_schema.COLUMNS
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND IS_NULLABLE = 'YES'
+                AND COLUMN_NAME IN ({', '.join(['%s'] * len(self.columns))})""",
+            [self.table_name] + list(self.columns)
+        )
+        for column in cur.fetchall():
+            definition = f"{column['type']} NOT NULL"
+            if column['data_type'] == 'timestamp':
+                # explicit default => no implicit ON UPDATE CURRENT_TIMESTAMP (explicit_defaults_for_timestamp=OFF)
+                definition += ' DEFAULT CURRENT_TIMESTAMP'
+
+            cur.execute(f"ALTER TABLE {self.table_name} MODIFY `{column['name']}` {definition}, ALGORITHM=INPLACE, LOCK=NONE")
+            logger.info(f"{self}: {column['name']} is NOT NULL")
+
+
+class Deduplicate:
+    def __init__(self, table_name, key_cols):
+        """
+        Keep one row for every duplicated key (needed before unique key is added),
+        key columns should be indexed => duplicated keys are found and removed without full table scans
+
+        Params:
+            table_name (str): name of table
+            key_cols (list): columns of future unique key
+        """
+        self.table_name = table_name
+        self.key_cols = key_cols
+
+    def __str__(self):
+        return f"deduplicate {self.table_name} ({', '.join(self.key_cols)})"
+
+    def __call__(self, cur):
+        keys = ', '.join(self.key_cols)
+        cur.execute(f"SELECT {keys} FROM {self.table_name} GROUP BY {keys} HAVING COUNT(*) > 1")
+        duplicated_keys = cur.fetchall()
+
+        # only duplicated keys are touched => table is not locked for the whole migration
+        for key in duplicated_keys:
+            # NULL-safe comparison => NULL keys are deduplicated too
+            condition = ' AND '.join(f'`{col}` <=> %s' for col in self.key_cols)
+            params = [key[col] for col in self.key_cols]
+
+            cur.execute(f"SELECT * FROM {self.table_name} WHERE {condition} LIMIT 1", params)
+            row = cur.fetchone()
+            if row is None:
+                continue
+
+            cur.execute(f"DELETE FROM {self.table_name} WHERE {condition}", params)
+            cur.execute(
+                f"INSERT INTO {self.table_name} ({', '.join(f'`{col}`' for col in row)}) VALUES ({', '.join(['%s'] * len(row))})",
+                list(row.values())
+            )
+
+        logger.info(f'{self}: {len(duplicated_keys)} duplicated keys removed')
+
+
+class AddIndex:
+    def __init__(self, table_name, index_name, columns, primary=False):
+        """
+        Add index online (concurrent reads and writes are allowed), existing index is skipped
+
+        Params:
+            table_name (str): name of table
+            index_name (str): name of index (PRIMARY for primary key)
+            columns (str): indexed columns (e.g. 'feature(191), id')
+            primary (bool): if True => primary key is added
+        """
+        self.table_name = table_name
+        self.index_name = 'PRIMARY' if primary else index_name
+        self.columns = columns
+        self.primary = primary
+
+    def __str__(self):
+        return f'add index {self.index_name} on {self.table_name} ({self.columns})'
+
+    def __call__(self, cur):
+        cur.execute(
+            '''SELECT 1 FROM information_schema.STATISTICS
+               WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s LIMIT 1''',
+            (self.table_name, self.index_name)
+        )
+        if cur.fetchone():
+            logger.info(f'{self}: already exists')
+            return
+
+        index = 'PRIMARY KEY' if self.primary else f'INDEX {self.index_name}'
+        cur.execute(f'ALTER TABLE {self.table_name} ADD {index} ({self.columns}), ALGORITHM=INPLACE, LOCK=NONE')
+        logger.info(f'{self}: created')
+
+
+class DropIndex:
+    def __init__(self, table_name, index_name):
+        """
+        Drop index online (concurrent reads and writes are allowed), missing index is skipped
+
+        Params:
+            table_name (str): name of table
+            index_name (str): name of index
+        """
+        self.table_name = table_name
+        self.index_name = index_name
+
+    def __str__(self):
+        return f'drop index {self.index_name} on {self.table_name}'
+
+    def __call__(self, cur):
+        cur.execute(
+            '''SELECT 1 FROM information_schema.STATISTICS
+               WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s LIMIT 1''',
+            (self.table_name, self.index_name)
+        )
+        if not cur.fetchone():
+            logger.info(f'{self}: does not exist')
+            return
+
+        cur.execute(f'ALTER TABLE {self.table_name} DROP INDEX {self.index_name}, ALGORITHM=INPLACE, LOCK=NONE')
+        logger.info(f'{self}: dropped')
+
+
+# the same hash as FeatureDictionaryTable.get_hash (features.feature can have other charset than utf8mb4)
+FEATURE_HASH_SQL = 'UNHEX(SHA2(CONVERT({column} USING utf8mb4), 256))'
+
+# features.feature is case insensitive => distinct values are compared with binary collation
+FILL_FEATURE_DICTIONARY_SQL = f"""INSERT IGNORE INTO {FeatureDictionaryTable.TABLE_NAME} (feature, feature_hash) 
+    SELECT f.feature, {FEATURE_HASH_SQL.format(column='f.feature')}
+    FROM (
+        SELECT DISTINCT CONVERT(feature USING utf8mb4) COLLATE utf8mb4_bin AS feature 
+        FROM {FeaturesTable.TABLE_NAME} 
+        WHERE feature IS NOT NULL
+    ) AS f"""
+
+FILL_CAR_FEATURES_SQL = f"""INSERT IGNORE INTO {CarFeaturesTable.TABLE_NAME} (id, feature_id) 
+    SELECT ft.id, fd.feature_id 
+    FROM {FeaturesTable.TABLE_NAME} AS ft
+    INNER JOIN {FeatureDictionaryTable.TABLE_NAME} AS fd
+    ON fd.feature_hash = {FEATURE_HASH_SQL.format(column='ft.feature')}"""
+
+# (version, description, steps), steps are SQL strings or callables with cursor argument
+# every step has to be idempotent => interrupted migration can be run again
+MIGRATIONS = [
+    # key columns are indexed first => NULL and duplicated keys are removed without full table scans,
+    # temporary key indexes are dropped when primary keys exist
+    (1, 'primary keys', [
+        AddIndex(CarsTable.TABLE_NAME, 'cars_id_key', 'id'),
+        RequireNotNull(CarsTable.TABLE_NAME, ['id']),
+        Deduplicate(CarsTable.TABLE_NAME, ['id']),
+        AddIndex(CarsTable.TABLE_NAME, None, 'id', primary=True),
+        DropIndex(CarsTable.TABLE_NAME, 'cars_id_key'),
+        AddIndex(PriceHistoryTable.TABLE_NAME, 'price_history_id_datetime_key', 'id, datetime'),
+        # NULL datetime can not be found by (id, datetime) index, index is kept for dashboard queries
+        AddIndex(PriceHistoryTable.TABLE_NAME, 'price_history_datetime', 'datetime'),
+        RequireNotNull(PriceHistoryTable.TABLE_NAME, ['id', 'datetime']),
+        Deduplicate(PriceHistoryTable.TABLE_NAME, ['id', 'datetime']),
+        AddIndex(PriceHistoryTable.TABLE_NAME, None, 'id, datetime', primary=True),
+        DropIndex(PriceHistoryTable.TABLE_NAME, 'price_history_id_datetime_key'),
+    ]),
+    (2, 'secondary indexes for dashboard queries', [
+        AddIndex(CarsTable.TABLE_NAME, 'cars_make_model', 'make, model'),
+        AddIndex(CarsTable.TABLE_NAME, 'cars_model', 'model'),
+        AddIndex(FeaturesTable.TABLE_NAME, 'features_id', 'id'),
+        AddIndex(FeaturesTable.TABLE_NAME, 'features_feature_id', 'feature(191), id'),
+        AddIndex(PhotosTable.TABLE_NAME, 'photos_id', 'id'),
+    ]),
+    # old features table is kept (it is not written anymore) until dashboard runs on car_features
+    (3, 'feature dictionary and car_features bridge table', [
+        FeatureDictionaryTable.CREATE_SQL,
+        CarFeaturesTable.CREATE_SQL,
+        FILL_FEATURE_DICTIONARY_SQL,
+        FILL_CAR_FEATURES_SQL,
+    ]),
+]
+
+
+def get_applied_versions():
+    with BaseTable.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(CREATE_MIGRATIONS_SQL)
+            cur.execute(f'SELECT version FROM {MIGRATIONS_TABLE_NAME}')
+            versions = set(row['version'] for row in cur.fetchall())
+        conn.commit()
+
+    return versions
+
+def get_pending_migrations(target_version=None):
+    applied_versions = get_applied_versions()
+
+    return [
+        (version, description, steps) for version, description, steps in MIGRATIONS
+        if version not in applied_versions and (target_version is None or version <= target_version)
+    ]
+
+def migrate(target_version=None, dry_run=False):
+    """
+    Apply pending migrations in order of their versions
+
+    Params:
+        target_version (int): apply migrations up to this version (None => all)
+        dry_run (bool): if True => only print pending migrations
+
+    Returns:
+        list of applied versions
+    """
+    applied = []
+    for version, description, steps in get_pending_migrations(target_version):
+        logger.info(f'Migration {version}: {description}')
+
+        if dry_run:
+            for step in steps:
+                logger.info(f'  {step}')
+            continue
+
+        # DDL statements are committed implicitly => version is stored only after all steps passed
+        with BaseTable.connection() as conn:
+            with conn.cursor() as cur:
+                for step in steps:
+                    if callable(step):
+                        step(cur)
+                    else:
+                        cur.execute(step)
+                    conn.commit()
+
+                cur.execute(
+                    f'INSERT INTO {MIGRATIONS_TABLE_NAME} (version, description) VALUES (%s, %s)',
+                    (version, description)
+                )
+            conn.commit()
+
+        applied.append(version)
+        logger.info(f'Migration {version} applied!!')
+
+    # columns of tables could change
+    for table in (CarsTable, PriceHistoryTable, FeaturesTable, PhotosTable, FeatureDictionaryTable, CarFeaturesTable):
+        table.clear_schema_cache()
+
+    return applied
@@ -1,7 +1,11 @@
-import pandas as pd
 import pymysql
 import os
+import hashlib
 import logging
+import threading
+
+from collections import defaultdict
+from custom_code.connection_pool import ConnectionManager
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +17,14 @@ CONNECTION_STRING = {
     'cursorclass': pymysql.cursors.DictCursor
 }
 
+# one persistent connection => it is reused by warm lambda invocations
+CONNECTIONS = ConnectionManager(CONNECTION_STRING, pool_size=int(os.getenv('MYSQL_POOL_SIZE', 1)))
+
+# table name => list of (column name, data type), loaded from information_schema once per process
+SCHEMA_CACHE = {}
+SCHEMA_LOCK = threading.Lock()
+
+
 class BaseTable:
     TABLE_NAME = 'test_table'
     CREATE_SQL = f'''CREATE TABLE IF NOT EXISTS {TABLE_NAME}(
@@ -22,36 +34,98 @@ class BaseTable:
                         int_col        INTEGER
                     )'''
     
+    @classmethod
+    def get_columns(cls):
+        """
+        Returns list of (column name, data type) in table order (cached for whole process)
+        """
+        with SCHEMA_LOCK:
+            if cls.TABLE_NAME not in SCHEMA_CACHE:
+                SQL = """SELECT COLUMN_NAME AS name, DATA_TYPE AS type 
+                         FROM information_schema.COLUMNS 
+                         WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s 
+                         ORDER BY ORDINAL_POSITION"""
+                
+                with cls.connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.execute(SQL, (cls.TABLE_NAME,))
+                        rows = cur.fetchall()
+                
+                if not rows:
+                    raise Exception(f'Table {cls.TABLE_NAME} does not exist!!!')
+                
+                SCHEMA_CACHE[cls.TABLE_NAME] = [(row['name'].lower(), row['type'].lower()) for row in rows]
+            
+            return SCHEMA_CACHE[cls.TABLE_NAME]
+    
+    @classmethod
+    def get_column_names(cls):
+        return [name for name, _ in cls.get_columns()]
+    
+    @classmethod
+    def clear_schema_cache(cls):
+        with SCHEMA_LOCK:
+            SCHEMA_CACHE.pop(cls.TABLE_NAME, None)
+    
     @classmethod
     def get_total_cols(cls):
-        return int(
-            len(
-                cls.CREATE_SQL[cls.CREATE_SQL.find('(') + 1: cls.CREATE_SQL.rfind(')')].split()
-            )
-            /2
-        )
+        return len(cls.get_columns())
+    
+    @classmethod
+    def get_insert_sql(cls):
+        cols = cls.get_column_names()
+        
+        return f"""INSERT INTO {cls.TABLE_NAME} ({','.join(f'`{col}`' for col in cols)}) VALUES ({','.join(['%s']*len(cols))})"""
            
     @classmethod
     def create_connection(cls):
         return pymysql.connect(**CONNECTION_STRING)
     
     @classmethod
-    def prepare_data_to_insert(cls, df):
+    def connection(cls):
+        """
+        Borrow persistent connection from pool
+        """
+        return CONNECTIONS.connection()
+    
+    @classmethod
+    def prepare_data_to_insert(cls, data):
+        """
+        Convert data to list of tuples in order of table columns
+        
+        Params:
+            data (pd.DataFrame or list): dataframe or rows (named tuples, dictionaries or tuples in order of columns)
+        """
         # zoradi stplce podla db
-        cols = cls.get_data_from_query(f'SELECT * FROM {cls.TABLE_NAME} LIMIT 1').columns
-        df.columns = [col.lower() for col in df.columns]
-        df_to_db = df[cols]
+        cols = cls.get_column_names()
+        
+        if hasattr(data, 'columns'):
+            data.columns = [col.lower() for col in data.columns]
+            return cls.df2ListOfTuples(data[cols])
         
-        return cls.df2ListOfTuples(df_to_db)
+        return [cls.row2tuple(row, cols) for row in data]
+    
+    @staticmethod
+    def row2tuple(row, cols):
+        if hasattr(row, '_fields'):
+            return tuple(getattr(row, col) for col in cols)
+        
+        if isinstance(row, dict):
+            return tuple(row[col] for col in cols)
+        
+        return tuple(row)
     
     @staticmethod
     def df2ListOfTuples(df):
+        # pandas is imported only for dataframes => it is not loaded by lambda
+        import pandas as pd
+        
         return list(df.astype(object).where(pd.notnull(df), None).itertuples(index=False))
     
     @classmethod
     def execute_query(cls, SQL, message=None):
         try:
-            with cls.create_connection() as conn:
+            with cls.connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute(SQL)
                     conn.commit()
@@ -67,8 +141,10 @@ class BaseTable:
             
     @classmethod
     def get_data_from_query(cls, query):
+        import pandas as pd
+        
         try:
-            with cls.create_connection() as con:
+            with cls.connection() as con:
                 return pd.read_sql(query, con)
         
         except Exception as e:
@@ -98,6 +174,7 @@ class BaseTable:
             message = f'{cls.TABLE_NAME} table created!!!'
 
         cls.execute_query(cls.CREATE_SQL, message)
+        cls.clear_schema_cache()
         
     @classmethod
     def drop(cls, message=None):
@@ -107,15 +184,17 @@ class BaseTable:
         SQL = f"DROP TABLE {cls.TABLE_NAME}"
 
         cls.execute_query(SQL, message)
+        cls.clear_schema_cache()
     
     @classmethod
-    def insert_many(cls,df):            
-        SQL = f"""INSERT INTO {cls.TABLE_NAME} VALUES ({','.join(['%s']*cls.get_total_cols())})"""
-        
-        values = cls.prepare_data_to_insert(df)
+    def insert_many(cls, data):            
+        SQL = f'INSERT INTO {cls.TABLE_NAME}'
             
         try:
-            with cls.create_connection() as conn:
+            SQL = cls.get_insert_sql()
+            values = cls.prepare_data_to_insert(data)
+            
+            with cls.connection() as conn:
                 with conn.cursor() as cur:
                     cur.executemany(SQL, values)
                     conn.commit()
@@ -124,6 +203,32 @@ class BaseTable:
         except Exception as e:
             logger.info(f"Query '{SQL}' failed!!!")
             logger.exception('Exception occured')
+    
+    @classmethod
+    def replace_many(cls, data, delete_ids=None):
+        """
+        Delete rows with delete_ids and insert rows from data (dataframe or rows) in one transaction
+        
+        Unlike insert_many, exception is raised (transaction is rolled back) => caller can retry the data
+        """
+        SQL = cls.get_insert_sql()
+        
+        values = cls.prepare_data_to_insert(data) if len(data) else []
+        
+        # connection manager rolls back transaction if anything fails
+        with cls.connection() as conn:
+            with conn.cursor() as cur:
+                if delete_ids:
+                    cur.execute(
+                        f"DELETE FROM {cls.TABLE_NAME} WHERE id IN ({','.join(['%s']*len(delete_ids))})", 
+                        list(delete_ids)
+                    )
+                
+                if values:
+                    cur.executemany(SQL, values)
+            
+            conn.commit()
+            logger.info(f'{cls.TABLE_NAME}: {len(delete_ids or [])} ids replaced, {len(values)} rows inserted succesfully')
             
 
 class CarsTable(BaseTable):
@@ -140,13 +245,114 @@ class CarsTable(BaseTable):
                         drive_type      VARCHAR(32),
                         transmission    VARCHAR(32),
                         mileage         INTEGER,
-                        registration    TIMESTAMP
+                        registration    TIMESTAMP,
+                        PRIMARY KEY (id),
+                        INDEX cars_make_model (make, model),
+                        INDEX cars_model (model)
                     )'''
     
     @classmethod
     def delete_by_id(cls, id_):
         SQL = f"DELETE FROM {cls.TABLE_NAME} WHERE id = '{id_}'"
         cls.execute_query(SQL)
+    
+    @classmethod
+    def upsert(cls, car):
+        cls.upsert_many([car])
+    
+    @classmethod
+    def upsert_many(cls, cars):
+        """
+        Write cars together with their price, features and photos in one transaction
+        
+        Cars are upserted (INSERT ... ON DUPLICATE KEY UPDATE), price is appended to price history,
+        features and photos of car are replaced only when they changed. Exception is raised 
+        (transaction is rolled back) => caller can retry the data
+        
+        Params:
+            cars (list): dictionaries with details (CarDetails), price (Price or None), features (list) and photos (list)
+        """
+        if not cars:
+            return
+        
+        # columns are loaded before connection is borrowed (schema query needs its own connection)
+        details_cols = cls.get_column_names()
+        update = ','.join(f'`{col}`=VALUES(`{col}`)' for col in details_cols if col != 'id')
+        details_SQL = f"{cls.get_insert_sql()} ON DUPLICATE KEY UPDATE {update}"
+        
+        price_cols = PriceHistoryTable.get_column_names()
+        price_SQL = PriceHistoryTable.get_insert_sql()
+        
+        # features are stored as ids from feature dictionary
+        feature_ids = FeatureDictionaryTable.get_ids(feature for car in cars for feature in car['features'])
+        
+        children = [
+            (CarFeaturesTable, 'feature_id', {
+                car['details'].id: sorted(set(feature_ids[feature] for feature in car['features'])) for car in cars
+            }),
+            (PhotosTable, 'url', {car['details'].id: car['photos'] for car in cars}),
+        ]
+        children = [(table, value_col, new_values, table.get_column_names(), table.get_insert_sql()) 
+                    for table, value_col, new_values in children]
+        
+        # rows are locked in the same order by all writers
+        cars = sorted(cars, key=lambda car: car['details'].id)
+        prices = [car['price'] for car in cars if car.get('price')]
+        
+        with cls.connection() as conn:
+            with conn.cursor() as cur:
+                cur.executemany(details_SQL, [cls.row2tuple(car['details'], details_cols) for car in cars])
+                
+                if prices:
+                    cur.executemany(price_SQL, [cls.row2tuple(price, price_cols) for price in prices])
+                
+                changed = {
+                    table.TABLE_NAME: table.replace_changed(cur, value_col, new_values, cols, insert_SQL)
+                    for table, value_col, new_values, cols, insert_SQL in children
+                }
+            
+            conn.commit()
+            logger.info(f'{len(cars)} cars upserted, {len(prices)} prices inserted, changed children: {changed}')
+
+
+class ChildTable(BaseTable):
+    @classmethod
+    def replace_changed(cls, cur, value_col, new_values, cols, insert_SQL):
+        """
+        Replace rows of cars which values changed (runs in transaction of given cursor)
+        
+        Params:
+            cur (pymysql.cursors.Cursor): cursor of running transaction
+            value_col (str): column with value (e.g. feature)
+            new_values (dict): car id => list of values
+            cols (list): table columns
+            insert_SQL (str): insert statement with explicit columns
+            
+        Returns:
+            number of cars which rows were replaced
+        """
+        ids = sorted(new_values)
+        placeholders = ','.join(['%s']*len(ids))
+        
+        cur.execute(f"SELECT id, `{value_col}` AS value FROM {cls.TABLE_NAME} WHERE id IN ({placeholders})", ids)
+        current_values = defaultdict(list)
+        for row in cur.fetchall():
+            current_values[row['id']].append(row['value'])
+        
+        changed_ids = [id_ for id_ in ids if sorted(current_values[id_]) != sorted(new_values[id_])]
+        if not changed_ids:
+            return 0
+        
+        cur.execute(
+            f"DELETE FROM {cls.TABLE_NAME} WHERE id IN ({','.join(['%s']*len(changed_ids))})", 
+            changed_ids
+        )
+        
+        rows = [{'id': id_, value_col: value} for id_ in changed_ids for value in new_values[id_]]
+        if rows:
+            cur.executemany(insert_SQL, [tuple(row[col] for col in cols) for row in rows])
+        
+        return len(changed_ids)
 
 
 class PriceHistoryTable(BaseTable):
@@ -154,20 +360,29 @@ class PriceHistoryTable(BaseTable):
     CREATE_SQL = f'''CREATE TABLE IF NOT EXISTS {TABLE_NAME}(
                         id          VARCHAR(48),
                         datetime    TIMESTAMP,
-                        price       DECIMAL(12,2)
+                        price       DECIMAL(12,2),
+                        PRIMARY KEY (id, datetime),
+                        INDEX price_history_datetime (datetime)
                     )'''
     
+    @classmethod
+    def get_insert_sql(cls):
+        # the same price can come again (retried batch) => insert is idempotent
+        return f"{super().get_insert_sql()} ON DUPLICATE KEY UPDATE price = VALUES(price)"
+    
     @classmethod
     def delete_by_id(cls, id_):
         SQL = f"DELETE FROM {cls.TABLE_NAME} WHERE id = '{id_}'"
         cls.execute_query(SQL)
         
 
-class FeaturesTable(BaseTable):
+class FeaturesTable(ChildTable):
     TABLE_NAME = 'features'
     CREATE_SQL = f'''CREATE TABLE IF NOT EXISTS {TABLE_NAME}(
                         id          VARCHAR(48),
-                        feature     TEXT
+                        feature     TEXT,
+                        INDEX features_id (id),
+                        INDEX features_feature_id (feature(191), id)
                     )'''
     
     @classmethod
@@ -176,14 +391,89 @@ class FeaturesTable(BaseTable):
         cls.execute_query(SQL)
 
 
-class PhotosTable(BaseTable):
+class PhotosTable(ChildTable):
     TABLE_NAME = 'photos'
     CREATE_SQL = f'''CREATE TABLE IF NOT EXISTS {TABLE_NAME}(
                         id          VARCHAR(48),
-                        url         TEXT
+                        url         TEXT,
+                        INDEX photos_id (id)
                     )'''
     
     @classmethod
     def delete_by_id(cls, id_):
         SQL = f"DELETE FROM {cls.TABLE_NAME} WHERE id = '{id_}'"
-        cls.execute_query(SQL)
\ No newline at end of file
+        cls.execute_query(SQL)
+
+
+class FeatureDictionaryTable(BaseTable):
+    TABLE_NAME = 'feature_dictionary'
+    # features have no length limit => unique key is sha256 of feature (case sensitive)
+    CREATE_SQL = f'''CREATE TABLE IF NOT EXISTS {TABLE_NAME}(
+                        feature_id      INTEGER AUTO_INCREMENT,
+                        feature         TEXT CHARACTER SET utf8mb4 COLLATE utf8mb4_bin,
+                        feature_hash    BINARY(32) NOT NULL,
+                        PRIMARY KEY (feature_id),
+                        UNIQUE INDEX feature_dictionary_feature_hash (feature_hash)
+                    )'''
+    
+    # feature => feature_id, ids never change => cache is valid for whole process
+    _ids = {}
+    _ids_lock = threading.Lock()
+    
+    @staticmethod
+    def get_hash(feature):
+        """
+        Returns sha256 of feature (the same as UNHEX(SHA2(feature, 256)) of utf8mb4 string in MySQL)
+        """
+        return hashlib.sha256(feature.encode('utf-8')).digest()
+    
+    @classmethod
+    def get_ids(cls, features):
+        """
+        Returns dictionary feature => feature_id, unknown features are added to dictionary 
+        (in own transaction => ids stay valid even if caller's transaction is rolled back)
+        """
+        features = set(features)
+        with cls._ids_lock:
+            missing = sorted(feature for feature in features if feature not in cls._ids)
+        
+        if missing:
+            hashes = {cls.get_hash(feature): feature for feature in missing}
+            with cls.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.executemany(
+                        f"INSERT IGNORE INTO {cls.TABLE_NAME} (feature, feature_hash) VALUES (%s, %s)", 
+                        [(feature, hash_) for hash_, feature in hashes.items()]
+                    )
+                    cur.execute(
+                        f"SELECT feature_id, feature_hash FROM {cls.TABLE_NAME} WHERE feature_hash IN ({','.join(['%s']*len(hashes))})", 
+                        list(hashes)
+                    )
+                    rows = cur.fetchall()
+                conn.commit()
+            
+            with cls._ids_lock:
+                cls._ids.update({hashes[bytes(row['feature_hash'])]: row['feature_id'] for row in rows})
+        
+        with cls._ids_lock:
+            unknown = [feature for feature in features if feature not in cls._ids]
+            if unknown:
+                raise Exception(f'Features {unknown} are not in {cls.TABLE_NAME}!!!')
+            
+            return {feature: cls._ids[feature] for feature in features}
+
+
+
+class CarFeaturesTable(ChildTable):
+    TABLE_NAME = 'car_features'
+    CREATE_SQL = f'''CREATE TABLE IF NOT EXISTS {TABLE_NAME}(
+                        id          VARCHAR(48),
+                        feature_id  INTEGER,
+                        PRIMARY KEY (id, feature_id),
+                        INDEX car_features_feature_id (feature_id, id)
+                    )'''
+    
+    @classmethod
+    def delete_by_id(cls, id_):
+        SQL = f"DELETE FROM {cls.TABLE_NAME} WHERE id = '{id_}'"
+        cls.execute_query(SQL)
@@ -0,0 +1,284 @@
+import re
+import sqlite3
+import logging
+
+from custom_code.s3 import S3
+from custom_code.batches import read_batch
+
+logger = logging.getLogger(__name__)
+
+# [dt=YYYY-MM-DD/]car_details_{id}_{datetime}.json, price_snapshot_{id}_{datetime}.json,
+# car_details_batch_{datetime}_{num}.ndjson.gz, price_snapshot_batch_{datetime}_{num}.ndjson.gz, price_sweep_{datetime}.json
+PARTITION_PATTERN = re.compile(r'^(?:.*/)?dt=(\d{4}-\d{2}-\d{2})/')
+KEY_PATTERNS = [
+    re.compile(r'^(?P<kind>car_details_batch|price_snapshot_batch)_(?P<timestamp>\d{14})_\d+\.ndjson(\.gz|\.zst)?$'),
+    re.compile(r'^(?P<kind>price_sweep)_(?P<timestamp>\d{14})\.json$'),
+    re.compile(r'^(?P<kind>car_details|price_snapshot)_(?P<car_id>.+)_(?P<timestamp>\d{14})\.json$'),
+]
+# keys of these kinds outside of date partitions sort by time => each kind is listed from its own last key
+FLAT_KINDS = ['car_details_batch', 'price_snapshot_batch', 'price_sweep']
+# records of these kinds are indexed by car id (price sweep contains every advertised car)
+BATCH_KINDS = ['car_details_batch', 'price_snapshot_batch']
+PARTITIONED = 'dt'
+
+
+class S3KeyManifest:
+    CREATE_SQL = ['''CREATE TABLE IF NOT EXISTS s3_keys(
+                        bucket          TEXT,
+                        key             TEXT,
+                        kind            TEXT,
+                        car_id          TEXT,
+                        timestamp       TEXT,
+                        date            TEXT,
+                        size            INTEGER,
+                        PRIMARY KEY (bucket, key)
+                    )''',
+                  'CREATE INDEX IF NOT EXISTS s3_keys_car_id ON s3_keys (bucket, car_id, timestamp)',
+                  'CREATE INDEX IF NOT EXISTS s3_keys_date ON s3_keys (bucket, date, timestamp)',
+                  # last key of partitioned keys and of every flat kind (dt=... and flat keys do not sort together)
+                  '''CREATE TABLE IF NOT EXISTS s3_listing_marks(
+                        bucket          TEXT,
+                        prefix          TEXT,
+                        style           TEXT,
+                        last_key        TEXT,
+                        PRIMARY KEY (bucket, prefix, style)
+                    )''',
+                  '''CREATE TABLE IF NOT EXISTS s3_batches(
+                        bucket          TEXT,
+                        key             TEXT,
+                        PRIMARY KEY (bucket, key)
+                    )''',
+                  '''CREATE TABLE IF NOT EXISTS s3_batch_cars(
+                        bucket          TEXT,
+                        key             TEXT,
+                        car_id          TEXT,
+                        PRIMARY KEY (bucket, key, car_id)
+                    )''',
+                  'CREATE INDEX IF NOT EXISTS s3_batch_cars_car_id ON s3_batch_cars (bucket, car_id)']
+
+    def __init__(self, path):
+        """
+        Local sqlite index of S3 keys by car id and timestamp
+
+        Params:
+            path (str): path to sqlite file
+        """
+        self.conn = sqlite3.connect(path)
+        for SQL in self.CREATE_SQL:
+            self.conn.execute(SQL)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    @staticmethod
+    def parse_key(key):
+        """
+        Parse kind, car id, timestamp and date from key
+
+        Returns:
+            dictionary (car_id is None for batches and price sweeps, kind is None for unknown keys)
+        """
+        file_name = key.split('/')[-1]
+        partition = PARTITION_PATTERN.match(key)
+
+        for pattern in KEY_PATTERNS:
+            match = pattern.match(file_name)
+            if match:
+                parsed = match.groupdict()
+                timestamp = parsed['timestamp']
+                return {
+                    'kind': parsed['kind'],
+                    'car_id': parsed.get('car_id'),
+                    'timestamp': timestamp,
+                    'date': partition.group(1) if partition else f'{timestamp[:4]}-{timestamp[4:6]}-{timestamp[6:8]}'
+                }
+
+        return {
+            'kind': None,
+            'car_id': None,
+            'timestamp': None,
+            'date': partition.group(1) if partition else None
+        }
+
+    def get_last_keys(self, bucket_name, prefix=''):
+        """
+        Returns:
+            dictionary {style: last listed key}, style is 'dt' for date partitions or kind of flat keys
+        """
+        rows = self.conn.execute(
+            'SELECT style, last_key FROM s3_listing_marks WHERE bucket = ? AND prefix = ?', (bucket_name, prefix)
+        )
+
+        return dict(rows)
+
+    def _save_keys(self, bucket_name, prefix, objects):
+        rows = []
+        last_keys = {}
+        for obj in objects:
+            parsed = S3KeyManifest.parse_key(obj['Key'])
+            rows.append((bucket_name, obj['Key'], parsed['kind'], parsed['car_id'], parsed['timestamp'],
+                         parsed['date'], obj.get('Size')))
+
+            if PARTITION_PATTERN.match(obj['Key']):
+                style = PARTITIONED
+            elif parsed['kind'] in FLAT_KINDS:
+                style = parsed['kind']
+            else:
+                continue
+            last_keys[style] = max(last_keys.get(style, obj['Key']), obj['Key'])
+
+        self.conn.executemany('INSERT OR IGNORE INTO s3_keys VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+        self.conn.executemany(
+            '''INSERT INTO s3_listing_marks VALUES (?, ?, ?, ?)
+               ON CONFLICT(bucket, prefix, style) DO UPDATE SET last_key = MAX(last_key, excluded.last_key)''',
+            [(bucket_name, prefix, style, last_key) for style, last_key in last_keys.items()]
+        )
+        self.conn.commit()
+
+    def _list(self, bucket_name, prefix, start_after, commit_every, client, credentials, only_partitioned=False):
+        logger.info(f'Listing {bucket_name}/{prefix} after {start_after}...')
+
+        listed = 0
+        objects = []
+        for obj in S3.iter_objects_from_bucket(bucket_name, prefix, only_keys=False, start_after=start_after,
+                                               client=client, credentials=credentials):
+            # flat keys sort after 'dt=' partitions => partitions are done
+            if only_partitioned and not PARTITION_PATTERN.match(obj['Key']):
+                break
+
+            objects.append(obj)
+            if len(objects) >= commit_every:
+                self._save_keys(bucket_name, prefix, objects)
+                listed += len(objects)
+                objects = []
+
+        if objects:
+            self._save_keys(bucket_name, prefix, objects)
+            listed += len(objects)
+
+        return listed
+
+    def update(self, bucket_name, prefix='', full=False, commit_every=1000, index_batches=True, client=None,
+               credentials=None):
+        """
+        Add new keys from bucket to manifest
+
+        Date partitions are listed from the partition of the last partitioned key (keys uploaded later
+        on the same day may sort before it) and every flat kind (batches and price sweeps) from its own
+        last key. Flat keys of single cars are not uploaded anymore => they are listed only by full listing.
+
+        Params:
+            bucket_name (str): name of bucket
+            prefix (str): listed prefix
+            full (bool): if True => list whole prefix again
+            commit_every (int): number of keys stored in one transaction
+            index_batches (bool): if True => download new batches and index their records by car id
+
+        Returns:
+            number of listed keys
+        """
+        last_keys = self.get_last_keys(bucket_name, prefix)
+
+        if full or not last_keys:
+            listed = self._list(bucket_name, prefix, None, commit_every, client, credentials)
+        else:
+            partition = PARTITION_PATTERN.match(last_keys.get(PARTITIONED, ''))
+            if partition:
+                # 'dt=YYYY-MM-DD/' sorts before all keys of the partition
+                start_after = partition.group(0)
+            else:
+                # no partition seen yet => skip flat keys sorting before partitions
+                start_after = None if 'dt=' in prefix else f'{prefix}dt='
+
+            listed = self._list(bucket_name, prefix, start_after, commit_every, client, credentials,
+                                only_partitioned=True)
+
+            if 'dt=' not in prefix:
+                for kind in FLAT_KINDS:
+                    listed += self._list(bucket_name, f'{prefix}{kind}_', last_keys.get(kind), commit_every,
+                                         client, credentials)
+
+        logger.info(f'{listed} keys listed!')
+
+        if index_batches:
+            self.index_batches(bucket_name, client=client, credentials=credentials)
+
+        return listed
+
+    def index_batches(self, bucket_name, max_workers=16, client=None, credentials=None):
+        """
+        Download batches which are not indexed yet and store car ids of their records
+        (batch keys contain no car id)
+
+        Params:
+            bucket_name (str): name of bucket
+            max_workers (int): number of download threads
+
+        Returns:
+            number of indexed batches
+        """
+        objects = [
+            {'Key': key, 'Size': size}
+            for key, size in self.conn.execute(
+                f'''SELECT k.key, k.size FROM s3_keys k
+                    LEFT JOIN s3_batches b ON b.bucket = k.bucket AND b.key = k.key
+                    WHERE k.bucket = ? AND k.kind IN ({','.join(['?'] * len(BATCH_KINDS))}) AND b.key IS NULL''',
+                [bucket_name] + BATCH_KINDS
+            )
+        ]
+        logger.info(f'Indexing {len(objects)} batches...')
+
+        indexed = 0
+        for key, body, error in S3.get_many(bucket_name, objects, max_workers=max_workers, client=client,
+                                            credentials=credentials):
+            if error is not None:
+                logger.warning(f'Batch {key} was not indexed: {error}')
+                continue
+
+            car_ids = {record['id'] for record in read_batch(body, key) if record.get('id') is not None}
+            self.conn.executemany('INSERT OR IGNORE INTO s3_batch_cars VALUES (?, ?, ?)',
+                                  [(bucket_name, key, car_id) for car_id in car_ids])
+            self.conn.execute('INSERT OR IGNORE INTO s3_batches VALUES (?, ?)', (bucket_name, key))
+            self.conn.commit()
+            indexed += 1
+
+        return indexed
+
+    def get_keys(self, bucket_name, car_id=None, kind=None, date_from=None, date_to=None):
+        """
+        Get keys from manifest (no bucket listing)
+
+        Params:
+            bucket_name (str): name of bucket
+            car_id (str): only keys of this car (including indexed batches containing it)
+            kind (str or list): only keys of this kind (e.g. car_details, car_details_batch)
+            date_from (str): YYYY-MM-DD, including
+            date_to (str): YYYY-MM-DD, including
+
+        Returns:
+            list of keys ordered by timestamp
+        """
+        SQL = 'SELECT key FROM s3_keys WHERE bucket = ?'
+        params = [bucket_name]
+
+        if car_id is not None:
+            SQL += ' AND (car_id = ? OR key IN (SELECT key FROM s3_batch_cars WHERE bucket = ? AND car_id = ?))'
+            params += [car_id, bucket_name, car_id]
+
+        if kind is not None:
+            kinds = [kind] if isinstance(kind, str) else list(kind)
+            SQL += f" AND kind IN ({','.join(['?'] * len(kinds))})"
+            params += kinds
+
+        if date_from is not None:
+            SQL += ' AND date >= ?'
+            params.append(date_from)
+
+        if date_to is not None:
+            SQL += ' AND date <= ?'
+            params.append(date_to)
+
+        SQL += ' ORDER BY timestamp, key'
+
+        return [row[0] for row in self.conn.execute(SQL, params)]
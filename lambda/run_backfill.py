@@ -0,0 +1,448 @@
+# Rebuild database tables from all files stored in S3 (e.g. after schema change or data fix)
+# python run_backfill.py --workers 32
+# python run_backfill.py --date-from 2023-01-01 --date-to 2023-01-31 --no-swap
+# python run_backfill.py --resume
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import datetime as dt
+
+sys.path.append('python')
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import pymysql
+
+from custom_code.s3 import S3
+from custom_code.s3_manifest import S3KeyManifest
+from custom_code.batches import is_batch_file, read_batch
+from custom_code.data_parsers import CarvagoBatchParser, CarvagoPriceSweepParser, CarDetails, Price, Photo
+from custom_code.mysql_db import (CONNECTION_STRING, CarsTable, PriceHistoryTable, FeatureDictionaryTable,
+                                  CarFeaturesTable, PhotosTable)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# rebuilt tables (feature_dictionary is append only => it is used directly)
+TABLES = [CarsTable, PriceHistoryTable, CarFeaturesTable, PhotosTable]
+# child tables => rows of car are replaced by rows from its newest file
+CHILD_TABLES = [CarFeaturesTable, PhotosTable]
+STAGING_SUFFIX = '_staging'
+OLD_SUFFIX = '_old'
+# work directory is deleted only if it contains this file (created by backfill)
+MARKER_FILE_NAME = '.backfill'
+
+TSV_ESCAPES = {'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'}
+TSV_UNESCAPES = {v: k for k, v in TSV_ESCAPES.items()}
+
+
+class BackfillState:
+    def __init__(self, work_dir):
+        """
+        Progress of backfill stored in work directory (parsed files, written chunks and loaded chunks)
+
+        Params:
+            work_dir (str): directory with chunks and progress files
+        """
+        self.WORK_DIR = work_dir
+        self.CHUNKS_DIR = os.path.join(work_dir, 'chunks')
+        self.DONE_KEYS_PATH = os.path.join(work_dir, 'done_keys.txt')
+        self.LOADED_CHUNKS_PATH = os.path.join(work_dir, 'loaded_chunks.txt')
+        self.CAR_VERSIONS_PATH = os.path.join(work_dir, 'car_versions.txt')
+
+        os.makedirs(self.CHUNKS_DIR, exist_ok=True)
+        open(os.path.join(work_dir, MARKER_FILE_NAME), 'a').close()
+
+        self.done_keys = BackfillState._read_lines(self.DONE_KEYS_PATH)
+        self.loaded_chunks = BackfillState._read_lines(self.LOADED_CHUNKS_PATH)
+        # car id => timestamp of its newest file written to chunks (resumed files can be older)
+        self.car_versions = {}
+        for line in BackfillState._read_lines(self.CAR_VERSIONS_PATH):
+            car_id, timestamp = line.split('\t')
+            self.car_versions[car_id] = max(timestamp, self.car_versions.get(car_id, timestamp))
+
+    @staticmethod
+    def remove(work_dir):
+        """
+        Delete work directory of previous backfill
+
+        Returns:
+            False if directory is not empty and was not created by backfill (it is not deleted)
+        """
+        if not os.path.exists(work_dir) or not os.listdir(work_dir):
+            return True
+
+        if not os.path.exists(os.path.join(work_dir, MARKER_FILE_NAME)):
+            logger.error(f'{work_dir} is not backfill work directory ({MARKER_FILE_NAME} is missing) => it is not deleted')
+            return False
+
+        shutil.rmtree(work_dir)
+
+        return True
+
+    @staticmethod
+    def _read_lines(path):
+        if not os.path.exists(path):
+            return set()
+
+        with open(path) as f:
+            return set(line.strip() for line in f if line.strip())
+
+    @staticmethod
+    def _append_lines(path, lines):
+        with open(path, 'a') as f:
+            f.write(''.join(line + '\n' for line in lines))
+
+    def get_chunks(self):
+        # temporary directories are half written chunks of interrupted run
+        return sorted(name for name in os.listdir(self.CHUNKS_DIR) if not name.startswith('tmp_'))
+
+    def get_chunk_path(self, chunk, table):
+        return os.path.join(self.CHUNKS_DIR, chunk, f'{table.TABLE_NAME}.tsv')
+
+    def mark_keys_done(self, keys):
+        BackfillState._append_lines(self.DONE_KEYS_PATH, keys)
+        self.done_keys.update(keys)
+
+    def mark_cars_written(self, versions):
+        BackfillState._append_lines(self.CAR_VERSIONS_PATH, [f'{car_id}\t{timestamp}' for car_id, timestamp in versions.items()])
+        self.car_versions.update(versions)
+
+    def mark_chunk_loaded(self, chunk):
+        BackfillState._append_lines(self.LOADED_CHUNKS_PATH, [chunk])
+        self.loaded_chunks.add(chunk)
+
+
+def to_tsv_value(value):
+    if value is None:
+        return '\\N'
+
+    if isinstance(value, dt.datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+
+    return re.sub(r'[\\\t\n\r]', lambda match: TSV_ESCAPES[match.group(0)], str(value))
+
+def from_tsv_value(value):
+    if value == '\\N':
+        return None
+
+    return re.sub(r'\\[\\tnr]', lambda match: TSV_UNESCAPES[match.group(0)], value)
+
+def get_keys(bucket_name, prefix, date_from, date_to, manifest_path):
+    """
+    List files for backfill ordered by their timestamp (newer files overwrite older ones)
+    """
+    if manifest_path:
+        manifest = S3KeyManifest(manifest_path)
+        # every batch is downloaded by backfill anyway => no indexing of car ids
+        manifest.update(bucket_name, prefix, index_batches=False)
+        keys = [key for key in manifest.get_keys(bucket_name, date_from=date_from, date_to=date_to) if key.startswith(prefix)]
+        manifest.close()
+    else:
+        keys = list(S3.iter_objects_from_bucket(bucket_name, prefix))
+
+    parsed_keys = []
+    for key in keys:
+        parsed = S3KeyManifest.parse_key(key)
+        if parsed['kind'] is None:
+            continue
+        if date_from and parsed['date'] < date_from or date_to and parsed['date'] > date_to:
+            continue
+
+        parsed_keys.append((parsed['timestamp'], key))
+
+    return [key for _, key in sorted(parsed_keys)]
+
+def to_rows(df, row_type):
+    # missing values of nullable columns (pd.NA, NaT) => None
+    return [row_type(*row) for row in df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)]
+
+def parse_cars(file_name, records):
+    """
+    Parse raw cars at once, invalid records are logged and skipped (they do not fail the whole file)
+
+    Returns:
+        tuple (list of cars with details, features and photos, list of prices)
+    """
+    parser = CarvagoBatchParser(records)
+    tables = parser.get_tables()
+
+    for rejected in parser.get_rejected():
+        logger.warning(f"{file_name}: record {rejected['index']} (id {rejected['id']}) rejected: {rejected['reason']}")
+
+    features = tables['features'].groupby('id')['feature'].agg(list).to_dict()
+    photos = tables['photos'].groupby('id')['url'].agg(list).to_dict()
+    cars = [
+        {'details': details, 'features': features.get(details.id, []), 'photos': photos.get(details.id, [])}
+        for details in to_rows(tables['cars'], CarDetails)
+    ]
+
+    return cars, to_rows(tables['price_history'], Price)
+
+def parse_file(file_name, body):
+    """
+    Returns:
+        tuple (list of cars with details, features and photos, list of prices)
+    """
+    base_name = file_name.split('/')[-1]
+    records = read_batch(body, file_name) if is_batch_file(file_name) else [json.loads(body)]
+
+    if base_name.startswith('price_sweep_'):
+        return [], CarvagoPriceSweepParser(records[0]).get_prices(as_dataframe=False)
+
+    if base_name.startswith('price_snapshot_'):
+        return [], CarvagoPriceSweepParser({'prices': records}).get_prices(as_dataframe=False)
+
+    return parse_cars(file_name, records)
+
+def iter_parsed_files(bucket_name, keys, workers):
+    """
+    Download and parse files concurrently, results are yielded in order of keys
+
+    Returns:
+        generator of tuples (key, cars, prices, error)
+    """
+    positions = {key: i for i, key in enumerate(keys)}
+    buffer = {}
+    position = 0
+
+    for file_name, body, error in S3.get_many(bucket_name, keys, max_workers=workers):
+        cars, prices = [], []
+        if error is None:
+            try:
+                cars, prices = parse_file(file_name, body)
+            except Exception as e:
+                error = e
+
+        buffer[positions[file_name]] = (file_name, cars, prices, error)
+
+        while position in buffer:
+            yield buffer.pop(position)
+            position += 1
+
+def write_chunk(state, chunk_num, cars, prices):
+    """
+    Write parsed rows of chunk into TSV file per table (chunk directory is renamed when complete)
+    """
+    feature_ids = FeatureDictionaryTable.get_ids(feature for car in cars.values() for feature in car['features'])
+
+    rows = {
+        CarsTable: [car['details'] for car in cars.values()],
+        PriceHistoryTable: prices,
+        CarFeaturesTable: [
+            {'id': car_id, 'feature_id': feature_id}
+            for car_id, car in cars.items()
+            for feature_id in sorted(set(feature_ids[feature] for feature in car['features']))
+        ],
+        PhotosTable: [Photo(car_id, url) for car_id, car in cars.items() for url in car['photos']],
+    }
+
+    chunk = f'{chunk_num:06d}'
+    tmp_dir = os.path.join(state.CHUNKS_DIR, f'tmp_{chunk}')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    for table, table_rows in rows.items():
+        cols = table.get_column_names()
+        with open(os.path.join(tmp_dir, f'{table.TABLE_NAME}.tsv'), 'w', encoding='utf-8') as f:
+            for row in table_rows:
+                f.write('\t'.join(to_tsv_value(value) for value in table.row2tuple(row, cols)) + '\n')
+
+    os.rename(tmp_dir, os.path.join(state.CHUNKS_DIR, chunk))
+
+def parse_files(state, bucket_name, keys, workers, chunk_size):
+    """
+    Phase 1: download and parse files into chunks
+
+    Returns:
+        number of failed files
+    """
+    keys = [key for key in keys if key not in state.done_keys]
+    logger.info(f'{len(keys)} files to download ({len(state.done_keys)} already done)')
+
+    chunk_num = len(state.get_chunks())
+    # car => its newest version in chunk (and timestamp of its file), prices are kept all
+    cars, versions, prices, chunk_keys = {}, {}, [], []
+    failed = 0
+    start = time.monotonic()
+
+    def flush():
+        nonlocal chunk_num, cars, versions, prices, chunk_keys
+        if chunk_keys:
+            # file failed in previous run is older than cars already written to chunks => chunks are loaded
+            # in order, so its cars would replace newer versions
+            cars = {car_id: car for car_id, car in cars.items() if versions[car_id] >= state.car_versions.get(car_id, '')}
+            write_chunk(state, chunk_num, cars, prices)
+            state.mark_cars_written({car_id: versions[car_id] for car_id in cars})
+            state.mark_keys_done(chunk_keys)
+            chunk_num += 1
+        cars, versions, prices, chunk_keys = {}, {}, [], []
+
+    for i, (file_name, file_cars, file_prices, error) in enumerate(iter_parsed_files(bucket_name, keys, workers), 1):
+        if error is not None:
+            logger.error(f'{file_name} failed: {error}')
+            failed += 1
+        else:
+            # keys are ordered by timestamp => later file of the same run is newer
+            timestamp = S3KeyManifest.parse_key(file_name)['timestamp']
+            cars.update((car['details'].id, car) for car in file_cars)
+            versions.update((car['details'].id, timestamp) for car in file_cars)
+            prices += file_prices
+            chunk_keys.append(file_name)
+
+        if len(chunk_keys) >= chunk_size:
+            flush()
+
+        if i % 1000 == 0:
+            logger.info(f'{i}/{len(keys)} files parsed ({i / (time.monotonic() - start):.1f} objects/s)')
+
+    flush()
+
+    elapsed = time.monotonic() - start
+    logger.info(f'{len(keys)} files parsed in {elapsed:.1f}s ({len(keys) / max(elapsed, 1e-9):.1f} objects/s), {failed} failed')
+
+    return failed
+
+def create_load_connection(load_method):
+    return pymysql.connect(**CONNECTION_STRING, local_infile=(load_method == 'load-data'))
+
+def create_staging_tables(cur, recreate):
+    for table in TABLES:
+        staging = table.TABLE_NAME + STAGING_SUFFIX
+        if recreate:
+            cur.execute(f'DROP TABLE IF EXISTS {staging}')
+        cur.execute(f'CREATE TABLE IF NOT EXISTS {staging} LIKE {table.TABLE_NAME}')
+
+def load_chunk(cur, state, chunk, load_method, insert_batch_size):
+    # cars of chunk => their child rows from older chunks are replaced
+    id_index = CarsTable.get_column_names().index('id')
+    with open(state.get_chunk_path(chunk, CarsTable), encoding='utf-8') as f:
+        car_ids = [line.rstrip('\n').split('\t')[id_index] for line in f if line.strip()]
+
+    for i in range(0, len(car_ids), insert_batch_size):
+        ids = [from_tsv_value(car_id) for car_id in car_ids[i:i + insert_batch_size]]
+        for table in CHILD_TABLES:
+            cur.execute(f"DELETE FROM {table.TABLE_NAME + STAGING_SUFFIX} WHERE id IN ({','.join(['%s'] * len(ids))})", ids)
+
+    for table in TABLES:
+        staging = table.TABLE_NAME + STAGING_SUFFIX
+        cols = ','.join(f'`{col}`' for col in table.get_column_names())
+        path = os.path.abspath(state.get_chunk_path(chunk, table))
+
+        if load_method == 'load-data':
+            cur.execute(
+                f"""LOAD DATA LOCAL INFILE %s REPLACE INTO TABLE {staging} CHARACTER SET utf8mb4
+                    FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' ({cols})""",
+                (path,)
+            )
+            continue
+
+        # multi-row inserts (pymysql sends executemany of INSERT ... VALUES as one statement per batch)
+        SQL = f"REPLACE INTO {staging} ({cols}) VALUES ({','.join(['%s'] * len(table.get_column_names()))})"
+        with open(path, encoding='utf-8') as f:
+            rows = [tuple(from_tsv_value(value) for value in line.rstrip('\n').split('\t')) for line in f if line.strip()]
+
+        for i in range(0, len(rows), insert_batch_size):
+            cur.executemany(SQL, rows[i:i + insert_batch_size])
+
+def load_chunks(state, load_method, insert_batch_size, recreate_staging):
+    """
+    Phase 2: load chunks into staging tables in order of chunks (one transaction per chunk)
+    """
+    chunks = [chunk for chunk in state.get_chunks() if chunk not in state.loaded_chunks]
+    logger.info(f'{len(chunks)} chunks to load ({len(state.loaded_chunks)} already loaded)')
+
+    # columns are loaded before load connection is opened
+    for table in TABLES:
+        table.get_column_names()
+
+    start = time.monotonic()
+    conn = create_load_connection(load_method)
+    try:
+        with conn.cursor() as cur:
+            create_staging_tables(cur, recreate_staging)
+
+            for i, chunk in enumerate(chunks, 1):
+                load_chunk(cur, state, chunk, load_method, insert_batch_size)
+                conn.commit()
+                state.mark_chunk_loaded(chunk)
+                logger.info(f'Chunk {chunk} loaded ({i}/{len(chunks)}, {time.monotonic() - start:.1f}s)')
+    finally:
+        conn.close()
+
+def swap_tables(load_method):
+    """
+    Phase 3: replace live tables by staging tables in one atomic RENAME
+    """
+    renames = []
+    for table in TABLES:
+        live, staging, old = table.TABLE_NAME, table.TABLE_NAME + STAGING_SUFFIX, table.TABLE_NAME + OLD_SUFFIX
+        renames += [f'{live} TO {old}', f'{staging} TO {live}']
+
+    conn = create_load_connection(load_method)
+    try:
+        with conn.cursor() as cur:
+            for table in TABLES:
+                cur.execute(f'DROP TABLE IF EXISTS {table.TABLE_NAME + OLD_SUFFIX}')
+
+            cur.execute(f"RENAME TABLE {', '.join(renames)}")
+            logger.info(f'Tables swapped: {", ".join(table.TABLE_NAME for table in TABLES)}')
+
+            for table in TABLES:
+                cur.execute(f'DROP TABLE {table.TABLE_NAME + OLD_SUFFIX}')
+        conn.commit()
+    finally:
+        conn.close()
+
+def run(args):
+    # staging of filtered backfill contains only part of files => swap would delete rows of other files
+    if (args.prefix or args.date_from or args.date_to) and not args.no_swap:
+        logger.error('--prefix, --date-from and --date-to load only part of files => run them with --no-swap')
+        return
+
+    if not args.resume and not BackfillState.remove(args.work_dir):
+        return
+
+    state = BackfillState(args.work_dir)
+
+    keys = get_keys(args.bucket, args.prefix, args.date_from, args.date_to, args.manifest)
+    logger.info(f'{len(keys)} files found in {args.bucket}/{args.prefix}')
+
+    failed = parse_files(state, args.bucket, keys, args.workers, args.chunk_size)
+    load_chunks(state, args.load_method, args.insert_batch_size, recreate_staging=not args.resume)
+
+    if failed:
+        logger.error(f'{failed} files failed => tables are not swapped, run again with --resume')
+        return
+
+    if args.no_swap:
+        logger.info('Staging tables are loaded (swap skipped)')
+        return
+
+    swap_tables(args.load_method)
+    BackfillState.remove(args.work_dir)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--bucket', default=os.getenv('AWS_BUCKET_NAME'), help='bucket with scraped files')
+    parser.add_argument('--prefix', default='', help='only files with this prefix (e.g. dt=2023-01-)')
+    parser.add_argument('--date-from', default=None, help='only files from this date (YYYY-MM-DD, including)')
+    parser.add_argument('--date-to', default=None, help='only files to this date (YYYY-MM-DD, including)')
+    parser.add_argument('--manifest', default=None, help='sqlite key manifest used instead of full bucket listing')
+    parser.add_argument('--workers', type=int, default=32, help='number of parallel downloads')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='number of files in one intermediate chunk')
+    parser.add_argument('--load-method', choices=['load-data', 'insert'], default='load-data',
+                        help='LOAD DATA LOCAL INFILE (local_infile has to be enabled on server) or multi-row inserts')
+    parser.add_argument('--insert-batch-size', type=int, default=5000, help='rows in one multi-row insert')
+    parser.add_argument('--work-dir', default='./backfill', help='directory with intermediate files and progress')
+    parser.add_argument('--resume', action='store_true', help='continue interrupted backfill')
+    parser.add_argument('--no-swap', action='store_true', help='only load staging tables (required with filters)')
+
+    run(parser.parse_args())
@@ -0,0 +1,25 @@
+# Apply database migrations (tables keys and indexes)
+# python run_migrations.py [--dry-run] [--target VERSION]
+
+import sys
+import logging
+import argparse
+
+sys.path.append('python')
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from custom_code.migrations import migrate
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dry-run', action='store_true', help='only print pending migrations')
+    parser.add_argument('--target', type=int, default=None, help='apply migrations up to this version')
+    args = parser.parse_args()
+
+    applied = migrate(target_version=args.target, dry_run=args.dry_run)
+    logger.info(f'Applied migrations: {applied}')
@@ -0,0 +1,71 @@
+# Compare webdriver round trips and time of element by element extraction and one injected script per page
+# python benchmark_extraction.py --repeats 20
+
+import os
+import time
+import argparse
+
+from dotenv import load_dotenv
+from libs.scrapers.carvago import CarvagoScraper
+from tests.fixture_server import FixtureServer
+
+load_dotenv()
+
+PATH_TO_CHROMEDRIVER = os.getenv('PATH_TO_CHROMEDRIVER', '')
+
+def count_round_trips(browser):
+    """
+    Count every webdriver command sent by browser (each one is HTTP request to chromedriver)
+    """
+    counter = {'commands': 0}
+    execute = browser.execute
+
+    def counted_execute(driver_command, params=None):
+        counter['commands'] += 1
+        return execute(driver_command, params)
+
+    browser.execute = counted_execute
+
+    return counter
+
+def measure(name, extract, counter, repeats):
+    counter['commands'] = 0
+    start = time.monotonic()
+    for _ in range(repeats):
+        result = extract()
+
+    elapsed = time.monotonic() - start
+    print(f'{name:<24} {counter["commands"] / repeats:6.0f} round trips/page {elapsed / repeats * 1000:8.1f} ms/page')
+
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeats', type=int, default=20, help='number of extractions from every loaded page')
+    args = parser.parse_args()
+
+    scraper = CarvagoScraper(headless=True, sleep_time=0, path_to_chromedriver=PATH_TO_CHROMEDRIVER)
+
+    with FixtureServer() as server:
+        session = scraper.session()
+        try:
+            browser = session.get_browser()
+            counter = count_round_trips(browser)
+
+            # pages are loaded once, only extraction is measured
+            url = f'{server.url}/car/abc123/skoda-octavia'
+            scraper._load_url(browser, url, wait_for='.e18uvu5d4')
+            by_elements = measure('car page, elements', lambda: scraper._get_car_details_by_elements(browser, url),
+                                  counter, args.repeats)
+            by_script = measure('car page, script', lambda: scraper._get_car_details_by_script(browser, url),
+                                counter, args.repeats)
+            print('same car_details:', by_elements == by_script)
+
+            scraper._load_url(browser, f'{server.url}/search?page=1', wait_for='.gtm-element-visibility-impressions-list')
+            by_elements = measure('search page, elements', lambda: CarvagoScraper._get_cards_description(browser),
+                                  counter, args.repeats)
+            by_script = measure('search page, script', lambda: CarvagoScraper._get_cards_description_by_script(browser),
+                                counter, args.repeats)
+            print('same cards description:', by_elements == by_script)
+        finally:
+            session.quit()
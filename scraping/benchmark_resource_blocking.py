@@ -0,0 +1,82 @@
+# Compare page load time and transferred bytes of resource blocking profiles on local server with saved car page
+# python benchmark_resource_blocking.py --pages 10
+
+import os
+import json
+import time
+import argparse
+import statistics
+
+from dotenv import load_dotenv
+from libs.scrapers.carvago import CarvagoScraper, RESOURCE_BLOCKING_PROFILES
+from tests.fixture_server import FixtureServer
+
+load_dotenv()
+
+PATH_TO_CHROMEDRIVER = os.getenv('PATH_TO_CHROMEDRIVER', '')
+
+
+class MeasuredCarvagoScraper(CarvagoScraper):
+    def _get_chrome_options(self):
+        # devtools network events are written to performance log
+        chrome_options = super()._get_chrome_options()
+        chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+
+        return chrome_options
+
+def get_network_stats(browser):
+    """
+    Read network events logged since previous call
+
+    Returns
+    -------
+    dict
+        Number of finished and blocked requests and encoded bytes received
+    """
+    stats = {'requests': 0, 'blocked': 0, 'bytes': 0}
+    for entry in browser.get_log('performance'):
+        message = json.loads(entry['message'])['message']
+
+        if message['method'] == 'Network.loadingFinished':
+            stats['requests'] += 1
+            stats['bytes'] += message['params'].get('encodedDataLength', 0)
+
+        elif message['method'] == 'Network.loadingFailed' and message['params'].get('blockedReason'):
+            stats['blocked'] += 1
+
+    return stats
+
+def measure(profile, url, pages):
+    scraper = MeasuredCarvagoScraper(headless=True, sleep_time=0, path_to_chromedriver=PATH_TO_CHROMEDRIVER,
+                                     resource_blocking=profile)
+    browser = scraper._init_browser()
+    try:
+        load_times, stats = [], []
+        for _ in range(pages):
+            # cache would hide transferred bytes of every load after the first one
+            browser.execute_cdp_cmd('Network.clearBrowserCache', {})
+            get_network_stats(browser)
+
+            start = time.monotonic()
+            browser.get(url)
+            load_times.append(time.monotonic() - start)
+            stats.append(get_network_stats(browser))
+    finally:
+        browser.quit()
+
+    print(f'{profile:<10} {statistics.median(load_times) * 1000:8.1f} ms/page '
+          f'{statistics.mean(s["bytes"] for s in stats) / 1024:8.1f} kB/page '
+          f'{statistics.mean(s["requests"] for s in stats):5.1f} requests/page '
+          f'{statistics.mean(s["blocked"] for s in stats):5.1f} blocked/page')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=10, help='number of page loads of every profile')
+    parser.add_argument('--asset-size', type=int, default=100 * 1024, help='size in bytes of every image, font and video')
+    parser.add_argument('--profiles', nargs='+', choices=list(RESOURCE_BLOCKING_PROFILES),
+                        default=list(RESOURCE_BLOCKING_PROFILES))
+    args = parser.parse_args()
+
+    with FixtureServer(asset_size=args.asset_size) as server:
+        for profile in args.profiles:
+            measure(profile, f'{server.url}/car/abc123/skoda-octavia', args.pages)
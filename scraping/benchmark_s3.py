@@ -0,0 +1,71 @@
+# Compare S3 put throughput of new client per request, cached client and cached client shared by threads
+# python benchmark_s3.py --objects 200 --threads 16
+
+import os
+import json
+import time
+import boto3
+import argparse
+
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from libs.s3 import S3
+
+load_dotenv()
+
+BUCKET_NAME = os.getenv('AWS_BUCKET_NAME')
+S3_CREDENTIALS = {
+    'aws_access_key_id': os.getenv('AWS_ACCESS_KEY_ID'),
+    'aws_secret_access_key': os.getenv('AWS_SECRET_ACCESS_KEY')
+}
+
+def put(file_name, client=None):
+    S3.store_file_in_bucket(
+        bucket_name = BUCKET_NAME,
+        file_name = file_name,
+        file = json.dumps({'file_name': file_name}),
+        client = client if client is not None else boto3.client('s3', **S3_CREDENTIALS)
+    )
+
+def measure(name, file_names, put_function, threads=1):
+    start = time.monotonic()
+
+    if threads > 1:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(put_function, file_names))
+    else:
+        for file_name in file_names:
+            put_function(file_name)
+
+    elapsed = time.monotonic() - start
+    print(f'{name:<32} {len(file_names) / elapsed:8.1f} requests/s')
+
+def cleanup(file_names, client):
+    for i in range(0, len(file_names), 1000):
+        client.delete_objects(
+            Bucket = BUCKET_NAME,
+            Delete = {'Objects': [{'Key': file_name} for file_name in file_names[i:i + 1000]]}
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--objects', type=int, default=100, help='number of objects stored in every test')
+    parser.add_argument('--threads', type=int, default=16, help='number of threads in threaded test')
+    parser.add_argument('--prefix', default='benchmark/', help='prefix of test objects (they are deleted at the end)')
+    args = parser.parse_args()
+
+    client = S3.get_client(S3_CREDENTIALS, max_pool_connections=args.threads)
+    file_names = []
+
+    def get_file_names(test_name):
+        names = [f'{args.prefix}{test_name}_{i}.json' for i in range(args.objects)]
+        file_names.extend(names)
+        return names
+
+    try:
+        measure('sequential, new client per put', get_file_names('new_client'), put)
+        measure('sequential, cached client', get_file_names('sequential'), lambda file_name: put(file_name, client))
+        measure(f'{args.threads} threads, cached client', get_file_names('threaded'),
+                lambda file_name: put(file_name, client), threads=args.threads)
+    finally:
+        cleanup(file_names, client)
@@ -0,0 +1,56 @@
+# Compare car pages per second of http and selenium backends on local server with saved carvago pages
+# python benchmark_scrapers.py --pages 50 --workers 4 --backends http selenium
+
+import os
+import time
+import argparse
+
+from dotenv import load_dotenv
+from libs.scrapers.carvago import CarvagoScraper
+from libs.scrapers.carvago_http import CarvagoHttpScraper
+from tests.fixture_server import FixtureServer
+
+load_dotenv()
+
+PATH_TO_CHROMEDRIVER = os.getenv('PATH_TO_CHROMEDRIVER', '')
+
+def get_scraper(backend, workers):
+    if backend == 'http':
+        return CarvagoHttpScraper(sleep_time=0, pool_size=workers)
+
+    return CarvagoScraper(headless=True, sleep_time=0, path_to_chromedriver=PATH_TO_CHROMEDRIVER,
+                          extraction_mode='script', resource_blocking='full')
+
+def measure(backend, urls, workers):
+    scraper = get_scraper(backend, workers)
+
+    start = time.monotonic()
+    cars_details = list(scraper.iter_multiple_cars_details(urls, num_workers=workers))
+    elapsed = time.monotonic() - start
+
+    failed = sum(car_details is None for car_details in cars_details)
+    if failed == len(urls):
+        print(f'{backend:<10} all pages failed (see log)')
+        return None
+
+    print(f'{backend:<10} {len(urls) / elapsed:8.1f} pages/s ({elapsed:.1f}s, {failed} failed)')
+
+    return cars_details[0]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=50, help='number of scraped car pages')
+    parser.add_argument('--workers', type=int, default=4, help='number of parallel requests or browsers')
+    parser.add_argument('--latency', type=float, default=0.05, help='response latency of local server in seconds')
+    parser.add_argument('--backends', nargs='+', choices=['http', 'selenium'], default=['http', 'selenium'])
+    args = parser.parse_args()
+
+    with FixtureServer(latency=args.latency) as server:
+        urls = [f'{server.url}/car/car{i}/skoda-octavia' for i in range(args.pages)]
+
+        results = {backend: measure(backend, urls, args.workers) for backend in args.backends}
+
+    # both backends have to return the same car_details
+    results = [car_details for car_details in results.values() if car_details]
+    if len(results) > 1:
+        print('same car_details:', all(results[0] == car_details for car_details in results[1:]))
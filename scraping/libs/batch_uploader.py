@@ -0,0 +1,221 @@
+import io
+import gzip
+import json
+import time
+import queue
+import logging
+import threading
+
+from libs.help_functions import get_current_time_string
+from libs.s3 import S3
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class BatchUploader:
+    def __init__(self, bucket_name: str, prefix: str, credentials: dict = None, max_records: int = 100,
+                 max_bytes: int = 5 * 1024 * 1024, max_seconds: float = 60, compression: str = 'gzip',
+                 max_retries: int = 3, queue_size: int = 4, date_partitioned: bool = False, on_uploaded=None):
+        """
+        Group records into compressed NDJSON objects and upload them to S3 from background thread
+
+        Batch is uploaded when it reaches max_records, max_bytes (uncompressed) or when its first record
+        is older than max_seconds
+
+        Parameters
+        ----------
+        bucket_name: str
+            Name of bucket where batches are stored
+        prefix: str
+            Prefix of batch file name (e.g. car_details_batch_)
+        credentials: dict
+            AWS credentials (one client is shared by all uploads)
+        max_records: int
+            Maximal number of records in one batch
+        max_bytes: int
+            Maximal size of uncompressed batch in bytes
+        max_seconds: float
+            Maximal time in seconds record waits in unfinished batch
+        compression: str
+            gzip or zstd (requires zstandard package in scraper and in Lambda layer)
+        max_retries: int
+            How many times upload of batch is tried
+        queue_size: int
+            Maximal number of finished batches waiting for upload (add blocks when uploads fall behind)
+        date_partitioned: bool
+            Store batches in date partitions (dt=YYYY-MM-DD/file_name)
+        on_uploaded: callable
+            Called with list of records after their batch is uploaded (from background thread)
+        """
+        if compression == 'zstd' and zstandard is None:
+            raise ValueError('zstd compression requires zstandard package')
+
+        if compression not in ('gzip', 'zstd'):
+            raise ValueError(f'Unknown compression: {compression}')
+
+        self.BUCKET_NAME = bucket_name
+        self.PREFIX = prefix
+        self.MAX_RECORDS = max_records
+        self.MAX_BYTES = max_bytes
+        self.MAX_SECONDS = max_seconds
+        self.COMPRESSION = compression
+        self.MAX_RETRIES = max_retries
+        self.DATE_PARTITIONED = date_partitioned
+        self.on_uploaded = on_uploaded
+
+        self.client = S3.get_client(credentials)
+
+        self._lock = threading.Lock()
+        self._batches = queue.Queue(maxsize=queue_size)
+        self._batch_num = 0
+        self._reset_buffer()
+
+        self._thread = threading.Thread(target=self._upload_loop, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _reset_buffer(self) -> None:
+        self._records = []
+        self._lines = []
+        self._size = 0
+        self._started = None
+
+    def _take_batch(self) -> tuple:
+        # must be called with lock
+        if not self._records:
+            return None
+
+        batch = (self._records, self._lines)
+        self._reset_buffer()
+
+        return batch
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.COMPRESSION == 'zstd':
+            return zstandard.ZstdCompressor().compress(data)
+
+        buffer = io.BytesIO()
+        with gzip.GzipFile(fileobj=buffer, mode='wb') as f:
+            f.write(data)
+
+        return buffer.getvalue()
+
+    def _get_file_name(self) -> str:
+        self._batch_num += 1
+        extension = 'zst' if self.COMPRESSION == 'zstd' else 'gz'
+        current_time = get_current_time_string()
+        file_name = f'{self.PREFIX}{current_time}_{self._batch_num:05d}.ndjson.{extension}'
+
+        if self.DATE_PARTITIONED:
+            return S3.get_partitioned_key(file_name, current_time)
+
+        return file_name
+
+    def _upload(self, batch: tuple) -> None:
+        records, lines = batch
+        file_name = self._get_file_name()
+        body = self._compress(b''.join(lines))
+
+        for retry in range(1, self.MAX_RETRIES + 1):
+            try:
+                S3.store_file_in_bucket(
+                    bucket_name = self.BUCKET_NAME,
+                    file_name = file_name,
+                    file = body,
+                    client = self.client
+                )
+                break
+            except Exception as e:
+                logger.warning(f'Upload of "{file_name}" failed ({retry}/{self.MAX_RETRIES}): {e}')
+
+                if retry == self.MAX_RETRIES:
+                    # records are not reported as uploaded => checkpoint keeps them for resume
+                    logger.error(f'Batch "{file_name}" with {len(records)} records was not uploaded!')
+                    return
+
+                time.sleep(2 ** retry)
+
+        if self.on_uploaded is not None:
+            try:
+                self.on_uploaded(records)
+            except Exception:
+                logger.exception('Exception occured!!')
+
+    def _upload_loop(self) -> None:
+        while True:
+            try:
+                batch = self._batches.get(timeout=1)
+            except queue.Empty:
+                # no finished batch => upload unfinished one if it waits too long
+                with self._lock:
+                    batch = None
+                    if self._started is not None and time.monotonic() - self._started >= self.MAX_SECONDS:
+                        batch = self._take_batch()
+
+                if batch is not None:
+                    self._upload(batch)
+                continue
+
+            if batch is _DONE:
+                return
+
+            self._upload(batch)
+
+    def add(self, record: dict) -> None:
+        """
+        Add record to current batch (scraping never waits for upload unless upload queue is full)
+
+        Parameters
+        ----------
+        record: dict
+            JSON serializable record
+        """
+        line = (json.dumps(record) + '\n').encode('utf-8')
+
+        with self._lock:
+            if self._started is None:
+                self._started = time.monotonic()
+
+            self._records.append(record)
+            self._lines.append(line)
+            self._size += len(line)
+
+            batch = None
+            if len(self._records) >= self.MAX_RECORDS or self._size >= self.MAX_BYTES:
+                batch = self._take_batch()
+
+        if batch is not None:
+            self._batches.put(batch)
+
+    def flush(self) -> None:
+        """
+        Send current (unfinished) batch to upload
+        """
+        with self._lock:
+            batch = self._take_batch()
+
+        if batch is not None:
+            self._batches.put(batch)
+
+    def close(self) -> None:
+        """
+        Upload all remaining records and stop background thread
+        """
+        if not self._thread.is_alive():
+            return
+
+        self.flush()
+        self._batches.put(_DONE)
+        self._thread.join()
@@ -0,0 +1,153 @@
+import os
+import json
+import shutil
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ScrapeCheckpoint:
+    def __init__(self, path: str):
+        """
+        Persistent progress of one scrape run (done search pages with their cards, scraped and uploaded cars)
+
+        Progress is stored as append-only log of events, so every update costs one written line
+
+        Parameters
+        ----------
+        path: str
+            Directory where checkpoint is stored
+        """
+        self.PATH = path
+        self.EVENTS_PATH = os.path.join(path, 'events.jsonl')
+        self.DETAILS_PATH = os.path.join(path, 'details')
+
+        # checkpoint is updated from search and uploading threads
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        self.discovered = []
+        self.discovered_ids = set()
+        self.done_pages = set()
+        self.search_finished = False
+        self.scraped = set()
+        self.uploaded = set()
+
+        if not os.path.exists(self.EVENTS_PATH):
+            return
+
+        with open(self.EVENTS_PATH) as f:
+            lines = f.read().split('\n')
+
+        # last line is not empty => it was half written when process was killed
+        if lines[-1]:
+            logger.warning(f'Removing broken checkpoint line: {lines[-1]}')
+            with open(self.EVENTS_PATH, 'w') as f:
+                f.write(''.join(line + '\n' for line in lines[:-1]))
+
+        for line in lines[:-1]:
+            self._apply(json.loads(line))
+
+    def _apply(self, event: dict) -> None:
+        if event['event'] == 'page_done':
+            self.done_pages.add(event['page'])
+            for description in event['descriptions']:
+                if description['id'] not in self.discovered_ids:
+                    self.discovered.append(description)
+                    self.discovered_ids.add(description['id'])
+        elif event['event'] == 'discovered':
+            # checkpoint written by older version (cards were stored one by one)
+            self.discovered.append(event['description'])
+            self.discovered_ids.add(event['description']['id'])
+        elif event['event'] == 'search_finished':
+            self.search_finished = True
+        elif event['event'] == 'scraped':
+            self.scraped.add(event['id'])
+        elif event['event'] == 'uploaded':
+            self.uploaded.add(event['id'])
+
+    def _log(self, event: dict) -> None:
+        with self._lock:
+            os.makedirs(self.PATH, exist_ok=True)
+            with open(self.EVENTS_PATH, 'a') as f:
+                f.write(json.dumps(event) + '\n')
+            self._apply(event)
+
+    def _details_path(self, car_id: str) -> str:
+        return os.path.join(self.DETAILS_PATH, f'{car_id}.json')
+
+    def exists(self) -> bool:
+        return os.path.exists(self.EVENTS_PATH)
+
+    def reset(self) -> None:
+        """
+        Remove checkpoint (new run starts from the first page)
+        """
+        with self._lock:
+            shutil.rmtree(self.PATH, ignore_errors=True)
+            self._load()
+
+    def mark_page_done(self, page_num: int, descriptions: list) -> None:
+        """
+        Store all cards of loaded search page in one event (page is not loaded again by resumed run)
+
+        Parameters
+        ----------
+        page_num: int
+            Number of search page
+        descriptions: list
+            Cards description (id, url, price) found on page
+        """
+        self._log({'event': 'page_done', 'page': page_num, 'descriptions': descriptions})
+
+    def mark_search_finished(self) -> None:
+        self._log({'event': 'search_finished'})
+
+    def store_details(self, car_id: str, car_details: dict) -> None:
+        """
+        Store scraped details until they are uploaded
+        """
+        os.makedirs(self.DETAILS_PATH, exist_ok=True)
+
+        # write to temporary file first => stored details are never half written
+        tmp_path = f'{self._details_path(car_id)}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(car_details, f)
+        os.replace(tmp_path, self._details_path(car_id))
+
+        self._log({'event': 'scraped', 'id': car_id})
+
+    def get_details_to_upload(self) -> list:
+        """
+        Get details scraped by interrupted run which were not uploaded yet
+
+        Returns
+        -------
+        list
+            Stored car details
+        """
+        cars_details = []
+        for car_id in sorted(self.scraped - self.uploaded):
+            try:
+                with open(self._details_path(car_id)) as f:
+                    cars_details.append(json.load(f))
+            except Exception as e:
+                # details are lost => car will be scraped again
+                logger.warning(e)
+                self.scraped.discard(car_id)
+
+        return cars_details
+
+    def mark_uploaded(self, car_id: str) -> None:
+        self._log({'event': 'uploaded', 'id': car_id})
+
+        if os.path.exists(self._details_path(car_id)):
+            os.remove(self._details_path(car_id))
+
+    def is_done(self, car_id: str) -> bool:
+        """
+        Car was scraped or uploaded => it must not be scraped again
+        """
+        return car_id in self.uploaded or car_id in self.scraped
@@ -0,0 +1,168 @@
+import time
+import asyncio
+import logging
+import threading
+
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+
+class Throttle:
+    def __init__(self, min_interval: float = 0):
+        """
+        Global politeness limit shared by all threads using one scraper
+
+        Parameters
+        ----------
+        min_interval: float
+            Minimal time in seconds between two consecutive requests
+        """
+        self.MIN_INTERVAL = min_interval
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self) -> None:
+        """
+        Block until the next request slot is free
+        """
+        if self.MIN_INTERVAL <= 0:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.MIN_INTERVAL
+
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = 1):
+        """
+        Asyncio token bucket
+
+        Parameters
+        ----------
+        rate: float
+            Tokens (requests) added per second
+        capacity: float
+            Maximal number of tokens (size of allowed burst)
+        """
+        self.rate = rate
+        self.CAPACITY = capacity
+        self.tokens = capacity
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = None
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.CAPACITY, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def pause(self, seconds: float) -> None:
+        """
+        Stop issuing tokens for given number of seconds (e.g. Retry-After of 429 response)
+        """
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self) -> None:
+        """
+        Wait until token is available and take it
+        """
+        # lock is created lazily => bucket is bound to the running event loop
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AdaptiveRateLimiter:
+    def __init__(self, rate: float = 2, min_rate: float = 0.2, max_rate: float = None, target_latency: float = 2,
+                 increase: float = None, decrease: float = 0.5):
+        """
+        Token bucket per host with rate adapted to latency and errors (additive increase, multiplicative decrease)
+
+        Parameters
+        ----------
+        rate: float
+            Initial number of requests per second for every host
+        min_rate: float
+            Lower bound of requests per second
+        max_rate: float
+            Upper bound of requests per second (None => rate is target which is never exceeded)
+        target_latency: float
+            Responses slower than this (in seconds) slightly decrease the rate
+        increase: float
+            Requests per second added after each fast successful response (None => 5% of max_rate)
+        decrease: float
+            Rate multiplier applied after 429, 5xx or connection error
+        """
+        self.RATE = rate
+        self.MIN_RATE = min_rate
+        self.MAX_RATE = max_rate if max_rate is not None else rate
+        self.TARGET_LATENCY = target_latency
+        self.INCREASE = increase if increase is not None else self.MAX_RATE * 0.05
+        self.DECREASE = decrease
+        self.buckets = {}
+
+    def get_bucket(self, url: str) -> TokenBucket:
+        """
+        Get token bucket of url's host (created on first request to host)
+        """
+        host = urlparse(url).netloc
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.RATE)
+
+        return self.buckets[host]
+
+    async def acquire(self, url: str) -> None:
+        """
+        Wait for free slot of url's host
+        """
+        await self.get_bucket(url).acquire()
+
+    def observe(self, url: str, status: int, latency: float, retry_after: float = None) -> None:
+        """
+        Adapt rate of url's host to result of request
+
+        Parameters
+        ----------
+        url: str
+            Requested url
+        status: int
+            HTTP status of response (None => connection error)
+        latency: float
+            Duration of request in seconds
+        retry_after: float
+            Value of Retry-After header in seconds
+        """
+        bucket = self.get_bucket(url)
+
+        # other client errors (404, 403,...) say nothing about load of host => rate is not changed
+        if status is not None and 400 <= status < 500 and status != 429:
+            return
+
+        if status is None or status == 429 or status >= 500:
+            bucket.rate = max(self.MIN_RATE, bucket.rate * self.DECREASE)
+            if retry_after:
+                bucket.pause(retry_after)
+            logger.info(f'Request failed ({status}) => rate of {urlparse(url).netloc} decreased to {bucket.rate:.2f}/s')
+        elif latency > self.TARGET_LATENCY:
+            bucket.rate = max(self.MIN_RATE, bucket.rate * 0.9)
+        else:
+            bucket.rate = min(self.MAX_RATE, bucket.rate + self.INCREASE)
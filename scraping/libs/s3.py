@@ -1,19 +1,53 @@
 import boto3
+import botocore.config
+import threading
+import time
 import json
 import io
+import datetime as dt
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 import logging
 logger = logging.getLogger(__name__)
 
 class S3:    
+    # maximal number of open connections of one client (should be >= number of threads using it)
+    MAX_POOL_CONNECTIONS = 50
+    
+    _clients = {}
+    _clients_lock = threading.Lock()
+    
+    @staticmethod
+    def get_client(credentials=None, max_pool_connections=None):
+        """
+        Returns S3 client (one cached client per credentials, boto3 clients are thread-safe)
+        
+        Params:
+            credentials (dict): aws_access_key_id and aws_secret_access_key (None => default credentials)
+            max_pool_connections (int): size of connection pool (None => S3.MAX_POOL_CONNECTIONS)
+        """
+        max_pool_connections = max_pool_connections or S3.MAX_POOL_CONNECTIONS
+        key = (tuple(sorted((credentials or {}).items())), max_pool_connections)
+        
+        with S3._clients_lock:
+            if key not in S3._clients:
+                # boto3 sessions are not thread-safe => client is created from its own session under lock
+                session = boto3.session.Session(**(credentials or {}))
+                S3._clients[key] = session.client(
+                    's3', 
+                    config=botocore.config.Config(max_pool_connections=max_pool_connections)
+                )
+            
+            return S3._clients[key]
+    
     @staticmethod
-    def get_client(credentials=None):
+    def clear_clients():
         """
-        Returns S3 client
+        Remove cached clients (e.g. after credentials rotation)
         """
-        if credentials:
-            return boto3.client('s3', **credentials)
-        return boto3.client('s3')
+        with S3._clients_lock:
+            S3._clients.clear()
     
     @staticmethod
     def create_bucket(bucket_name, location='eu-west-1', client=None, credentials=None):
@@ -50,13 +84,14 @@ class S3:
         logger.info(f'Bucket "{bucket_name}" deleted!')
     
     @staticmethod
-    def create_bucket_if_not_exists(bucket_name, credentials=None):
+    def create_bucket_if_not_exists(bucket_name, credentials=None, client=None):
         """
         If bucket with bucket_name does not exists => creates new one
         """
-        available_buckets = S3.get_buckets()
+        client = client if client is not None else S3.get_client(credentials)
+        available_buckets = S3.get_buckets(client=client)
         if bucket_name not in available_buckets:
-            S3.create_bucket(bucket_name)
+            S3.create_bucket(bucket_name, client=client)
         
     @staticmethod
     def get_buckets(with_creation_date=False, client=None, credentials=None):
@@ -81,7 +116,7 @@ class S3:
         return [bucket['Name'] for bucket in response['Buckets']]
     
     @staticmethod
-    def create_json_in_bucket_if_not_exists(bucket_name, file_name, initial_json=None):
+    def create_json_in_bucket_if_not_exists(bucket_name, file_name, initial_json=None, client=None, credentials=None):
         """
         Creates json in bucket if json not exists
         
@@ -90,16 +125,19 @@ class S3:
             file_name (str): path to file 
             initial_json (None or dumped json): json to store
         """
+        client = client if client is not None else S3.get_client(credentials)
         filenames = S3.get_all_objects_from_bucket(bucket_name = bucket_name, 
                                                    prefix = file_name, 
-                                                   only_keys = True)
+                                                   only_keys = True,
+                                                   client = client)
         if file_name not in filenames:
             if initial_json is None:
                 initial_json = json.dumps({})
             
             S3.store_file_in_bucket(bucket_name = bucket_name,
                                     file_name = file_name,
-                                    file = initial_json)
+                                    file = initial_json,
+                                    client = client)
     
     @staticmethod
     def store_file_in_bucket(bucket_name, file_name, file, client=None, credentials=None):
@@ -149,17 +187,38 @@ class S3:
         return io.BytesIO(body)
         
     @staticmethod
-    def get_all_objects_from_bucket(bucket_name, prefix='', only_keys=True, client=None, credentials=None):
+    def get_date_prefix(date):
         """
-        Get all object from bucket
+        Returns prefix of date partition (dt=YYYY-MM-DD/)
         
         Params:
-            bucket_name (str): name of bucket where to store file
-            prefix (str): file filter
+            date (datetime.date, datetime.datetime or str YYYYmmdd...): date of partition
+        """
+        if isinstance(date, str):
+            date = dt.datetime.strptime(date[:8], '%Y%m%d')
+        
+        return f'dt={date:%Y-%m-%d}/'
+    
+    @staticmethod
+    def get_partitioned_key(file_name, date):
+        """
+        Returns key of file in date partition (dt=YYYY-MM-DD/file_name)
+        """
+        return S3.get_date_prefix(date) + file_name
+    
+    @staticmethod
+    def iter_objects_from_bucket(bucket_name, prefix='', only_keys=True, start_after=None, client=None, credentials=None):
+        """
+        Iterate over objects from bucket page by page (keys are returned in ascending order)
+        
+        Params:
+            bucket_name (str): name of bucket
+            prefix (str): file filter (e.g. date partition dt=YYYY-MM-DD/)
             only_keys (bool): if True => returns only filenames
+            start_after (str): return only keys after this key
             
         Returns:
-            list with filenames or list with dictionaries containing files info
+            generator of filenames or dictionaries containing files info
         """
         client = client if client is not None else S3.get_client(credentials)
 
@@ -168,21 +227,172 @@ class S3:
             'Prefix': prefix,    
         }
         
-        data = []
+        if start_after:
+            kwargs['StartAfter'] = start_after
+        
         while True:
             response = client.list_objects_v2(**kwargs)
             
             if response['ResponseMetadata']['HTTPStatusCode'] != 200:
                 raise Exception(response)
             
-            if only_keys:
-                data += [c.get('Key') for c in response.get('Contents',[])]
-            else:
-                data += response.get('Contents',[])
+            for content in response.get('Contents',[]):
+                yield content.get('Key') if only_keys else content
 
             try:
                 kwargs['ContinuationToken'] = response['NextContinuationToken']
             except KeyError:
                 break
-
-        return data
\ No newline at end of file
+    
+    @staticmethod
+    def get_all_objects_from_bucket(bucket_name, prefix='', only_keys=True, client=None, credentials=None):
+        """
+        Get all object from bucket
+        
+        Params:
+            bucket_name (str): name of bucket where to store file
+            prefix (str): file filter
+            only_keys (bool): if True => returns only filenames
+            
+        Returns:
+            list with filenames or list with dictionaries containing files info
+        """
+        return list(S3.iter_objects_from_bucket(bucket_name, prefix, only_keys, client=client, credentials=credentials))
+    
+    @staticmethod
+    def _with_retry(function, file_name, max_retries):
+        for retry in range(1, max_retries + 1):
+            try:
+                return function()
+            except Exception as e:
+                if retry == max_retries:
+                    raise
+                
+                logger.warning(f'"{file_name}" failed ({retry}/{max_retries}): {e}')
+                time.sleep(2 ** (retry - 1))
+    
+    @staticmethod
+    def _run_many(tasks, function, max_workers, max_in_flight_bytes):
+        """
+        Run function(task) on thread pool and yield (task, result, error) in order of completion
+        
+        Params:
+            tasks (iterable): tuples (name, size, payload), size None => unknown
+            function (callable): transfer of one object, returns tuple (result, transferred bytes or None)
+            max_workers (int): number of threads
+            max_in_flight_bytes (int): maximal size of running and not yet consumed transfers
+        """
+        tasks = iter(tasks)
+        running = {}
+        in_flight_bytes = 0
+        # average size of finished transfers is used for objects with unknown size
+        transferred_bytes, transferred_count = 0, 0
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while True:
+                # at least one transfer is always running
+                while len(running) < max_workers and (not running or in_flight_bytes < max_in_flight_bytes):
+                    task = next(tasks, None)
+                    if task is None:
+                        break
+                    
+                    name, size, payload = task
+                    reserved = size if size is not None else (transferred_bytes // transferred_count if transferred_count else 0)
+                    running[executor.submit(function, name, payload)] = (name, reserved)
+                    in_flight_bytes += reserved
+                
+                if not running:
+                    return
+                
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, reserved = running.pop(future)
+                    
+                    try:
+                        (result, size), error = future.result(), None
+                    except Exception as e:
+                        result, size, error = None, None, e
+                        logger.warning(f'"{name}" failed: {e}')
+                    
+                    if size is not None:
+                        transferred_bytes += size
+                        transferred_count += 1
+                    
+                    yield name, result, error
+                    
+                    # bytes are released only after caller consumed the result
+                    in_flight_bytes -= reserved
+    
+    @staticmethod
+    def get_many(bucket_name, file_names, as_json=False, max_workers=16, max_in_flight_bytes=64 * 1024 * 1024, 
+                 max_retries=3, client=None, credentials=None):
+        """
+        Get many files from bucket concurrently
+        
+        Params:
+            bucket_name (str): name of bucket
+            file_names (iterable): paths to files or dictionaries with Key and Size (from iter_objects_from_bucket)
+            as_json (bool): if True => convert response bodies to json
+            max_workers (int): number of threads
+            max_in_flight_bytes (int): maximal size of downloaded and not yet consumed files
+            max_retries (int): how many times download of one file is tried
+            
+        Returns:
+            generator of tuples (file_name, bytes or json, exception) in order of completion, 
+            exception is None for downloaded files
+        """
+        client = client if client is not None else S3.get_client(credentials, max_pool_connections=max(max_workers, S3.MAX_POOL_CONNECTIONS))
+        
+        def get(file_name, _):
+            def get_object():
+                response = client.get_object(Bucket = bucket_name,
+                                             Key = file_name)
+                
+                if response['ResponseMetadata']['HTTPStatusCode'] != 200:
+                    raise Exception(response)
+                
+                return response['Body'].read()
+            
+            body = S3._with_retry(get_object, file_name, max_retries)
+            
+            # size of body is learned before json conversion (json objects have no size)
+            return (json.loads(body) if as_json else body), len(body)
+        
+        tasks = (
+            (file_name['Key'], file_name.get('Size'), None) if isinstance(file_name, dict) else (file_name, None, None)
+            for file_name in file_names
+        )
+        
+        return S3._run_many(tasks, get, max_workers, max_in_flight_bytes)
+    
+    @staticmethod
+    def put_many(bucket_name, files, max_workers=16, max_in_flight_bytes=64 * 1024 * 1024, 
+                 max_retries=3, client=None, credentials=None):
+        """
+        Store many files in bucket concurrently
+        
+        Params:
+            bucket_name (str): name of bucket
+            files (iterable): tuples (file_name, file), file is dumped json or binary
+            max_workers (int): number of threads
+            max_in_flight_bytes (int): maximal size of files being uploaded
+            max_retries (int): how many times upload of one file is tried
+            
+        Returns:
+            generator of tuples (file_name, None, exception) in order of completion,
+            exception is None for stored files
+        """
+        client = client if client is not None else S3.get_client(credentials, max_pool_connections=max(max_workers, S3.MAX_POOL_CONNECTIONS))
+        
+        def put(file_name, file):
+            S3._with_retry(
+                lambda: S3.store_file_in_bucket(bucket_name, file_name, file, client=client), 
+                file_name, 
+                max_retries
+            )
+            
+            return None, None
+        
+        tasks = ((file_name, len(file), file) for file_name, file in files)
+        
+        return S3._run_many(tasks, put, max_workers, max_in_flight_bytes)
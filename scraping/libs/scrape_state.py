@@ -0,0 +1,116 @@
+import sqlite3
+import logging
+import threading
+import datetime as dt
+
+logger = logging.getLogger(__name__)
+
+TIME_FORMAT = '%Y%m%d%H%M%S'
+
+
+class ScrapeStateIndex:
+    CREATE_SQL = '''CREATE TABLE IF NOT EXISTS cars(
+                        id                  TEXT PRIMARY KEY,
+                        price               TEXT,
+                        last_seen           TEXT,
+                        details_fetched     TEXT
+                    )'''
+
+    def __init__(self, path: str, details_max_age_days: float = 7):
+        """
+        Local index of last seen price and last details scrape of every car
+
+        Parameters
+        ----------
+        path: str
+            Path to sqlite file with index
+        details_max_age_days: float
+            Details older than this number of days are scraped again even if card is unchanged
+        """
+        self.DETAILS_MAX_AGE = dt.timedelta(days=details_max_age_days)
+
+        # index is used from scraping and uploading threads
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(self.CREATE_SQL)
+        self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def get(self, car_id: str) -> dict:
+        """
+        Get stored state of car
+
+        Returns
+        -------
+        dict or None
+            Stored price, last_seen and details_fetched of car
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT price, last_seen, details_fetched FROM cars WHERE id = ?', (car_id,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return dict(zip(['price', 'last_seen', 'details_fetched'], row))
+
+    def needs_details(self, description: dict, now: str) -> bool:
+        """
+        Decide whether car details have to be scraped (new car, changed price or too old details)
+
+        Parameters
+        ----------
+        description: dict
+            Card description (id, url, price)
+        now: str
+            Current time string (YYYYmmddHHMMSS)
+
+        Returns
+        -------
+        bool
+            True => scrape details, False => price snapshot from card is enough
+        """
+        # price of card could not be parsed (or was not stored) => unchanged card can not be recognized
+        if description.get('price') is None:
+            return True
+
+        state = self.get(description['id'])
+
+        if state is None or state['details_fetched'] is None or state['price'] is None:
+            return True
+
+        if state['price'] != description['price']:
+            return True
+
+        details_age = dt.datetime.strptime(now, TIME_FORMAT) - dt.datetime.strptime(state['details_fetched'], TIME_FORMAT)
+
+        return details_age > self.DETAILS_MAX_AGE
+
+    def mark_seen(self, car_id: str, price: str, now: str) -> None:
+        """
+        Store price of car seen on search card
+        """
+        with self._lock:
+            self._conn.execute(
+                '''INSERT INTO cars (id, price, last_seen) VALUES (?, ?, ?)
+                   ON CONFLICT(id) DO UPDATE SET price = excluded.price, last_seen = excluded.last_seen''',
+                (car_id, price, now)
+            )
+            self._conn.commit()
+
+    def mark_details_fetched(self, car_id: str, price: str, now: str) -> None:
+        """
+        Store price and time of successful details scrape
+        """
+        with self._lock:
+            self._conn.execute(
+                '''INSERT INTO cars (id, price, last_seen, details_fetched) VALUES (?, ?, ?, ?)
+                   ON CONFLICT(id) DO UPDATE SET price = excluded.price, last_seen = excluded.last_seen,
+                                                 details_fetched = excluded.details_fetched''',
+                (car_id, price, now, now)
+            )
+            self._conn.commit()
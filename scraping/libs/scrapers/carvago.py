@@ -1,18 +1,80 @@
 import re
 import time
+import queue
 import logging
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.action_chains import ActionChains
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
 
+from libs.rate_limit import Throttle
 from libs.scrapers.base import BaseScraper
+from libs.scrapers.pool import BrowserWorkerPool
+from libs.scrapers.session import BrowserSession
 
 logger = logging.getLogger(__name__)
 
+# resources not needed for reading text nodes and image src attributes
+FONT_AND_MEDIA_URL_PATTERNS = ['*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot', '*.mp4', '*.webm', '*.mp3']
+TRACKER_URL_PATTERNS = [
+    '*google-analytics.com*', 
+    '*googletagmanager.com*', 
+    '*doubleclick.net*', 
+    '*googleadservices.com*',
+    '*facebook.net*', 
+    '*facebook.com/tr*', 
+    '*hotjar.com*', 
+    '*bat.bing.com*',
+    '*clarity.ms*',
+    '*tiktok.com*',
+]
+
+RESOURCE_BLOCKING_PROFILES = {
+    'none': {'images': False, 'url_patterns': []},
+    'trackers': {'images': False, 'url_patterns': TRACKER_URL_PATTERNS},
+    'full': {'images': True, 'url_patterns': FONT_AND_MEDIA_URL_PATTERNS + TRACKER_URL_PATTERNS},
+}
+
+# scripts reading whole page in one webdriver round trip
+CARDS_DESCRIPTION_SCRIPT = '''
+return Array.from(document.getElementsByClassName('gtm-element-visibility-impressions-list')).map(card => {
+    const price = card.getElementsByClassName('e14v3bw44')[0];
+    return {
+        id: card.getAttribute('data-car-id'),
+        url: card.href || card.getAttribute('href'),
+        price: price ? price.innerText : null
+    };
+});
+'''
+
+CAR_DETAILS_SCRIPT = '''
+const text = elem => (elem.innerText || '').trim();
+const byClass = name => Array.from(document.getElementsByClassName(name));
+const price = byClass('e1hgzarh2')[0];
+return {
+    price: price ? text(price) : null,
+    names: byClass('e18uvu5d2').map(text),
+    values: byClass('e18uvu5d4').map(text),
+    features: byClass('eoxqr1g1').map(text),
+    photos: byClass('e1sb5aaj0').map(elem => {
+        const img = elem.getElementsByTagName('img')[0];
+        return img ? img.src : null;
+    })
+};
+'''
+
 
 class CarvagoScraper(BaseScraper):
-    def __init__(self, path_to_chromedriver: str = '', headless: bool = True, sleep_time: float = 1):
+    def __init__(self, path_to_chromedriver: str = '', headless: bool = True, sleep_time: float = 1,
+                 min_request_interval: float = 0, browser_max_pages: int = 200, browser_max_rss_mb: float = 1500,
+                 wait_timeout: float = 10, extraction_mode: str = 'elements', resource_blocking: str = 'none',
+                 search_workers: int = 1, page_retries: int = 2):
         """
         Parameters
         ----------
@@ -21,12 +83,38 @@ class CarvagoScraper(BaseScraper):
         headless: bool
             Browser headles
         sleep_time: float
-            Sleep time in seconds between requests
+            Initial sleep time in seconds between retries of failed page load
+        min_request_interval: float
+            Minimal time in seconds between two page loads across all browsers of this scraper
+        browser_max_pages: int
+            Restart browser session after this number of loaded pages (0 => never)
+        browser_max_rss_mb: float
+            Restart browser session when its memory exceeds this limit in MB (0 => never)
+        wait_timeout: float
+            Maximal time in seconds to wait for elements needed from loaded page
+        extraction_mode: str
+            elements (one webdriver call per element) or script (whole page read by one injected script)
+        resource_blocking: str
+            Profile of resources which are not loaded by browser (see RESOURCE_BLOCKING_PROFILES): 
+            none, trackers (analytics and ads domains) or full (images, fonts, media and trackers; 
+            image src attributes are still available, but gallery opened by with_photos can be empty)
+        search_workers: int
+            Number of browsers loading search pages in parallel
+        page_retries: int
+            How many times are failed search pages loaded again (after all other pages are done)
         """
         
         self.PATH_TO_CHROMEDRIVER = path_to_chromedriver
         self.HEADLESS = headless
         self.SLEEP_TIME = sleep_time
+        self.THROTTLE = Throttle(min_request_interval)
+        self.BROWSER_MAX_PAGES = browser_max_pages
+        self.BROWSER_MAX_RSS_MB = browser_max_rss_mb
+        self.WAIT_TIMEOUT = wait_timeout
+        self.EXTRACTION_MODE = extraction_mode
+        self.RESOURCE_BLOCKING = RESOURCE_BLOCKING_PROFILES[resource_blocking]
+        self.SEARCH_WORKERS = max(1, search_workers)
+        self.PAGE_RETRIES = page_retries
     
     @staticmethod   
     def _parse_price(text: str) -> float:
@@ -120,6 +208,37 @@ class CarvagoScraper(BaseScraper):
 
         return descriptions
     
+    @staticmethod
+    def _get_cards_description_by_script(browser: webdriver) -> list:
+        """
+        Get cards description (url, id, price) using one injected script
+
+        Parameters
+        ----------
+        browser: webdriver 
+            Instance of webdriver
+
+        Returns
+        -------
+        list
+            Description to all cars found on current page
+        """
+        descriptions = []
+        for card in browser.execute_script(CARDS_DESCRIPTION_SCRIPT):
+            description = {}
+            
+            try:
+                description['id'] = card['id'].strip()
+                description['url'] = card['url'].strip()
+                description['price'] = CarvagoScraper._parse_price(card['price'].strip())
+            
+            except Exception as e:
+                logger.warning(e)
+            
+            descriptions.append(description)
+
+        return descriptions
+    
     @staticmethod
     def _get_max_page_num(browser: webdriver) -> int:
         """
@@ -138,7 +257,35 @@ class CarvagoScraper(BaseScraper):
         
         return int(browser.find_elements_by_class_name('Pagination-item')[-1].text.strip())
     
-    def _load_url(self, browser: webdriver, url: str, max_retries: int = 1) -> None:
+    def _wait_for(self, browser: webdriver, css_selector: str) -> float:
+        """
+        Wait until element is present on page
+        
+        Parameters
+        ----------
+        browser: webdriver 
+            Instance of webdriver
+            
+        css_selector: str
+            Selector of element to wait for
+            
+        Returns
+        -------
+        float
+            Time in seconds spent by waiting
+        """
+        start = time.monotonic()
+        try:
+            WebDriverWait(browser, self.WAIT_TIMEOUT).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, css_selector))
+            )
+        finally:
+            waited = time.monotonic() - start
+            logger.info(f'Waited {waited:.2f}s for "{css_selector}"')
+        
+        return waited
+    
+    def _load_url(self, browser: webdriver, url: str, max_retries: int = 1, wait_for: str = None) -> None:
         """
         Load url
 
@@ -152,35 +299,43 @@ class CarvagoScraper(BaseScraper):
             
         max_retries: int
             How many retries is possible
+            
+        wait_for: str
+            Css selector of element which must be present before page is scraped 
+            (None => sleep SLEEP_TIME seconds instead)
         """
-        logging.info(f'Loading: {url}')
+        logger.info(f'Loading: {url}')
         
         sleep_time = self.SLEEP_TIME
         retries = 1
         while True:
             try:
+                self.THROTTLE.wait()
                 browser.get(url)
                 break
             except:
-                if retry == max_retries:
+                if retries >= max_retries:
                     raise
                 else:
+                    time.sleep(sleep_time)
                     sleep_time *= 2
                     retries += 1
-                    time.sleep(sleep_time)
-                    
-                    
-        time.sleep(self.SLEEP_TIME)
+        
+        if wait_for is None:
+            time.sleep(self.SLEEP_TIME)
+        else:
+            self._wait_for(browser, wait_for)
+        
         browser.maximize_window()
     
-    def _init_browser(self) -> webdriver:
+    def _get_chrome_options(self) -> Options:
         """
-        Initialize browser
+        Get chrome options of new browser
 
         Returns
         -------
-        set
-            Urls to all cars found on current page
+        Options
+            Chrome options with images blocked by resource blocking profile
         """
         chrome_options = Options()
         chrome_options.add_argument("--disable-popup-blocking")
@@ -188,19 +343,189 @@ class CarvagoScraper(BaseScraper):
         chrome_options.add_argument("--start-maximized")
         chrome_options.add_argument('--no-sandbox')
         chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_experimental_option('prefs', {'intl.accept_languages': 'en,en_US'})
+        
+        prefs = {'intl.accept_languages': 'en,en_US'}
+        if self.RESOURCE_BLOCKING['images']:
+            prefs['profile.managed_default_content_settings.images'] = 2
+        chrome_options.add_experimental_option('prefs', prefs)
         
         if self.HEADLESS:
             chrome_options.add_argument("--headless")
         
+        return chrome_options
+    
+    def _init_browser(self) -> webdriver:
+        """
+        Initialize browser
+
+        Returns
+        -------
+        webdriver
+            Instance of webdriver with applied resource blocking profile
+        """
+        chrome_options = self._get_chrome_options()
+        
         if self.PATH_TO_CHROMEDRIVER == '':
-            return webdriver.Chrome(options=chrome_options)
-  
-        return webdriver.Chrome(self.PATH_TO_CHROMEDRIVER, options=chrome_options)
+            browser = webdriver.Chrome(options=chrome_options)
+        else:
+            browser = webdriver.Chrome(self.PATH_TO_CHROMEDRIVER, options=chrome_options)
+        
+        # block fonts, media and trackers using devtools
+        if self.RESOURCE_BLOCKING['url_patterns']:
+            browser.execute_cdp_cmd('Network.enable', {})
+            browser.execute_cdp_cmd('Network.setBlockedURLs', {'urls': self.RESOURCE_BLOCKING['url_patterns']})
+        
+        return browser
 
-    def get_advertised_cars(self, url: str, page_limit: int = 1000) -> list:
+    def session(self) -> BrowserSession:
         """
-        Get advertised cars description (url, id, price)
+        Create browser session which can be shared by get_advertised_cars and get_car_details
+
+        Returns
+        -------
+        BrowserSession
+            Lazily started browser recycled after browser_max_pages pages or browser_max_rss_mb of memory
+        """
+        return BrowserSession(self._init_browser, self.BROWSER_MAX_PAGES, self.BROWSER_MAX_RSS_MB)
+
+    def _get_page_descriptions(self, sessions: queue.Queue, page_url: str) -> list:
+        """
+        Load search page and get its cards description
+
+        Parameters
+        ----------
+        sessions: queue.Queue
+            Free browser sessions (one is borrowed while page is loaded)
+            
+        page_url: str
+            Url of search page
+
+        Returns
+        -------
+        list
+            Description to all cars found on page
+        """
+        session = sessions.get()
+        try:
+            browser = session.get_browser()
+            self._load_url(browser, page_url, 5, wait_for='.gtm-element-visibility-impressions-list')
+            
+            if self.EXTRACTION_MODE == 'script':
+                return CarvagoScraper._get_cards_description_by_script(browser)
+            
+            return CarvagoScraper._get_cards_description(browser)
+        
+        except Exception:
+            session.invalidate_if_dead()
+            raise
+        
+        finally:
+            sessions.put(session)
+    
+    @staticmethod
+    def _iter_unique_descriptions(get_page_descriptions, page_nums, max_page_num: int, num_workers: int,
+                                  page_retries: int, on_finished=None, on_page_done=None):
+        """
+        Load search pages in parallel, retry failed pages and yield every car only once
+        
+        Parameters
+        ----------
+        get_page_descriptions: callable
+            Function loading page by its number and returning its cards description (raises if page failed)
+            
+        page_nums: iterable
+            Numbers of pages to load
+            
+        max_page_num: int
+            Total number of pages (only for logging)
+            
+        num_workers: int
+            Number of pages loaded in parallel
+            
+        page_retries: int
+            How many times are failed pages loaded again (after all other pages are done)
+            
+        on_finished: callable
+            Called as soon as no page will be loaded anymore (before the last descriptions are consumed)
+            
+        on_page_done: callable
+            Called with page number and all its cards description as soon as page is loaded
+
+        Returns
+        -------
+        generator
+            Cars cards description (each car only once, even if it moved between pages during search)
+        """
+        # ads shift between pages while we paginate => same car can be found on two pages
+        seen_ids = set()
+        # bounded number of submitted pages => pages are loaded only as fast as descriptions are consumed
+        window = 2 * num_workers
+        
+        finished = False
+        def finish():
+            nonlocal finished
+            if not finished and on_finished is not None:
+                on_finished()
+            finished = True
+        
+        page_nums = list(page_nums)
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            for attempt in range(page_retries + 1):
+                if attempt > 0:
+                    logger.info(f'Retrying {len(page_nums)} failed pages ({attempt}/{page_retries})...')
+                
+                waiting = deque(page_nums)
+                running = {}
+                failed_page_nums = []
+                while waiting or running:
+                    while waiting and len(running) < window:
+                        page_num = waiting.popleft()
+                        running[executor.submit(get_page_descriptions, page_num)] = page_num
+                    
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    
+                    new_descriptions = []
+                    for future in done:
+                        page_num = running.pop(future)
+                        try:
+                            page_descriptions = future.result()
+                        except Exception as e:
+                            logger.warning(f'Page {page_num} failed: {e}')
+                            failed_page_nums.append(page_num)
+                            continue
+                        
+                        logger.info(f'Scraped page {page_num}/{max_page_num}')
+                        if on_page_done is not None:
+                            on_page_done(page_num, page_descriptions)
+                        new_descriptions += page_descriptions
+                    
+                    # the last page is done and nothing will be retried => browsers are not needed anymore
+                    if not waiting and not running and (not failed_page_nums or attempt == page_retries):
+                        finish()
+                    
+                    for description in new_descriptions:
+                        if description.get('id') in seen_ids:
+                            continue
+                        
+                        if 'id' in description:
+                            seen_ids.add(description['id'])
+                        
+                        yield description
+                
+                page_nums = sorted(failed_page_nums)
+                if not page_nums:
+                    break
+        
+        finish()
+        
+        if page_nums:
+            logger.warning(f'Pages {page_nums} failed after {page_retries} retries!')
+    
+    def iter_advertised_cars(self, url: str, page_limit: int = 1000, session: BrowserSession = None,
+                             done_pages: set = None, on_page_done=None):
+        """
+        Get advertised cars description (url, id, price) as soon as each search page is parsed,
+        search pages are loaded by search_workers browsers in parallel and failed pages are retried
         
         Parameters
         ----------
@@ -209,39 +534,95 @@ class CarvagoScraper(BaseScraper):
             
         page_limit: int
             Maximum number of pages to search on
+            
+        session: BrowserSession
+            Browser session to use (if None => new session is created and closed at the end)
+            
+        done_pages: set
+            Numbers of pages which are not loaded (e.g. done by interrupted run)
+            
+        on_page_done: callable
+            Called with page number and all its cards description as soon as page is loaded
 
         Returns
         -------
-        list
-            All available cars cards description
+        generator
+            Cars cards description (each car only once, even if it moved between pages during search)
         """
-        descriptions = []
-        with self._init_browser() as browser:
+        called_without_session = session is None
+        if called_without_session:
+            session = self.session()
+        
+        # browsers are started lazily => sessions of idle workers cost nothing
+        own_sessions = [self.session() for _ in range(self.SEARCH_WORKERS - 1)]
+        sessions = queue.Queue()
+        for s in [session] + own_sessions:
+            sessions.put(s)
+        
+        def quit_own_sessions():
+            for s in own_sessions:
+                s.quit()
+        
+        try:
             # load main page
-            self._load_url(browser, url, 5)
+            browser = session.get_browser()
+            self._load_url(browser, url, 5, wait_for='.Pagination-item')
             
             # get total number of pages
             max_page_num = CarvagoScraper._get_max_page_num(browser)
             logger.info(f'Found {max_page_num} pages!')
             
-            for page_num in range(1, min(max_page_num, page_limit) + 1):
-                logger.info(f'Scraping page {page_num}/{max_page_num}...')
-                # consider page num in url
-                page_url = CarvagoScraper._add_page_num_to_url(browser.current_url, page_num)
-                
-                # load page
-                try:
-                    self._load_url(browser, page_url, 5)
-                except Exception as e:
-                    logger.warning(e)
-                    continue
-                
-                # load cards descriptions from current page
-                new_descriptions = CarvagoScraper._get_cards_description(browser)
-                
-                descriptions += new_descriptions
+            # remember search url (browser can be recycled during pagination)
+            search_url = browser.current_url
+            
+            page_nums = [page_num for page_num in range(1, min(max_page_num, page_limit) + 1) 
+                         if page_num not in (done_pages or ())]
+            yield from CarvagoScraper._iter_unique_descriptions(
+                lambda page_num: self._get_page_descriptions(sessions, CarvagoScraper._add_page_num_to_url(search_url, page_num)),
+                page_nums, max_page_num, self.SEARCH_WORKERS, self.PAGE_RETRIES,
+                # search is streamed into details scraping => extra browsers are quit before details are done
+                on_finished = quit_own_sessions,
+                on_page_done = on_page_done
+            )
+        finally:
+            quit_own_sessions()
+            
+            if called_without_session:
+                session.quit()
+    
+    def get_advertised_cars(self, url: str, page_limit: int = 1000, session: BrowserSession = None) -> list:
+        """
+        Get advertised cars description (url, id, price)
         
-        return descriptions
+        Parameters
+        ----------
+        url: str
+            Search url (first page of search)
+            
+        page_limit: int
+            Maximum number of pages to search on
+            
+        session: BrowserSession
+            Browser session to use (if None => new session is created and closed at the end)
+
+        Returns
+        -------
+        list
+            All available cars cards description
+        """
+        return list(self.iter_advertised_cars(url, page_limit, session))
+    
+    def _open_gallery(self, browser: webdriver) -> None:
+        """
+        Click on first image and wait until gallery with all photos is rendered
+
+        Parameters
+        ----------
+        browser: webdriver 
+            Instance of webdriver
+        """
+        browser.find_element_by_class_name('image-gallery-image').click()
+        self._wait_for(browser, '.e1sb5aaj0 img')
     
     def _get_photos_urls(self, browser: webdriver) -> list:
         """
@@ -261,8 +642,7 @@ class CarvagoScraper(BaseScraper):
 
         try:
             # click on first image
-            browser.find_element_by_class_name('image-gallery-image').click()
-            time.sleep(self.SLEEP_TIME)
+            self._open_gallery(browser)
 
             # load all photos urls
             photos_urls = [
@@ -274,7 +654,97 @@ class CarvagoScraper(BaseScraper):
 
         return photos_urls
     
-    def get_car_details(self, url: str, browser: webdriver = None, with_photos: bool = False) -> dict:
+    def _get_car_details_by_elements(self, browser: webdriver, url: str, with_photos: bool = False) -> dict:
+        """
+        Read car details from loaded page element by element
+        
+        Parameters
+        ----------
+        browser: webdriver 
+            Instance of webdriver with loaded car page
+            
+        url: str
+            Car url 
+            
+        with_photos: bool
+            Scrape also photos urls
+
+        Returns
+        -------
+        dict
+            Informations about advertised car
+        """
+        car_details = {}
+        car_details['photos'] = []
+        car_details['url'] = url
+        car_details['price'] = CarvagoScraper._parse_price(browser.find_element_by_class_name('e1hgzarh2').text.strip())
+
+        # load brand, mileage, color,...
+        for name_elem, value_elem in zip(
+            browser.find_elements_by_class_name('e18uvu5d2'), 
+            browser.find_elements_by_class_name('e18uvu5d4')
+        ):
+            name = '_'.join(name_elem.text.strip().lower().split(' '))
+            value = value_elem.text.strip()
+            car_details[name] = value
+
+        # load additional features
+        car_details['features'] = [elem.text.strip() for elem in browser.find_elements_by_class_name('eoxqr1g1')]
+
+        # load photos
+        if with_photos:
+            car_details['photos'] = self._get_photos_urls(browser)
+        
+        return car_details
+    
+    def _get_car_details_by_script(self, browser: webdriver, url: str, with_photos: bool = False) -> dict:
+        """
+        Read car details from loaded page using one injected script (one webdriver round trip)
+        
+        Parameters
+        ----------
+        browser: webdriver 
+            Instance of webdriver with loaded car page
+            
+        url: str
+            Car url 
+            
+        with_photos: bool
+            Scrape also photos urls
+
+        Returns
+        -------
+        dict
+            Informations about advertised car (same format as _get_car_details_by_elements)
+        """
+        if with_photos:
+            try:
+                self._open_gallery(browser)
+            except Exception as e:
+                logger.warning(e)
+        
+        data = browser.execute_script(CAR_DETAILS_SCRIPT)
+        
+        car_details = {}
+        car_details['photos'] = []
+        car_details['url'] = url
+        car_details['price'] = CarvagoScraper._parse_price(data['price'])
+
+        # load brand, mileage, color,...
+        for name, value in zip(data['names'], data['values']):
+            car_details['_'.join(name.lower().split(' '))] = value
+
+        # load additional features
+        car_details['features'] = data['features']
+
+        # load photos
+        if with_photos:
+            car_details['photos'] = [photo for photo in data['photos'] if photo]
+        
+        return car_details
+    
+    def get_car_details(self, url: str, browser: webdriver = None, with_photos: bool = False, 
+                        session: BrowserSession = None) -> dict:
         """
         Get all available informations about advertised car
         
@@ -285,53 +755,82 @@ class CarvagoScraper(BaseScraper):
             
         browser: webdriver 
             Instance of webdriver
+            
+        with_photos: bool
+            Scrape also photos urls
+            
+        session: BrowserSession
+            Browser session to use when browser is not passed
+            (if both are None => new browser is started and quit at the end)
 
         Returns
         -------
         dict
             Informations about advertised car
         """
-        called_without_browser = False
+        called_without_browser = browser is None and session is None
+        if called_without_browser:
+            session = self.session()
+        
         try:
-            # init browser if not passed as argumennt
             if browser is None:
-                called_without_browser = True
-                browser = self._init_browser()
-
-            self._load_url(browser, url, 5)
-
-            car_details = {}
-            car_details['photos'] = []
-            car_details['url'] = url
-            car_details['price'] = CarvagoScraper._parse_price(browser.find_element_by_class_name('e1hgzarh2').text.strip())
-
-            # load brand, mileage, color,...
-            for name_elem, value_elem in zip(
-                browser.find_elements_by_class_name('e18uvu5d2'), 
-                browser.find_elements_by_class_name('e18uvu5d4')
-            ):
-                name = '_'.join(name_elem.text.strip().lower().split(' '))
-                value = value_elem.text.strip()
-                car_details[name] = value
-
-            # load additional features
-            car_details['features'] = [elem.text.strip() for elem in browser.find_elements_by_class_name('eoxqr1g1')]
+                browser = session.get_browser()
 
-            # load photos
-            if with_photos:
-                car_details['photos'] = self._get_photos_urls(browser)
+            # wait for price and parameters table
+            self._load_url(browser, url, 5, wait_for='.e1hgzarh2')
+            self._wait_for(browser, '.e18uvu5d4')
 
-            # if function is not called in loop => quit browser
-            if browser and called_without_browser:
-                browser.quit()
+            if self.EXTRACTION_MODE == 'script':
+                car_details = self._get_car_details_by_script(browser, url, with_photos)
+            else:
+                car_details = self._get_car_details_by_elements(browser, url, with_photos)
         
         except Exception as e:
             logger.warning(e)
+            if session is not None:
+                session.invalidate_if_dead()
             return None
         
+        finally:
+            # if function is not called in loop => quit browser
+            if called_without_browser:
+                session.quit()
+        
         return car_details
     
-    def get_multiple_cars_details(self, urls: list, with_photos: bool = False) -> list:
+    def iter_multiple_cars_details(self, urls, with_photos: bool = False, num_workers: int = 1,
+                                   session: BrowserSession = None, queue_size: int = 0):
+        """
+        Get all available informations about multiple cars using pool of browsers
+        
+        Parameters
+        ----------
+        urls: iterable
+            Urls to advertised cars (can be generator, scraping starts with its first url)
+            
+        with_photos: bool
+            Scrape also photos urls
+            
+        num_workers: int
+            Number of browsers scraping in parallel
+            
+        session: BrowserSession
+            Existing session reused by the first worker (it is not closed by the pool)
+            
+        queue_size: int
+            Maximal number of urls waiting for worker (0 => twice the number of workers)
+
+        Returns
+        -------
+        generator
+            Informations about cars (None if scraping failed) in the same order as urls
+            (exception of urls generator is raised after already fed urls are scraped)
+        """
+        pool = BrowserWorkerPool(self, num_workers, with_photos, queue_size)
+        
+        return pool.imap(urls, session)
+    
+    def get_multiple_cars_details(self, urls: list, with_photos: bool = False, num_workers: int = 1) -> list:
         """
         Get all available informations about multiple cars at once
         
@@ -339,20 +838,20 @@ class CarvagoScraper(BaseScraper):
         ----------
         urls: list
             Urls to advertised cars
+            
+        with_photos: bool
+            Scrape also photos urls
+            
+        num_workers: int
+            Number of browsers scraping in parallel
 
         Returns
         -------
         list
             Informations about all cars from list
         """
-        cars_details = []
-        len_urls = len(urls)
-        
-        with self._init_browser() as browser:
-            for i, url in enumerate(urls):
-                logger.info(f'Scraping {i+1}/{len_urls}')
-                car_details = self.get_car_details(url, browser, with_photos)
-                if car_details:
-                    cars_details.append(car_details)
-                    
-        return cars_details
\ No newline at end of file
+        return [
+            car_details 
+            for car_details in self.iter_multiple_cars_details(urls, with_photos, num_workers)
+            if car_details
+        ]
\ No newline at end of file
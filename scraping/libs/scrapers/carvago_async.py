@@ -0,0 +1,444 @@
+import time
+import queue
+import asyncio
+import logging
+import aiohttp
+import threading
+import contextlib
+
+from lxml import html
+
+from libs.rate_limit import AdaptiveRateLimiter
+from libs.scrapers.base import BaseScraper
+from libs.scrapers.carvago import CarvagoScraper
+from libs.scrapers.carvago_http import CarvagoHttpScraper, HEADERS
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class CarvagoAsyncScraper(BaseScraper):
+    def __init__(self, concurrency: int = 8, requests_per_second: float = 2, min_requests_per_second: float = 0.2,
+                 max_requests_per_second: float = None, target_latency: float = 2, timeout: float = 30,
+                 page_retries: int = 2):
+        """
+        Asyncio scraper with bounded concurrency and adaptive token bucket rate limit per host
+
+        Parameters
+        ----------
+        concurrency: int
+            Maximal number of requests in flight
+        requests_per_second: float
+            Target rate of requests per host
+        min_requests_per_second: float
+            Lower bound of adapted rate
+        max_requests_per_second: float
+            Upper bound of adapted rate (None => requests_per_second)
+        target_latency: float
+            Responses slower than this (in seconds) decrease the rate
+        timeout: float
+            Request timeout in seconds
+        page_retries: int
+            How many times are failed search pages loaded again (after all other pages are done)
+        """
+        self.CONCURRENCY = concurrency
+        self.REQUESTS_PER_SECOND = requests_per_second
+        self.MIN_REQUESTS_PER_SECOND = min_requests_per_second
+        self.MAX_REQUESTS_PER_SECOND = max_requests_per_second
+        self.TARGET_LATENCY = target_latency
+        self.TIMEOUT = timeout
+        self.PAGE_RETRIES = page_retries
+
+    def session(self):
+        """
+        HTTP sessions are bound to event loop created in every call => no session is shared between calls
+
+        Returns
+        -------
+        contextlib.nullcontext
+            Empty context (kept for compatibility with other scrapers)
+        """
+        return contextlib.nullcontext()
+
+    def _init_limiter(self) -> AdaptiveRateLimiter:
+        return AdaptiveRateLimiter(
+            rate = self.REQUESTS_PER_SECOND,
+            min_rate = self.MIN_REQUESTS_PER_SECOND,
+            max_rate = self.MAX_REQUESTS_PER_SECOND,
+            target_latency = self.TARGET_LATENCY
+        )
+
+    def _init_session(self, concurrency: int) -> aiohttp.ClientSession:
+        return aiohttp.ClientSession(
+            headers = HEADERS,
+            timeout = aiohttp.ClientTimeout(total=self.TIMEOUT),
+            connector = aiohttp.TCPConnector(limit=concurrency)
+        )
+
+    @staticmethod
+    def _get_retry_after(response: aiohttp.ClientResponse) -> float:
+        try:
+            return float(response.headers.get('Retry-After', 0))
+        except ValueError:
+            return 0
+
+    async def _load_url(self, session: aiohttp.ClientSession, limiter: AdaptiveRateLimiter, url: str,
+                        max_retries: int = 5) -> html.HtmlElement:
+        """
+        Load and parse url (rate limiter decides when request is sent, no fixed sleeps),
+        429, 5xx and connection errors are retried, other client errors fail immediately
+
+        Parameters
+        ----------
+        session: aiohttp.ClientSession
+            HTTP session
+        limiter: AdaptiveRateLimiter
+            Rate limiter shared by all requests
+        url: str
+            Url to load
+        max_retries: int
+            How many retries is possible
+
+        Returns
+        -------
+        html.HtmlElement
+            Parsed page
+        """
+        retries = 1
+        while True:
+            await limiter.acquire(url)
+            logger.info(f'Loading: {url}')
+
+            status, retry_after, error = None, None, None
+            start = time.monotonic()
+            try:
+                async with session.get(url) as response:
+                    status = response.status
+                    retry_after = CarvagoAsyncScraper._get_retry_after(response)
+                    content = await response.read()
+                    response_url = str(response.url)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+
+            limiter.observe(url, status, time.monotonic() - start, retry_after)
+
+            if status is not None and status < 400:
+                return CarvagoHttpScraper._parse_html(content, response_url)
+
+            # client error (e.g. removed ad) => retry would fail again, only 429 is worth waiting for
+            if status is not None and status < 500 and status != 429:
+                raise Exception(f'Loading of {url} failed (status: {status})')
+
+            if retries >= max_retries:
+                raise Exception(f'Loading of {url} failed (status: {status}, error: {error})')
+            retries += 1
+
+    async def _get_page_descriptions(self, session: aiohttp.ClientSession, limiter: AdaptiveRateLimiter,
+                                     semaphore: asyncio.Semaphore, page_url: str, page_num: int) -> tuple:
+        """
+        Load search page and get its cards description
+
+        Returns
+        -------
+        tuple
+            Page number and cards description (None if page failed)
+        """
+        async with semaphore:
+            try:
+                tree = await self._load_url(session, limiter, page_url)
+            except Exception as e:
+                logger.warning(f'Page {page_num} failed: {e}')
+                return page_num, None
+
+        return page_num, CarvagoHttpScraper._parse_cards_description(tree)
+
+    async def _get_advertised_cars(self, url: str, page_limit: int, done_pages: set, on_page_done, callback) -> None:
+        limiter = self._init_limiter()
+        semaphore = asyncio.Semaphore(self.CONCURRENCY)
+
+        async with self._init_session(self.CONCURRENCY) as session:
+            # load main page and get total number of pages
+            tree = await self._load_url(session, limiter, url)
+            max_page_num = CarvagoHttpScraper._parse_max_page_num(tree)
+            logger.info(f'Found {max_page_num} pages!')
+
+            # ads shift between pages while we paginate => same car can be found on two pages
+            seen_ids = set()
+
+            page_nums = [page_num for page_num in range(1, min(max_page_num, page_limit) + 1) 
+                         if page_num not in (done_pages or ())]
+            for attempt in range(self.PAGE_RETRIES + 1):
+                if attempt > 0:
+                    logger.info(f'Retrying {len(page_nums)} failed pages ({attempt}/{self.PAGE_RETRIES})...')
+
+                pages = [
+                    self._get_page_descriptions(
+                        session, limiter, semaphore, CarvagoScraper._add_page_num_to_url(url, page_num), page_num
+                    )
+                    for page_num in page_nums
+                ]
+
+                failed_page_nums = []
+                for page in asyncio.as_completed(pages):
+                    page_num, descriptions = await page
+                    if descriptions is None:
+                        failed_page_nums.append(page_num)
+                        continue
+
+                    if on_page_done is not None:
+                        on_page_done(page_num, descriptions)
+
+                    for description in descriptions:
+                        if description.get('id') in seen_ids:
+                            continue
+
+                        if 'id' in description:
+                            seen_ids.add(description['id'])
+
+                        callback(description)
+
+                page_nums = sorted(failed_page_nums)
+                if not page_nums:
+                    break
+
+            if page_nums:
+                logger.warning(f'Pages {page_nums} failed after {self.PAGE_RETRIES} retries!')
+
+    async def _get_car_details(self, session: aiohttp.ClientSession, limiter: AdaptiveRateLimiter, url: str,
+                               with_photos: bool = False) -> dict:
+        try:
+            tree = await self._load_url(session, limiter, url)
+            return CarvagoHttpScraper._parse_car_details(tree, url, with_photos)
+        except Exception as e:
+            logger.warning(e)
+            return None
+
+    async def _get_multiple_cars_details(self, urls, with_photos: bool, concurrency: int, callback) -> None:
+        loop = asyncio.get_running_loop()
+        limiter = self._init_limiter()
+        semaphore = asyncio.Semaphore(concurrency)
+        urls = iter(urls)
+
+        async def scrape(index, url):
+            try:
+                callback((index, await self._get_car_details(session, limiter, url, with_photos)))
+            finally:
+                semaphore.release()
+
+        async with self._init_session(concurrency) as session:
+            # finished tasks are dropped => memory does not grow with number of scraped urls
+            tasks = set()
+            index = 0
+            while True:
+                # next url is taken only when there is free slot => urls generator is not consumed in advance
+                await semaphore.acquire()
+                try:
+                    url = await loop.run_in_executor(None, next, urls, _DONE)
+                except Exception:
+                    # urls generator failed => already started urls are finished before it is raised
+                    semaphore.release()
+                    await asyncio.gather(*tasks)
+                    raise
+
+                if url is _DONE:
+                    semaphore.release()
+                    break
+
+                task = asyncio.ensure_future(scrape(index, url))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                index += 1
+
+            await asyncio.gather(*tasks)
+
+    @staticmethod
+    def _iter_in_background(coroutine_function, *args):
+        """
+        Run coroutine in event loop of background thread and yield everything it passes to its callback
+
+        Parameters
+        ----------
+        coroutine_function: callable
+            Coroutine function called with args and callback as the last argument
+        args: tuple
+            Arguments of coroutine function
+
+        Returns
+        -------
+        generator
+            Values passed to callback (exception of coroutine is raised after the last value)
+        """
+        results = queue.Queue()
+        errors = []
+
+        def run_loop():
+            try:
+                asyncio.run(coroutine_function(*args, results.put))
+            except Exception as e:
+                logger.exception('Exception occured!!')
+                errors.append(e)
+            finally:
+                results.put(_DONE)
+
+        threading.Thread(target=run_loop, daemon=True).start()
+
+        while True:
+            result = results.get()
+            if result is _DONE:
+                break
+            yield result
+
+        if errors:
+            raise errors[0]
+
+    def iter_advertised_cars(self, url: str, page_limit: int = 1000, session=None, done_pages: set = None,
+                             on_page_done=None):
+        """
+        Get advertised cars description (url, id, price) as soon as each search page is parsed,
+        search pages are loaded concurrently and failed pages are retried
+
+        Parameters
+        ----------
+        url: str
+            Search url (first page of search)
+
+        page_limit: int
+            Maximum number of pages to search on
+
+        session: None
+            Not used (kept for compatibility with other scrapers)
+
+        done_pages: set
+            Numbers of pages which are not loaded (e.g. done by interrupted run)
+
+        on_page_done: callable
+            Called with page number and all its cards description as soon as page is loaded
+
+        Returns
+        -------
+        generator
+            Cars cards description (each car only once, even if it moved between pages during search)
+        """
+        return CarvagoAsyncScraper._iter_in_background(
+            self._get_advertised_cars, url, page_limit, done_pages, on_page_done
+        )
+
+    def get_advertised_cars(self, url: str, page_limit: int = 1000, session=None) -> list:
+        """
+        Get advertised cars description (url, id, price), search pages are loaded concurrently
+
+        Parameters
+        ----------
+        url: str
+            Search url (first page of search)
+
+        page_limit: int
+            Maximum number of pages to search on
+
+        session: None
+            Not used (kept for compatibility with other scrapers)
+
+        Returns
+        -------
+        list
+            All available cars cards description
+        """
+        return list(self.iter_advertised_cars(url, page_limit))
+
+    def get_car_details(self, url: str, with_photos: bool = False, session=None) -> dict:
+        """
+        Get all available informations about advertised car
+
+        Parameters
+        ----------
+        url: str
+            Car url
+
+        with_photos: bool
+            Parse also photos urls
+
+        session: None
+            Not used (kept for compatibility with other scrapers)
+
+        Returns
+        -------
+        dict
+            Informations about advertised car
+        """
+        return next(self.iter_multiple_cars_details([url], with_photos, 1), None)
+
+    def iter_multiple_cars_details(self, urls, with_photos: bool = False, num_workers: int = None, session=None):
+        """
+        Get all available informations about multiple cars (event loop runs in background thread)
+
+        Parameters
+        ----------
+        urls: iterable
+            Urls to advertised cars (can be generator, scraping starts with its first url)
+
+        with_photos: bool
+            Parse also photos urls
+
+        num_workers: int
+            Maximal number of requests in flight (None => concurrency of scraper)
+
+        session: None
+            Not used (kept for compatibility with other scrapers)
+
+        Returns
+        -------
+        generator
+            Informations about cars (None if scraping failed) in the same order as urls
+            (exception of urls generator is raised after already started urls are scraped)
+        """
+        results = CarvagoAsyncScraper._iter_in_background(
+            self._get_multiple_cars_details, urls, with_photos, num_workers or self.CONCURRENCY
+        )
+
+        # results come in order of completion => reorder them to order of urls
+        buffer = {}
+        index = 0
+        error = None
+        try:
+            for result_index, car_details in results:
+                buffer[result_index] = car_details
+                while index in buffer:
+                    yield buffer.pop(index)
+                    index += 1
+        except Exception as e:
+            error = e
+
+        # event loop failed => return what was scraped
+        if buffer:
+            for index in range(index, max(buffer) + 1):
+                yield buffer.pop(index, None)
+
+        if error is not None:
+            raise error
+
+    def get_multiple_cars_details(self, urls: list, with_photos: bool = False, num_workers: int = None) -> list:
+        """
+        Get all available informations about multiple cars at once
+
+        Parameters
+        ----------
+        urls: list
+            Urls to advertised cars
+
+        with_photos: bool
+            Parse also photos urls
+
+        num_workers: int
+            Maximal number of requests in flight (None => concurrency of scraper)
+
+        Returns
+        -------
+        list
+            Informations about all cars from list
+        """
+        return [
+            car_details
+            for car_details in self.iter_multiple_cars_details(urls, with_photos, num_workers)
+            if car_details
+        ]
@@ -0,0 +1,464 @@
+import time
+import logging
+import requests
+
+from lxml import html
+from requests.adapters import HTTPAdapter
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from libs.rate_limit import Throttle
+from libs.scrapers.base import BaseScraper
+from libs.scrapers.carvago import CarvagoScraper
+
+logger = logging.getLogger(__name__)
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/107.0.0.0 Safari/537.36',
+    'Accept-Language': 'en,en_US',
+}
+
+
+class CarvagoHttpScraper(BaseScraper):
+    def __init__(self, sleep_time: float = 1, min_request_interval: float = 0, pool_size: int = 10, timeout: float = 30,
+                 search_workers: int = 1, page_retries: int = 2):
+        """
+        Scraper reading carvago pages with plain HTTP requests (no browser)
+
+        Parameters
+        ----------
+        sleep_time: float
+            Initial sleep time in seconds between retries of failed request
+        min_request_interval: float
+            Minimal time in seconds between two requests across all threads of this scraper
+        pool_size: int
+            Number of keep-alive connections kept in session pool
+        timeout: float
+            Request timeout in seconds
+        search_workers: int
+            Number of search pages loaded in parallel
+        page_retries: int
+            How many times are failed search pages loaded again (after all other pages are done)
+        """
+        self.SLEEP_TIME = sleep_time
+        self.THROTTLE = Throttle(min_request_interval)
+        self.POOL_SIZE = pool_size
+        self.TIMEOUT = timeout
+        self.SEARCH_WORKERS = max(1, search_workers)
+        self.PAGE_RETRIES = page_retries
+
+    def session(self) -> requests.Session:
+        """
+        Create HTTP session with pool of keep-alive connections
+
+        Returns
+        -------
+        requests.Session
+            Session which can be shared by get_advertised_cars and get_car_details
+        """
+        session = requests.Session()
+        session.headers.update(HEADERS)
+
+        adapter = HTTPAdapter(pool_connections=self.POOL_SIZE, pool_maxsize=self.POOL_SIZE)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+        return session
+
+    @staticmethod
+    def _find_by_class(tree: html.HtmlElement, class_name: str) -> list:
+        """
+        Find all elements having class_name in class attribute
+
+        Parameters
+        ----------
+        tree: html.HtmlElement
+            Parsed page (or its part)
+        class_name: str
+            Class name to search for
+
+        Returns
+        -------
+        list
+            Found elements
+        """
+        return tree.xpath(f'.//*[contains(concat(" ", normalize-space(@class), " "), " {class_name} ")]')
+
+    @staticmethod
+    def _get_text(elem: html.HtmlElement) -> str:
+        """
+        Get text of element with collapsed whitespaces (same as webdriver element text)
+        """
+        return ' '.join(elem.text_content().split())
+
+    @staticmethod
+    def _parse_html(content: bytes, base_url: str) -> html.HtmlElement:
+        """
+        Parse loaded page
+
+        Parameters
+        ----------
+        content: bytes
+            Body of response
+        base_url: str
+            Url of loaded page
+
+        Returns
+        -------
+        html.HtmlElement
+            Parsed page with absolute urls (same as webdriver returns in href and src attributes)
+        """
+        tree = html.fromstring(content, base_url=base_url)
+        tree.make_links_absolute()
+
+        return tree
+
+    @staticmethod
+    def _parse_cards_description(tree: html.HtmlElement) -> list:
+        """
+        Get cards description (url, id, price)
+
+        Parameters
+        ----------
+        tree: html.HtmlElement
+            Parsed search page
+
+        Returns
+        -------
+        list
+            Description to all cars found on page
+        """
+        descriptions = []
+        for card in CarvagoHttpScraper._find_by_class(tree, 'gtm-element-visibility-impressions-list'):
+            description = {}
+
+            try:
+                description['id'] = card.get('data-car-id').strip()
+                description['url'] = card.get('href').strip()
+                description['price'] = CarvagoScraper._parse_price(
+                    CarvagoHttpScraper._get_text(CarvagoHttpScraper._find_by_class(card, 'e14v3bw44')[0])
+                )
+
+            except Exception as e:
+                logger.warning(e)
+
+            descriptions.append(description)
+
+        return descriptions
+
+    @staticmethod
+    def _parse_max_page_num(tree: html.HtmlElement) -> int:
+        """
+        Get total number of pages
+
+        Parameters
+        ----------
+        tree: html.HtmlElement
+            Parsed search page
+
+        Returns
+        -------
+        int
+            Count pages
+        """
+        return int(CarvagoHttpScraper._get_text(CarvagoHttpScraper._find_by_class(tree, 'Pagination-item')[-1]))
+
+    @staticmethod
+    def _parse_photos_urls(tree: html.HtmlElement) -> list:
+        """
+        Get urls to all photos from car page
+
+        Parameters
+        ----------
+        tree: html.HtmlElement
+            Parsed car page
+
+        Returns
+        -------
+        list
+            All available links to car photos
+        """
+        photos_urls = [
+            img.get('src')
+            for elem in CarvagoHttpScraper._find_by_class(tree, 'e1sb5aaj0')
+            for img in elem.iter('img')
+        ]
+
+        # thumbnails are rendered only after click => fallback to images of gallery slides
+        if not photos_urls:
+            photos_urls = [
+                img.get('src')
+                for elem in CarvagoHttpScraper._find_by_class(tree, 'image-gallery-image')
+                for img in elem.iter('img')
+            ]
+
+        return [url for url in photos_urls if url]
+
+    @staticmethod
+    def _parse_car_details(tree: html.HtmlElement, url: str, with_photos: bool = False) -> dict:
+        """
+        Get all available informations about advertised car from parsed page
+
+        Parameters
+        ----------
+        tree: html.HtmlElement
+            Parsed car page
+        url: str
+            Car url
+        with_photos: bool
+            Parse also photos urls
+
+        Returns
+        -------
+        dict
+            Informations about advertised car
+        """
+        get_text = CarvagoHttpScraper._get_text
+        find_by_class = CarvagoHttpScraper._find_by_class
+
+        car_details = {}
+        car_details['photos'] = []
+        car_details['url'] = url
+        car_details['price'] = CarvagoScraper._parse_price(get_text(find_by_class(tree, 'e1hgzarh2')[0]))
+
+        # load brand, mileage, color,...
+        for name_elem, value_elem in zip(find_by_class(tree, 'e18uvu5d2'), find_by_class(tree, 'e18uvu5d4')):
+            name = '_'.join(get_text(name_elem).lower().split(' '))
+            car_details[name] = get_text(value_elem)
+
+        # load additional features
+        car_details['features'] = [get_text(elem) for elem in find_by_class(tree, 'eoxqr1g1')]
+
+        # load photos
+        if with_photos:
+            car_details['photos'] = CarvagoHttpScraper._parse_photos_urls(tree)
+
+        return car_details
+
+    def _load_url(self, session: requests.Session, url: str, max_retries: int = 1) -> html.HtmlElement:
+        """
+        Load and parse url
+
+        Parameters
+        ----------
+        session: requests.Session
+            HTTP session
+        url: str
+            Url to load
+        max_retries: int
+            How many retries is possible
+
+        Returns
+        -------
+        html.HtmlElement
+            Parsed page
+        """
+        logger.info(f'Loading: {url}')
+
+        sleep_time = self.SLEEP_TIME
+        retries = 1
+        while True:
+            try:
+                self.THROTTLE.wait()
+                response = session.get(url, timeout=self.TIMEOUT)
+                response.raise_for_status()
+                break
+            except Exception:
+                if retries >= max_retries:
+                    raise
+
+                time.sleep(sleep_time)
+                sleep_time *= 2
+                retries += 1
+
+        return CarvagoHttpScraper._parse_html(response.content, response.url)
+
+    def _get_page_descriptions(self, session: requests.Session, page_url: str) -> list:
+        """
+        Load search page and get its cards description (raises if page failed)
+        """
+        tree = self._load_url(session, page_url, 5)
+
+        return CarvagoHttpScraper._parse_cards_description(tree)
+
+    def iter_advertised_cars(self, url: str, page_limit: int = 1000, session: requests.Session = None,
+                             done_pages: set = None, on_page_done=None):
+        """
+        Get advertised cars description (url, id, price) as soon as each search page is parsed,
+        search pages are loaded by search_workers threads in parallel and failed pages are retried
+
+        Parameters
+        ----------
+        url: str
+            Search url (first page of search)
+
+        page_limit: int
+            Maximum number of pages to search on
+
+        session: requests.Session
+            HTTP session to use (if None => new session is created and closed at the end)
+
+        done_pages: set
+            Numbers of pages which are not loaded (e.g. done by interrupted run)
+
+        on_page_done: callable
+            Called with page number and all its cards description as soon as page is loaded
+
+        Returns
+        -------
+        generator
+            Cars cards description (each car only once, even if it moved between pages during search)
+        """
+        called_without_session = session is None
+        if called_without_session:
+            session = self.session()
+
+        try:
+            # load main page and get total number of pages
+            tree = self._load_url(session, url, 5)
+            max_page_num = CarvagoHttpScraper._parse_max_page_num(tree)
+            logger.info(f'Found {max_page_num} pages!')
+
+            page_nums = [page_num for page_num in range(1, min(max_page_num, page_limit) + 1) 
+                         if page_num not in (done_pages or ())]
+            yield from CarvagoScraper._iter_unique_descriptions(
+                lambda page_num: self._get_page_descriptions(session, CarvagoScraper._add_page_num_to_url(url, page_num)),
+                page_nums, max_page_num, self.SEARCH_WORKERS, self.PAGE_RETRIES,
+                on_page_done = on_page_done
+            )
+        finally:
+            if called_without_session:
+                session.close()
+
+    def get_advertised_cars(self, url: str, page_limit: int = 1000, session: requests.Session = None) -> list:
+        """
+        Get advertised cars description (url, id, price)
+
+        Parameters
+        ----------
+        url: str
+            Search url (first page of search)
+
+        page_limit: int
+            Maximum number of pages to search on
+
+        session: requests.Session
+            HTTP session to use (if None => new session is created and closed at the end)
+
+        Returns
+        -------
+        list
+            All available cars cards description
+        """
+        return list(self.iter_advertised_cars(url, page_limit, session))
+
+    def get_car_details(self, url: str, with_photos: bool = False, session: requests.Session = None) -> dict:
+        """
+        Get all available informations about advertised car
+
+        Parameters
+        ----------
+        url: str
+            Car url
+
+        with_photos: bool
+            Parse also photos urls
+
+        session: requests.Session
+            HTTP session to use (if None => new session is created and closed at the end)
+
+        Returns
+        -------
+        dict
+            Informations about advertised car
+        """
+        called_without_session = session is None
+        if called_without_session:
+            session = self.session()
+
+        try:
+            tree = self._load_url(session, url, 5)
+            return CarvagoHttpScraper._parse_car_details(tree, url, with_photos)
+
+        except Exception as e:
+            logger.warning(e)
+            return None
+
+        finally:
+            if called_without_session:
+                session.close()
+
+    def iter_multiple_cars_details(self, urls, with_photos: bool = False, num_workers: int = 1,
+                                   session: requests.Session = None, queue_size: int = 0):
+        """
+        Get all available informations about multiple cars using pool of threads
+
+        Parameters
+        ----------
+        urls: iterable
+            Urls to advertised cars (can be generator, scraping starts with its first url)
+
+        with_photos: bool
+            Parse also photos urls
+
+        num_workers: int
+            Number of requests running in parallel
+
+        session: requests.Session
+            HTTP session shared by all threads (if None => new session is created and closed at the end)
+
+        queue_size: int
+            Maximal number of submitted urls (0 => twice the number of workers)
+
+        Returns
+        -------
+        generator
+            Informations about cars (None if scraping failed) in the same order as urls
+        """
+        called_without_session = session is None
+        if called_without_session:
+            session = self.session()
+
+        num_workers = max(1, num_workers)
+        queue_size = queue_size or 2 * num_workers
+
+        try:
+            with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                # bounded number of submitted urls => generator of urls is consumed only as fast as pages are scraped
+                futures = deque()
+                for url in urls:
+                    futures.append(executor.submit(self.get_car_details, url, with_photos, session))
+                    if len(futures) >= queue_size:
+                        yield futures.popleft().result()
+
+                while futures:
+                    yield futures.popleft().result()
+        finally:
+            if called_without_session:
+                session.close()
+
+    def get_multiple_cars_details(self, urls: list, with_photos: bool = False, num_workers: int = 1) -> list:
+        """
+        Get all available informations about multiple cars at once
+
+        Parameters
+        ----------
+        urls: list
+            Urls to advertised cars
+
+        with_photos: bool
+            Parse also photos urls
+
+        num_workers: int
+            Number of requests running in parallel
+
+        Returns
+        -------
+        list
+            Informations about all cars from list
+        """
+        return [
+            car_details
+            for car_details in self.iter_multiple_cars_details(urls, with_photos, num_workers)
+            if car_details
+        ]
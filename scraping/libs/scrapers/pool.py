@@ -0,0 +1,156 @@
+import queue
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserWorkerPool:
+    def __init__(self, scraper, num_workers: int = 1, with_photos: bool = False, queue_size: int = 0):
+        """
+        Pool of browser workers sharing one bounded queue of car urls
+
+        Parameters
+        ----------
+        scraper: CarvagoScraper
+            Scraper used by all workers (its throttle is shared by them)
+        num_workers: int
+            Number of browsers running in parallel
+        with_photos: bool
+            Scrape also photos urls
+        queue_size: int
+            Maximal number of urls waiting for worker (0 => twice the number of workers)
+        """
+        self.scraper = scraper
+        self.NUM_WORKERS = max(1, num_workers)
+        self.WITH_PHOTOS = with_photos
+        self.QUEUE_SIZE = queue_size or 2 * self.NUM_WORKERS
+
+    @staticmethod
+    def _put(tasks: queue.Queue, task, stop: threading.Event) -> bool:
+        # bounded queue => block until worker is free, but stop when results are not consumed anymore
+        while not stop.is_set():
+            try:
+                tasks.put(task, timeout=1)
+                return True
+            except queue.Full:
+                pass
+
+        return False
+
+    def _feeder(self, urls, tasks: queue.Queue, state: dict, cond: threading.Condition, stop: threading.Event) -> None:
+        try:
+            for task in enumerate(urls):
+                if not BrowserWorkerPool._put(tasks, task, stop):
+                    break
+
+                with cond:
+                    state['fed'] += 1
+                    cond.notify_all()
+        except Exception as e:
+            # urls generator failed (e.g. search) => it is raised by imap after fed urls are scraped
+            logger.exception('Exception occured!!')
+            with cond:
+                state['error'] = e
+        finally:
+            with cond:
+                state['feeding'] = False
+                cond.notify_all()
+
+            for _ in range(self.NUM_WORKERS):
+                BrowserWorkerPool._put(tasks, None, stop)
+
+    def _worker(self, tasks: queue.Queue, results: dict, state: dict, cond: threading.Condition, stop: threading.Event,
+                session=None) -> None:
+        own_session = session is None
+        if own_session:
+            session = self.scraper.session()
+
+        try:
+            while not stop.is_set():
+                try:
+                    task = tasks.get(timeout=1)
+                except queue.Empty:
+                    continue
+
+                if task is None:
+                    break
+
+                index, url = task
+                car_details = self.scraper.get_car_details(url, with_photos=self.WITH_PHOTOS, session=session)
+
+                with cond:
+                    results[index] = car_details
+                    cond.notify_all()
+        except Exception as e:
+            logger.warning(e)
+        finally:
+            if own_session:
+                session.quit()
+
+            with cond:
+                state['alive'] -= 1
+                cond.notify_all()
+
+    def imap(self, urls, session=None):
+        """
+        Scrape car details of all urls in parallel, workers start as soon as first url is available
+
+        Parameters
+        ----------
+        urls: iterable
+            Urls to advertised cars (can be generator producing urls while the pool is scraping)
+        session: BrowserSession
+            Existing browser session reused by the first worker (it is not closed by the pool)
+
+        Returns
+        -------
+        generator
+            Car details (or None if scraping failed) in the same order as urls,
+            exception of urls generator is raised after all fed urls are scraped
+        """
+        tasks = queue.Queue(maxsize=self.QUEUE_SIZE)
+        results = {}
+        state = {'alive': self.NUM_WORKERS, 'fed': 0, 'feeding': True, 'error': None}
+        cond = threading.Condition()
+        stop = threading.Event()
+
+        threads = [threading.Thread(target=self._feeder, args=(urls, tasks, state, cond, stop), daemon=True)]
+        threads += [
+            threading.Thread(
+                target=self._worker,
+                args=(tasks, results, state, cond, stop, session if i == 0 else None),
+                daemon=True
+            )
+            for i in range(self.NUM_WORKERS)
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            index = 0
+            while True:
+                with cond:
+                    while (
+                        index not in results
+                        and state['alive'] > 0
+                        and (state['feeding'] or index < state['fed'])
+                    ):
+                        cond.wait()
+
+                    # all urls processed or all workers died
+                    if index not in results and (index >= state['fed'] or state['alive'] == 0):
+                        if index < state['fed'] or state['feeding']:
+                            logger.warning('All workers stopped before scraping all urls!')
+                        break
+
+                    car_details = results.pop(index)
+
+                index += 1
+                logger.info(f'Scraped {index} cars')
+                yield car_details
+
+            if state['error'] is not None:
+                raise state['error']
+        finally:
+            stop.set()
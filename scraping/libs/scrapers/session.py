@@ -0,0 +1,122 @@
+import logging
+import psutil
+
+from selenium import webdriver
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserSession:
+    def __init__(self, init_browser, max_pages: int = 0, max_rss_mb: float = 0):
+        """
+        Browser shared by multiple scraping calls which is recycled when it grows too old or too big
+
+        Parameters
+        ----------
+        init_browser: callable
+            Function returning new instance of webdriver
+        max_pages: int
+            Restart browser after this number of loaded pages (0 => never)
+        max_rss_mb: float
+            Restart browser when memory of chromedriver and all its children exceeds this limit in MB (0 => never)
+        """
+        self._init_browser = init_browser
+        self.MAX_PAGES = max_pages
+        self.MAX_RSS_MB = max_rss_mb
+
+        self.browser = None
+        self.pages_loaded = 0
+        self.restarts = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.quit()
+
+    def _get_rss_mb(self) -> float:
+        """
+        Get resident memory of chromedriver and all processes started by it
+
+        Returns
+        -------
+        float
+            Resident memory in MB
+        """
+        try:
+            process = psutil.Process(self.browser.service.process.pid)
+            processes = [process] + process.children(recursive=True)
+        except Exception as e:
+            logger.warning(e)
+            return 0
+
+        rss = 0
+        for p in processes:
+            try:
+                rss += p.memory_info().rss
+            except psutil.Error:
+                pass
+
+        return rss / 1024 / 1024
+
+    def _needs_restart(self) -> bool:
+        if self.MAX_PAGES and self.pages_loaded >= self.MAX_PAGES:
+            logger.info(f'Browser loaded {self.pages_loaded} pages => restarting...')
+            return True
+
+        if self.MAX_RSS_MB:
+            rss_mb = self._get_rss_mb()
+            if rss_mb > self.MAX_RSS_MB:
+                logger.info(f'Browser uses {rss_mb:.0f}MB of memory => restarting...')
+                return True
+
+        return False
+
+    def get_browser(self) -> webdriver:
+        """
+        Get browser for loading next page (browser is started or recycled if needed)
+
+        Returns
+        -------
+        webdriver
+            Instance of webdriver
+        """
+        if self.browser is not None and self._needs_restart():
+            self.quit()
+            self.restarts += 1
+
+        if self.browser is None:
+            self.browser = self._init_browser()
+            self.pages_loaded = 0
+
+        self.pages_loaded += 1
+
+        return self.browser
+
+    def invalidate_if_dead(self) -> None:
+        """
+        Check that browser still responds, otherwise it will be started again on next get_browser call
+        """
+        if self.browser is None:
+            return
+
+        try:
+            self.browser.current_url
+        except Exception as e:
+            logger.warning(f'Browser is not responding => restarting... ({e})')
+            self.quit()
+            self.restarts += 1
+
+    def quit(self) -> None:
+        """
+        Quit browser
+        """
+        if self.browser is None:
+            return
+
+        try:
+            self.browser.quit()
+        except Exception as e:
+            logger.warning(e)
+
+        self.browser = None
@@ -1,13 +1,21 @@
 # CRON
 # 09 17 * * * cd /home/ubuntu/carvago && /home/ubuntu/anaconda3/bin/python run_carvago_scraper.py 
+# 09 9,13,21 * * * cd /home/ubuntu/carvago && /home/ubuntu/anaconda3/bin/python run_carvago_scraper.py --mode price-sweep
 
 import os
 import json
+import argparse
 import pandas as pd
 
+from collections import deque
 from dotenv import load_dotenv
 from libs.scrapers.carvago import CarvagoScraper
+from libs.scrapers.carvago_http import CarvagoHttpScraper
+from libs.scrapers.carvago_async import CarvagoAsyncScraper
 from libs.help_functions import get_current_time_string
+from libs.scrape_state import ScrapeStateIndex
+from libs.checkpoint import ScrapeCheckpoint
+from libs.batch_uploader import BatchUploader
 from libs.s3 import S3
 
 from libs.logger import Logger
@@ -23,37 +31,244 @@ S3_CREDENTIALS = {
     'aws_secret_access_key': os.getenv('AWS_SECRET_ACCESS_KEY')
 }
 
+# selenium (headless chrome), http (plain requests without browser) or async (asyncio with adaptive rate limit)
+SCRAPER_BACKEND = os.getenv('SCRAPER_BACKEND', 'selenium')
+NUM_WORKERS = int(os.getenv('SCRAPER_NUM_WORKERS', 1))
+SEARCH_WORKERS = int(os.getenv('SCRAPER_SEARCH_WORKERS', 1))
+MIN_REQUEST_INTERVAL = float(os.getenv('SCRAPER_MIN_REQUEST_INTERVAL', 0))
+REQUESTS_PER_SECOND = float(os.getenv('SCRAPER_REQUESTS_PER_SECOND', 2))
+# script (one injected script per page) or elements (one webdriver call per element)
+EXTRACTION_MODE = os.getenv('SCRAPER_EXTRACTION_MODE', 'script')
+# none, trackers or full (images, fonts, media and trackers are not loaded)
+RESOURCE_BLOCKING = os.getenv('SCRAPER_RESOURCE_BLOCKING', 'full')
+# incremental mode => details are scraped only for new cars, changed prices or too old details
+INCREMENTAL = os.getenv('SCRAPER_INCREMENTAL', '0') == '1'
+STATE_INDEX_PATH = os.getenv('SCRAPER_STATE_INDEX_PATH', './carvago_state.sqlite')
+DETAILS_MAX_AGE_DAYS = float(os.getenv('SCRAPER_DETAILS_MAX_AGE_DAYS', 7))
+CHECKPOINT_PATH = os.getenv('SCRAPER_CHECKPOINT_PATH', './checkpoint')
+BROWSER_MAX_PAGES = int(os.getenv('SCRAPER_BROWSER_MAX_PAGES', 200))
+BROWSER_MAX_RSS_MB = float(os.getenv('SCRAPER_BROWSER_MAX_RSS_MB', 1500))
+# cars are uploaded in compressed NDJSON batches (batch is closed by number of records, size or age)
+UPLOAD_BATCH_RECORDS = int(os.getenv('SCRAPER_UPLOAD_BATCH_RECORDS', 100))
+UPLOAD_BATCH_MB = float(os.getenv('SCRAPER_UPLOAD_BATCH_MB', 5))
+UPLOAD_BATCH_SECONDS = float(os.getenv('SCRAPER_UPLOAD_BATCH_SECONDS', 60))
+# gzip or zstd (Lambda layer decodes zstd only with zstandard package)
+UPLOAD_COMPRESSION = os.getenv('SCRAPER_UPLOAD_COMPRESSION', 'gzip')
+# 1 => files are stored in date partitions (dt=YYYY-MM-DD/file_name)
+DATE_PARTITIONED_KEYS = os.getenv('SCRAPER_DATE_PARTITIONED_KEYS', '0') == '1'
+
 LINK = 'https://carvago.com/sk/auta?car-style[]=3&cruise-control[]=2&cruise-control-any=true&fuel-type[]=2&interior-material[]=1&price-to=40000&registration-date-from=2017&transmission[]=2&model-family-group[]=1785'
 
 logger.info('Process started!')
 
-def run():
-    try:
-        scraper = CarvagoScraper(headless=True, sleep_time=2, path_to_chromedriver=PATH_TO_CHROMEDRIVER)
-        descriptions = scraper.get_advertised_cars(LINK)
-        num_cars = len(descriptions)
+def get_scraper():
+    if SCRAPER_BACKEND == 'http':
+        return CarvagoHttpScraper(sleep_time=2, min_request_interval=MIN_REQUEST_INTERVAL, 
+                                  pool_size=max(NUM_WORKERS, SEARCH_WORKERS), search_workers=SEARCH_WORKERS)
+    
+    if SCRAPER_BACKEND == 'async':
+        return CarvagoAsyncScraper(concurrency=NUM_WORKERS, requests_per_second=REQUESTS_PER_SECOND)
+    
+    if SCRAPER_BACKEND == 'selenium':
+        return CarvagoScraper(headless=True, sleep_time=2, path_to_chromedriver=PATH_TO_CHROMEDRIVER,
+                              min_request_interval=MIN_REQUEST_INTERVAL,
+                              browser_max_pages=BROWSER_MAX_PAGES, browser_max_rss_mb=BROWSER_MAX_RSS_MB,
+                              extraction_mode=EXTRACTION_MODE, resource_blocking=RESOURCE_BLOCKING,
+                              search_workers=SEARCH_WORKERS)
+    
+    raise ValueError(f'Unknown scraper backend: {SCRAPER_BACKEND}')
 
-        for i,description in enumerate(descriptions):
-            logger.info(f'Scraping car details: {i+1}/{num_cars}')
+def get_batch_uploader(prefix, on_uploaded):
+    return BatchUploader(
+        bucket_name = BUCKET_NAME,
+        prefix = prefix,
+        credentials = S3_CREDENTIALS,
+        max_records = UPLOAD_BATCH_RECORDS,
+        max_bytes = int(UPLOAD_BATCH_MB * 1024 * 1024),
+        max_seconds = UPLOAD_BATCH_SECONDS,
+        compression = UPLOAD_COMPRESSION,
+        date_partitioned = DATE_PARTITIONED_KEYS,
+        on_uploaded = on_uploaded
+    )
 
-            car_id = description['id']
-            car_url = description['url']
-            current_time = get_current_time_string()
+def store_price_sweep(price_sweep):
+    current_time = price_sweep['datetime']
+    file_name = f'price_sweep_{current_time}.json'
+    
+    if DATE_PARTITIONED_KEYS:
+        file_name = S3.get_partitioned_key(file_name, current_time)
+    
+    S3.store_file_in_bucket(
+        bucket_name = BUCKET_NAME, 
+        file_name = file_name, 
+        file = json.dumps(price_sweep), 
+        credentials = S3_CREDENTIALS
+    )
 
-            car_details = scraper.get_car_details(car_url)
+def run_price_sweep():
+    try:
+        scraper = get_scraper()
+        current_time = get_current_time_string()
+        
+        # only search pages are loaded => price of every visible car is taken from its card
+        prices = {}
+        for description in scraper.iter_advertised_cars(LINK):
+            if 'id' not in description or 'price' not in description:
+                continue
+            
+            prices[description['id']] = description['price']
+        
+        logger.info(f'Found prices of {len(prices)} cars')
+        
+        price_sweep = {
+            'datetime': current_time,
+            'prices': [{'id': car_id, 'price': price} for car_id, price in prices.items()]
+        }
+        store_price_sweep(price_sweep)
+    except Exception as e:
+        logger.exception('Exception occured!!')
 
-            if car_details:
-                car_details['id'] = car_id
-                car_details['datetime'] = current_time
+def iter_descriptions(scraper, checkpoint, session):
+    # cards of pages done by interrupted run are returned first (their pages are not loaded again)
+    yielded_ids = set()
+    for description in list(checkpoint.discovered):
+        yielded_ids.add(description['id'])
+        yield description
+    
+    if checkpoint.search_finished:
+        return
+    
+    # all cards of page are stored as soon as page is loaded (before they are scraped)
+    def on_page_done(page_num, descriptions):
+        checkpoint.mark_page_done(page_num, [description for description in descriptions if 'url' in description])
+    
+    descriptions = scraper.iter_advertised_cars(
+        LINK, session=session, done_pages=set(checkpoint.done_pages), on_page_done=on_page_done
+    )
+    for description in descriptions:
+        if 'url' not in description or description['id'] in yielded_ids:
+            continue
+        
+        yielded_ids.add(description['id'])
+        yield description
+    
+    checkpoint.mark_search_finished()
 
-                S3.store_file_in_bucket(
-                    bucket_name = BUCKET_NAME, 
-                    file_name = f'car_details_{car_id}_{current_time}.json', 
-                    file = json.dumps(car_details), 
-                    credentials = S3_CREDENTIALS
-                )
+def run(resume=False):
+    state_index = None
+    uploaders = []
+    try:
+        scraper = get_scraper()
+        
+        checkpoint = ScrapeCheckpoint(CHECKPOINT_PATH)
+        if resume and checkpoint.exists():
+            logger.info(f'Resuming run: {len(checkpoint.discovered)} cars discovered, {len(checkpoint.uploaded)} uploaded')
+        else:
+            checkpoint.reset()
+        
+        if INCREMENTAL:
+            state_index = ScrapeStateIndex(STATE_INDEX_PATH, DETAILS_MAX_AGE_DAYS)
+        
+        # price from search card of every scraped car => state index compares cards with cards 
+        # (price on details page can be formatted or rounded differently)
+        card_prices = {description['id']: description.get('price') for description in checkpoint.discovered}
+        
+        # cars are marked as uploaded only after their batch is stored in S3
+        def on_details_uploaded(cars_details):
+            for car_details in cars_details:
+                checkpoint.mark_uploaded(car_details['id'])
+                
+                if state_index is not None:
+                    state_index.mark_details_fetched(
+                        car_details['id'], card_prices.pop(car_details['id'], None), car_details['datetime']
+                    )
+        
+        def on_snapshots_uploaded(price_snapshots):
+            for price_snapshot in price_snapshots:
+                checkpoint.mark_uploaded(price_snapshot['id'])
+        
+        details_uploader = get_batch_uploader('car_details_batch_', on_details_uploaded)
+        snapshots_uploader = get_batch_uploader('price_snapshot_batch_', on_snapshots_uploaded)
+        uploaders = [details_uploader, snapshots_uploader]
+        
+        # details scraped by interrupted run are uploaded without scraping them again
+        for car_details in checkpoint.get_details_to_upload():
+            details_uploader.add(car_details)
+        
+        # one session is used by the whole search (it runs at the same time as details workers 
+        # => they can not share it, every details worker has its own recycled session)
+        with scraper.session() as session:
+            # descriptions waiting for their details (details are yielded in the same order as urls)
+            pending = deque()
+        
+            def iter_urls():
+                for description in iter_descriptions(scraper, checkpoint, session):
+                    if checkpoint.is_done(description['id']):
+                        continue
+                
+                    current_time = get_current_time_string()
+                
+                    # unchanged card (it always has price) => store only price snapshot
+                    price = description.get('price')
+                    if state_index is not None and price is not None and not state_index.needs_details(description, current_time):
+                        snapshots_uploader.add({
+                            'id': description['id'],
+                            'datetime': current_time,
+                            'price': price
+                        })
+                        state_index.mark_seen(description['id'], price, current_time)
+                        continue
+                
+                    card_prices[description['id']] = description.get('price')
+                    pending.append(description)
+                    yield description['url']
+        
+            # search pages are parsed while details are scraped => scraping starts with the first card
+            logger.info(f'Scraping cars details with {NUM_WORKERS} workers...')
+            cars_details = scraper.iter_multiple_cars_details(
+                urls = iter_urls(),
+                num_workers = NUM_WORKERS
+            )
+
+            # results are yielded in the same order as descriptions => uploads stay deterministic
+            for car_details in cars_details:
+                description = pending.popleft()
+                car_id = description['id']
+                current_time = get_current_time_string()
+
+                if car_details:
+                    car_details['id'] = car_id
+                    car_details['datetime'] = current_time
+                
+                    # details are kept locally until their batch is uploaded
+                    checkpoint.store_details(car_id, car_details)
+                    details_uploader.add(car_details)
+        
+        # wait for remaining batches
+        for uploader in uploaders:
+            uploader.close()
+        
+        # run finished and everything was uploaded => next run starts from the first page
+        if checkpoint.search_finished and not checkpoint.scraped - checkpoint.uploaded:
+            checkpoint.reset()
     except Exception as e:
         logger.exception('Exception occured!!')
+    finally:
+        # already scraped cars are uploaded even if run failed
+        for uploader in uploaders:
+            uploader.close()
+        
+        if state_index is not None:
+            state_index.close()
         
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mode', choices=['full', 'price-sweep'], default='full',
+                        help='full (cars details) or price-sweep (only prices from search pages)')
+    parser.add_argument('--resume', action='store_true', help='continue interrupted run from its checkpoint')
+    args = parser.parse_args()
+    
+    if args.mode == 'price-sweep':
+        run_price_sweep()
+    else:
+        run(resume=args.resume)
\ No newline at end of file
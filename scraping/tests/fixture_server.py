@@ -0,0 +1,119 @@
+import os
+import time
+import threading
+
+from collections import Counter
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# generated assets (images, fonts, media, scripts) => no binary files are stored in fixtures
+ASSET_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.woff2': 'font/woff2',
+    '.mp4': 'video/mp4',
+    '.js': 'application/javascript',
+}
+
+
+class FixtureRequestHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str = 'text/html; charset=utf-8') -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        server.count_request(self.path)
+
+        if server.LATENCY:
+            time.sleep(server.LATENCY)
+
+        if server.should_fail(self.path):
+            return self._send(503, b'Service Unavailable')
+
+        url = urlparse(self.path)
+        file_name = None
+
+        # search pages => search_page_{page}.html, car pages => car_page.html
+        if url.path == '/search':
+            page = parse_qs(url.query).get('page', ['1'])[0]
+            file_name = f'search_page_{page}.html'
+
+        elif url.path.startswith('/car/'):
+            file_name = 'car_page.html'
+
+        elif url.path.startswith('/assets/'):
+            content_type = ASSET_TYPES.get(os.path.splitext(url.path)[1], 'application/octet-stream')
+            return self._send(200, b'\0' * server.ASSET_SIZE, content_type)
+
+        path = os.path.join(FIXTURES_DIR, file_name) if file_name else None
+        if path is None or not os.path.exists(path):
+            return self._send(404, b'Not Found')
+
+        with open(path, 'rb') as f:
+            self._send(200, f.read())
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, failures: dict = None, asset_size: int = 100 * 1024, latency: float = 0):
+        """
+        Local HTTP server with saved carvago pages (search pages, car page and generated assets)
+
+        Parameters
+        ----------
+        failures: dict
+            Request path (with query) => number of first requests answered with 503
+        asset_size: int
+            Size in bytes of every generated image, font, media or script
+        latency: float
+            Time in seconds added to every response
+        """
+        super().__init__(('127.0.0.1', 0), FixtureRequestHandler)
+
+        self.FAILURES = Counter(failures or {})
+        self.ASSET_SIZE = asset_size
+        self.LATENCY = latency
+        self.requests = Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def count_request(self, path: str) -> None:
+        with self._lock:
+            self.requests[path] += 1
+
+    def should_fail(self, path: str) -> bool:
+        with self._lock:
+            if self.FAILURES[path] > 0:
+                self.FAILURES[path] -= 1
+                return True
+
+        return False
+
+    def start(self) -> 'FixtureServer':
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
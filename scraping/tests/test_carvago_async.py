@@ -0,0 +1,63 @@
+import pytest
+
+from libs.rate_limit import AdaptiveRateLimiter
+from libs.scrapers.carvago_async import CarvagoAsyncScraper
+from tests.fixture_server import FixtureServer
+
+
+def test_client_error_does_not_change_rate():
+    limiter = AdaptiveRateLimiter(rate=2, max_rate=4)
+
+    limiter.observe('http://host/car/1', 404, 0.1)
+    assert limiter.get_bucket('http://host/car/1').rate == 2
+
+    limiter.observe('http://host/car/1', 200, 0.1)
+    assert limiter.get_bucket('http://host/car/1').rate > 2
+
+    limiter.observe('http://host/car/1', 429, 0.1)
+    assert limiter.get_bucket('http://host/car/1').rate < 2
+
+
+def test_missing_page_fails_without_retries():
+    with FixtureServer() as server:
+        scraper = CarvagoAsyncScraper(requests_per_second=100)
+
+        assert scraper.get_car_details(f'{server.url}/missing/car') is None
+        assert server.requests['/missing/car'] == 1
+
+
+def test_server_error_is_retried():
+    with FixtureServer(failures={'/car/abc123/skoda-octavia': 2}) as server:
+        scraper = CarvagoAsyncScraper(requests_per_second=100)
+
+        car_details = scraper.get_car_details(f'{server.url}/car/abc123/skoda-octavia')
+
+        assert car_details['make'] == 'Skoda'
+        assert server.requests['/car/abc123/skoda-octavia'] == 3
+
+
+def test_search_pages_are_deduplicated_and_retried():
+    # page 2 fails in the first round (all retries of request), car moved from page 1 to page 2
+    with FixtureServer(failures={'/search?sort=price&page=2': 5}) as server:
+        scraper = CarvagoAsyncScraper(requests_per_second=100)
+
+        descriptions = scraper.get_advertised_cars(f'{server.url}/search?sort=price')
+
+        assert sorted(description['id'] for description in descriptions) == ['abc123', 'def456', 'ghi789', 'jkl012']
+        assert server.requests['/search?sort=price&page=2'] == 6
+
+
+def test_urls_error_is_raised_after_started_urls():
+    def iter_urls(url):
+        yield f'{url}/car/abc123/skoda-octavia'
+        raise KeyError('price')
+
+    with FixtureServer() as server:
+        scraper = CarvagoAsyncScraper(requests_per_second=100)
+
+        cars_details = []
+        with pytest.raises(KeyError):
+            for car_details in scraper.iter_multiple_cars_details(iter_urls(server.url)):
+                cars_details.append(car_details)
+
+        assert [car_details['make'] for car_details in cars_details] == ['Skoda']
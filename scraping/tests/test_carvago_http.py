@@ -0,0 +1,122 @@
+import os
+
+from libs.scrapers.carvago_http import CarvagoHttpScraper
+from tests.fixture_server import FixtureServer, FIXTURES_DIR
+
+BASE_URL = 'http://127.0.0.1'
+
+EXPECTED_CAR_DETAILS = {
+    'price': '15990',
+    'make': 'Skoda',
+    'model': 'Octavia',
+    'body_color': 'Black',
+    'interior_colour': 'Grey',
+    'body': 'Combi',
+    'power': '110 kW',
+    'drive_type': 'Front',
+    'transmission': 'Automatic',
+    'kms_driven': '123 456 km',
+    'first_registration': '05/2019',
+    'features': ['Air conditioning', 'Cruise control', 'Heated front seats', 'Parking sensors'],
+}
+
+
+def load_fixture(file_name: str, base_url: str = BASE_URL):
+    with open(os.path.join(FIXTURES_DIR, file_name), 'rb') as f:
+        return CarvagoHttpScraper._parse_html(f.read(), base_url)
+
+
+def test_parse_cards_description():
+    descriptions = CarvagoHttpScraper._parse_cards_description(load_fixture('search_page_1.html'))
+
+    assert descriptions == [
+        {'id': 'abc123', 'url': f'{BASE_URL}/car/abc123/skoda-octavia', 'price': '15990'},
+        {'id': 'def456', 'url': f'{BASE_URL}/car/def456/skoda-superb', 'price': '21490'},
+        {'id': 'ghi789', 'url': f'{BASE_URL}/car/ghi789/skoda-kodiaq', 'price': '27900'},
+    ]
+
+
+def test_parse_max_page_num():
+    assert CarvagoHttpScraper._parse_max_page_num(load_fixture('search_page_1.html')) == 2
+
+
+def test_parse_car_details():
+    url = f'{BASE_URL}/car/abc123/skoda-octavia'
+    car_details = CarvagoHttpScraper._parse_car_details(load_fixture('car_page.html'), url)
+
+    assert car_details == dict(EXPECTED_CAR_DETAILS, url=url, photos=[])
+
+
+def test_parse_photos_from_gallery_images():
+    photos = CarvagoHttpScraper._parse_photos_urls(load_fixture('car_page.html'))
+
+    assert photos == [f'{BASE_URL}/assets/photo_{i}.jpg' for i in range(1, 4)]
+
+
+def test_parse_photos_prefers_thumbnails():
+    tree = CarvagoHttpScraper._parse_html(
+        b'''<div class="image-gallery-image"><img src="/big.jpg"></div>
+            <div class="e1sb5aaj0"><img src="/thumb_1.jpg"></div>
+            <div class="e1sb5aaj0"><img src="/thumb_2.jpg"></div>''',
+        BASE_URL
+    )
+
+    assert CarvagoHttpScraper._parse_photos_urls(tree) == [f'{BASE_URL}/thumb_1.jpg', f'{BASE_URL}/thumb_2.jpg']
+
+
+def test_scrape_local_server():
+    with FixtureServer() as server:
+        scraper = CarvagoHttpScraper(sleep_time=0)
+
+        descriptions = scraper.get_advertised_cars(f'{server.url}/search?sort=price', page_limit=1)
+        assert [description['id'] for description in descriptions] == ['abc123', 'def456', 'ghi789']
+        assert server.requests['/search?sort=price&page=1'] == 1
+
+        url = descriptions[0]['url']
+        car_details = scraper.get_car_details(url, with_photos=True)
+        assert car_details == dict(
+            EXPECTED_CAR_DETAILS,
+            url=url,
+            photos=[f'{server.url}/assets/photo_{i}.jpg' for i in range(1, 4)]
+        )
+
+        urls = [description['url'] for description in descriptions]
+        assert len(scraper.get_multiple_cars_details(urls, num_workers=2)) == len(urls)
+
+
+def test_scrape_local_server_retries_failed_page():
+    with FixtureServer(failures={'/car/abc123/skoda-octavia': 2}) as server:
+        scraper = CarvagoHttpScraper(sleep_time=0)
+
+        car_details = scraper.get_car_details(f'{server.url}/car/abc123/skoda-octavia')
+
+        assert car_details['make'] == 'Skoda'
+        assert server.requests['/car/abc123/skoda-octavia'] == 3
+
+
+def test_search_pages_are_deduplicated_and_retried():
+    # page 2 fails in the first round (all retries of request), car moved from page 1 to page 2
+    with FixtureServer(failures={'/search?sort=price&page=2': 5}) as server:
+        scraper = CarvagoHttpScraper(sleep_time=0, search_workers=2)
+
+        descriptions = scraper.get_advertised_cars(f'{server.url}/search?sort=price')
+
+        assert [description['id'] for description in descriptions] == ['abc123', 'def456', 'ghi789', 'jkl012']
+        assert server.requests['/search?sort=price&page=2'] == 6
+
+
+def test_done_search_pages_are_skipped():
+    with FixtureServer() as server:
+        scraper = CarvagoHttpScraper(sleep_time=0, search_workers=2)
+        done_pages = {}
+
+        descriptions = list(scraper.iter_advertised_cars(
+            f'{server.url}/search?sort=price', done_pages={1},
+            on_page_done=lambda page_num, page_descriptions: done_pages.update({page_num: page_descriptions})
+        ))
+
+        assert list(done_pages) == [2]
+        assert [description['id'] for description in descriptions] == \
+            [description['id'] for description in done_pages[2]]
+        assert '/search?sort=price&page=2' in server.requests
+        assert '/search?sort=price&page=1' not in server.requests
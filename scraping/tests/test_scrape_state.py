@@ -0,0 +1,13 @@
+from libs.scrape_state import ScrapeStateIndex
+
+
+def test_card_without_price_needs_details():
+    state_index = ScrapeStateIndex(':memory:')
+    state_index.mark_details_fetched('abc123', None, '20230101000000')
+
+    assert state_index.needs_details({'id': 'abc123', 'url': 'http://host/car/abc123'}, '20230101000001')
+    assert state_index.needs_details({'id': 'abc123', 'price': '15990'}, '20230101000001')
+
+    state_index.mark_details_fetched('abc123', '15990', '20230101000000')
+    assert not state_index.needs_details({'id': 'abc123', 'price': '15990'}, '20230101000001')
+    assert state_index.needs_details({'id': 'abc123', 'price': '14990'}, '20230101000001')